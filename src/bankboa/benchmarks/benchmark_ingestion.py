@@ -0,0 +1,323 @@
+"""
+Benchmark of the ingestions of transactions and of the analysis views against a local DDBB
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import argparse
+import datetime
+import json
+import tempfile
+import time
+from urllib.parse import urlencode
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.query import Query
+
+# Import ingestion
+import eboa.ingestion.eboa_ingestion as ingestion
+from eboa.engine.functions import get_resources_path
+
+# Import application
+from bankvboa import create_app
+from bankvboa.views.transactions_analysis import transactions_analysis
+
+# Import generator of synthetic statements
+from bankboa.benchmarks import statement_generator
+
+# Import instrumentation helpers
+from bankboa.ingestions.ingestion_transactions.instrumentation import get_max_rss
+
+# Ingestion modules
+SANTANDER_MODULE = "bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions"
+GROUP_MODULE = "bankboa.ingestions.ingestion_transactions.ingestion_group_transactions"
+
+# Environment variable with the directory of the configuration used by the ingestions
+RESOURCES_PATH_VARIABLE = "EBOA_RESOURCES_PATH"
+
+# Configuration files replaced by the generated ones
+RULES_FILES = ["groups.xml", "entities.xml"]
+
+def _measure(name, function, rows = None):
+    """
+    Method to measure the execution of a stage of the benchmark
+
+    :param name: name of the stage
+    :type name: str
+    :param function: function executing the stage
+    :type function: function
+    :param rows: number of movements treated by the stage (for the throughput)
+    :type rows: int
+
+    :return: tuple with the result of the function and the record of the stage
+    :rtype: tuple
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = function()
+    wall_time = time.perf_counter() - wall_start
+    record = {"stage": name, "wall_time": wall_time, "cpu_time": time.process_time() - cpu_start, "max_rss": get_max_rss()}
+    if rows is not None:
+        record["rows"] = rows
+        record["throughput"] = rows / wall_time if wall_time > 0 else None
+    # end if
+
+    return result, record
+
+def _get_errors(exit_status):
+    """
+    Method to count the operations of an ingestion not inserted correctly
+
+    :param exit_status: status of the operations returned by the ingestion
+    :type exit_status: list
+
+    :return: number of erroneous operations
+    :rtype: int
+    """
+    return len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]])
+
+def benchmark_ingestions(file_paths, rows):
+    """
+    Method to time the Santander ingestion and the group aggregation of the statements
+    in the order of generation (as done by the ingestion daemon)
+
+    :param file_paths: paths to the statements in chronological order
+    :type file_paths: list
+    :param rows: number of movements of the statements
+    :type rows: int
+
+    :return: records of the stages
+    :rtype: list
+    """
+    reception_time = datetime.datetime.now().isoformat()
+    errors = {"santander": 0, "group": 0}
+
+    def ingest_statements():
+        for file_path in file_paths:
+            errors["santander"] += _get_errors(ingestion.command_process_file(SANTANDER_MODULE, file_path, reception_time))
+        # end for
+    # end def
+
+    def aggregate_statements():
+        for file_path in file_paths:
+            errors["group"] += _get_errors(ingestion.command_process_file(GROUP_MODULE, file_path, reception_time))
+        # end for
+    # end def
+
+    records = []
+    for name, function, error_name in [("santander_ingestion", ingest_statements, "santander"),
+                                       ("group_aggregation", aggregate_statements, "group")]:
+        record = _measure(name, function, rows)[1]
+        record["files"] = len(file_paths)
+        record["errors"] = errors[error_name]
+        records.append(record)
+    # end for
+
+    return records
+
+def benchmark_views(reporting_start, reporting_stop, group, entity, repetitions = 3):
+    """
+    Method to time the data APIs of the three analysis views.
+    The first request of every view is built from the DDBB and the rest are served by the cache
+
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+    :param group: group requested in the group analysis
+    :type group: str
+    :param entity: entity requested in the entity analysis
+    :type entity: str
+    :param repetitions: number of requests served by the cache
+    :type repetitions: int
+
+    :return: records of the views
+    :rtype: list
+    """
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["LOGIN_DISABLED"] = True
+    client = app.test_client()
+
+    period = {"reporting_start": reporting_start, "reporting_stop": reporting_stop}
+    views = [("transactions_analysis", "/views/api/v1/transactions-analysis?" + urlencode(period)),
+             ("group_analysis", "/views/api/v1/group-analysis?" + urlencode(dict(period, group = group))),
+             ("entity_analysis", "/views/api/v1/entity-analysis?" + urlencode(dict(period, entity = entity)))]
+
+    records = []
+    for name, url in views:
+        transactions_analysis.response_cache.clear()
+        response, record = _measure(name, lambda: client.get(url))
+        record["status_code"] = response.status_code
+        record["size"] = len(response.get_data())
+
+        cached_start = time.perf_counter()
+        for i in range(repetitions):
+            client.get(url)
+        # end for
+        record["cached_wall_time"] = (time.perf_counter() - cached_start) / repetitions if repetitions > 0 else None
+        records.append(record)
+    # end for
+
+    return records
+
+def prepare_resources(directory, groups, entities, concepts, seed = 0):
+    """
+    Method to prepare a copy of the configuration of the ingestions with the generated rules.
+    The rest of the configuration is linked from the configured resources
+
+    :param directory: directory where to prepare the configuration
+    :type directory: str
+    :param groups: number of groups
+    :type groups: int
+    :param entities: number of entities
+    :type entities: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: path to the prepared configuration
+    :rtype: str
+    """
+    resources_path = get_resources_path()
+    benchmark_resources_path = os.path.join(directory, "resources")
+    os.makedirs(benchmark_resources_path, exist_ok = True)
+    for name in os.listdir(resources_path):
+        link_path = os.path.join(benchmark_resources_path, name)
+        if name not in RULES_FILES and not os.path.lexists(link_path):
+            os.symlink(os.path.join(os.path.abspath(resources_path), name), link_path)
+        # end if
+    # end for
+    statement_generator.write_rules(benchmark_resources_path, groups, entities, concepts, seed)
+
+    return benchmark_resources_path
+
+def run(directory, rows, years, concepts, files, groups, entities, seed = 0, file_format = "xls"):
+    """
+    Method to run the benchmark over a clean DDBB
+
+    :param directory: directory where to write the statements and the configuration
+    :type directory: str
+    :param rows: number of movements
+    :type rows: int
+    :param years: number of years covered by the movements
+    :type years: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param files: number of statements
+    :type files: int
+    :param groups: number of groups
+    :type groups: int
+    :param entities: number of entities
+    :type entities: int
+    :param seed: seed of the random generator
+    :type seed: int
+    :param file_format: format of the statements (xls or xlsx)
+    :type file_format: str
+
+    :return: report with the parameters and the records of the stages
+    :rtype: dict
+    """
+    report = {"parameters": {"rows": rows, "years": years, "concepts": concepts, "files": files, "groups": groups, "entities": entities, "seed": seed, "file_format": file_format},
+              "stages": []}
+
+    file_paths, record = _measure("generation", lambda: statement_generator.write_statements(directory, rows, years, concepts, files, seed, file_format), rows)
+    report["stages"].append(record)
+
+    # The ingestions use the generated rules
+    os.environ[RESOURCES_PATH_VARIABLE] = prepare_resources(directory, groups, entities, concepts, seed)
+
+    query = Query()
+    query.clear_db()
+    query.close_session()
+
+    report["stages"] += benchmark_ingestions(file_paths, rows)
+
+    # The reporting period covers every statement
+    file_names = [os.path.basename(file_path) for file_path in file_paths]
+    reporting_start = datetime.datetime.strptime(file_names[0][35:50], statement_generator.FILE_TIME_FORMAT)
+    reporting_stop = datetime.datetime.strptime(file_names[-1][51:66], statement_generator.FILE_TIME_FORMAT) + datetime.timedelta(days = 1)
+    report["stages"] += benchmark_views(reporting_start.isoformat(), reporting_stop.isoformat(), "Group 0", "Entity 0")
+
+    return report
+
+def print_report(report):
+    """
+    Method to print the records of the stages of a report
+
+    :param report: report of the benchmark
+    :type report: dict
+    """
+    print(", ".join(f"{name}: {value}" for name, value in report["parameters"].items()))
+    for record in report["stages"]:
+        line = f"{record['stage']}: {record['wall_time']:.3f} s (CPU {record['cpu_time']:.3f} s)"
+        if "throughput" in record:
+            line += f", {record['throughput']:.1f} rows/s"
+        # end if
+        if "cached_wall_time" in record:
+            line += f", cached {record['cached_wall_time'] * 1000:.1f} ms, status {record['status_code']}, {record['size']} bytes"
+        # end if
+        if "errors" in record:
+            line += f", {record['errors']} erroneous operations"
+        # end if
+        if record["max_rss"] is not None:
+            line += f", max RSS {record['max_rss'] / 2**20:.1f} MiB"
+        # end if
+        print(line)
+    # end for
+
+def main():
+
+    args_parser = argparse.ArgumentParser(description="Benchmark of the ingestions of transactions and of the analysis views. The DDBB is cleared before the execution")
+    args_parser.add_argument("--clear-db", dest="clear_db", action="store_true",
+                             help="Confirm that the DDBB can be cleared and filled with synthetic data")
+    args_parser.add_argument("-d", dest="directory", type=str,
+                             help="Directory where to write the statements and the configuration (temporary directory by default)")
+    args_parser.add_argument("-r", dest="rows", type=int, default=10000,
+                             help="Number of movements")
+    args_parser.add_argument("-y", dest="years", type=int, default=2,
+                             help="Number of years covered by the movements")
+    args_parser.add_argument("-c", dest="concepts", type=int, default=500,
+                             help="Number of different concepts")
+    args_parser.add_argument("-f", dest="files", type=int, default=1,
+                             help="Number of statements")
+    args_parser.add_argument("-g", dest="groups", type=int, default=200,
+                             help="Number of groups")
+    args_parser.add_argument("-e", dest="entities", type=int, default=200,
+                             help="Number of entities")
+    args_parser.add_argument("-s", dest="seed", type=int, default=0,
+                             help="Seed of the random generator")
+    args_parser.add_argument("-x", dest="file_format", type=str, choices=statement_generator.FILE_FORMATS, default="xls",
+                             help="Format of the statements (xls by default as exported by Santander)")
+    args_parser.add_argument("-o", dest="output", type=str,
+                             help="File where to append the report as a JSON line")
+    args = args_parser.parse_args()
+
+    if not args.clear_db:
+        args_parser.error("the benchmark clears the DDBB, confirm it with --clear-db")
+    # end if
+
+    if args.directory is not None:
+        os.makedirs(args.directory, exist_ok = True)
+        report = run(args.directory, args.rows, args.years, args.concepts, args.files, args.groups, args.entities, args.seed, args.file_format)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = run(directory, args.rows, args.years, args.concepts, args.files, args.groups, args.entities, args.seed, args.file_format)
+        # end with
+    # end if
+
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "a") as output:
+            output.write(json.dumps(report, separators = (",", ":")) + "\n")
+        # end with
+    # end if
+
+if __name__ == "__main__":
+
+    main()
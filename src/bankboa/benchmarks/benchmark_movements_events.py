@@ -0,0 +1,132 @@
+"""
+Benchmark of the generation of the MOVEMENT events from a synthetic Santander statement
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import argparse
+import datetime
+import random
+import time
+import pandas as pd
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+CONCEPTS = ["NOMINA EMPRESA", "RECIBO ALQUILER", "RECIBO LUZ", "RECIBO AGUA", "COMPRA TARJETA SUPERMERCADO",
+            "COMPRA TARJETA GASOLINERA", "TRANSFERENCIA BIZUM", "COMISION MANTENIMIENTO", "INTERESES", "DEVOLUCION"]
+
+def generate_parsed_statement(rows, seed = 0):
+    """
+    Method to generate the parsed content of a synthetic Santander statement
+    (most recent movements first)
+
+    :param rows: number of movements
+    :type rows: int
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: movements with the columns of the Santander statements
+    :rtype: pandas.DataFrame
+    """
+    generator = random.Random(seed)
+    date = datetime.date(2025, 7, 3)
+    balance = 10000.0
+    content = {"FECHA OPERACIÓN": [], "FECHA VALOR": [], "CONCEPTO": [], "IMPORTE EUR": [], "SALDO": []}
+    for i in range(rows):
+        if generator.random() < 0.3:
+            date -= datetime.timedelta(days = 1)
+        # end if
+        amount = round(generator.uniform(-300, 200), 2)
+        content["FECHA OPERACIÓN"].append(date.strftime("%d/%m/%Y"))
+        content["FECHA VALOR"].append(date.strftime("%d/%m/%Y"))
+        content["CONCEPTO"].append(f"{generator.choice(CONCEPTS)} {generator.randint(0, 999)}")
+        content["IMPORTE EUR"].append(amount)
+        content["SALDO"].append(round(balance, 2))
+        balance -= amount
+    # end for
+
+    return pd.DataFrame(content)
+
+def generate_rules(groups, entities, seed = 0):
+    """
+    Method to generate a synthetic set of groups and entities
+
+    :param groups: number of groups
+    :type groups: int
+    :param entities: number of entities
+    :type entities: int
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: compiled rules
+    :rtype: RulesMatcher
+    """
+    generator = random.Random(seed)
+    words = [word for concept in CONCEPTS for word in concept.split()]
+    synthetic_groups = []
+    for i in range(groups):
+        synthetic_groups.append(rules.Group(f"Group {i}", (rules.Rule(f"{generator.choice(words)} {i % 1000}", frozenset([generator.choice([">0", "<0"])])),)))
+    # end for
+    synthetic_entities = []
+    for i in range(entities):
+        synthetic_entities.append(rules.Entity(f"Entity {i}", (f"{generator.choice(words)} {i % 1000}",)))
+    # end for
+
+    return rules.RulesMatcher(tuple(synthetic_groups), tuple(synthetic_entities))
+
+def run(rows, groups, entities):
+    """
+    Method to run the benchmark and print the cost per row of each stage
+
+    :param rows: number of movements of the statement
+    :type rows: int
+    :param groups: number of groups
+    :type groups: int
+    :param entities: number of entities
+    :type entities: int
+    """
+    parsed_xls = generate_parsed_statement(rows)
+    rules_matcher = generate_rules(groups, entities)
+
+    start = time.perf_counter()
+    prepared_movements = movements.prepare_movements(parsed_xls)
+    preparation_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    movements_events = movements.build_movements_events(prepared_movements, rules_matcher)
+    build_time = time.perf_counter() - start
+
+    # Iteration cost of the previous row by row approach for reference
+    start = time.perf_counter()
+    for index, row in prepared_movements.iterrows():
+        pass
+    # end for
+    iterrows_time = time.perf_counter() - start
+
+    print(f"Rows: {rows}, groups: {groups}, entities: {entities}, events: {len(movements_events)}")
+    print(f"Date preparation: {preparation_time:.3f} s ({preparation_time / rows * 1e6:.2f} us/row)")
+    print(f"Columnar event build: {build_time:.3f} s ({build_time / rows * 1e6:.2f} us/row)")
+    print(f"Only iterating with iterrows: {iterrows_time:.3f} s ({iterrows_time / rows * 1e6:.2f} us/row)")
+
+def main():
+
+    args_parser = argparse.ArgumentParser(description="Benchmark of the generation of the MOVEMENT events")
+    args_parser.add_argument("-r", dest="rows", type=int, default=100000,
+                             help="Number of movements of the synthetic statement")
+    args_parser.add_argument("-g", dest="groups", type=int, default=200,
+                             help="Number of groups")
+    args_parser.add_argument("-e", dest="entities", type=int, default=200,
+                             help="Number of entities")
+    args = args_parser.parse_args()
+
+    run(args.rows, args.groups, args.entities)
+
+if __name__ == "__main__":
+
+    main()
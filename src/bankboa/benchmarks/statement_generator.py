@@ -0,0 +1,368 @@
+"""
+Generator of synthetic Santander statements and of their rules configuration
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import argparse
+import datetime
+import random
+from xml.sax.saxutils import escape
+
+# Import excel writers (xlwt for the xls statements as exported by Santander, openpyxl for the xlsx ones)
+import openpyxl
+import xlwt
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Title of the statements exported by Santander
+TITLE = "Consultas de movimientos"
+
+# Columns of the statements exported by Santander
+COLUMNS = ["FECHA OPERACIÓN", "FECHA VALOR", "CONCEPTO", "IMPORTE EUR", "SALDO"]
+
+# Kinds of movements composing the concepts with the counterparts and the signs of their amounts
+KINDS = [("NOMINA", (">0",)), ("RECIBO", ("<0",)), ("COMPRA TARJETA", ("<0",)), ("TRANSFERENCIA", (">0", "<0")),
+         ("BIZUM", (">0", "<0")), ("DEVOLUCION", (">0",)), ("ADEUDO", ("<0",)), ("INGRESO", (">0",))]
+
+# Format of the times in the names of the files
+FILE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+# Formats of the workbooks of the statements
+FILE_FORMATS = ["xls", "xlsx"]
+
+# Maximum number of rows of a sheet in the xls (BIFF) format
+XLS_MAX_ROWS = 65536
+
+def get_concepts(concepts):
+    """
+    Method to obtain the vocabulary of concepts of the synthetic statements
+
+    :param concepts: number of different concepts
+    :type concepts: int
+
+    :return: concepts with the signs of their amounts
+    :rtype: list of tuple
+    """
+    vocabulary = []
+    for i in range(concepts):
+        kind, signs = KINDS[i % len(KINDS)]
+        vocabulary.append((f"{kind} COUNTERPART{i:05d}", signs))
+    # end for
+
+    return vocabulary
+
+def generate_movements(rows, years, concepts, stop = None, seed = 0):
+    """
+    Method to generate the movements of a synthetic statement
+    (most recent movements first as exported by Santander)
+
+    :param rows: number of movements
+    :type rows: int
+    :param years: number of years covered by the movements
+    :type years: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param stop: day of the most recent movement (2025-07-03 by default)
+    :type stop: datetime.date
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: rows with the values of the columns of the statement
+    :rtype: list of list
+    """
+    generator = random.Random(seed)
+    if stop is None:
+        stop = datetime.date(2025, 7, 3)
+    # end if
+    days = max(int(years * 365), 1)
+    vocabulary = get_concepts(concepts)
+
+    # Skewed popularity of the counterparts as in real statements
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    offsets = sorted(generator.randrange(days) for i in range(rows))
+    selected_concepts = generator.choices(vocabulary, weights = weights, k = rows)
+
+    generated_movements = []
+    balance = 10000.0
+    for offset, (concept, signs) in zip(offsets, selected_concepts):
+        day = stop - datetime.timedelta(days = days - 1 - offset)
+        amount = round(generator.uniform(1, 500), 2)
+        if generator.choice(signs) == "<0":
+            amount = -amount
+        # end if
+        balance = round(balance + amount, 2)
+        value_day = day + datetime.timedelta(days = generator.choice([0, 0, 0, 1, 2]))
+        generated_movements.append([day.strftime("%d/%m/%Y"), value_day.strftime("%d/%m/%Y"),
+                                    f"{concept} {generator.randint(0, 999999):06d}", amount, balance])
+    # end for
+    generated_movements.reverse()
+
+    return generated_movements
+
+def get_file_name(start, stop, generation_time, file_format = "xls"):
+    """
+    Method to obtain the name of a statement following the layout parsed by the ingestion
+
+    :param start: day of the oldest movement
+    :type start: datetime.date
+    :param stop: day of the most recent movement
+    :type stop: datetime.date
+    :param generation_time: time of the generation of the statement
+    :type generation_time: datetime.datetime
+    :param file_format: format of the workbook (xls or xlsx)
+    :type file_format: str
+
+    :return: name of the file
+    :rtype: str
+    """
+    return "BANKSAN_MOVEMENTS__{}_{}_{}_0001.{}".format(generation_time.strftime(FILE_TIME_FORMAT),
+                                                       start.strftime(FILE_TIME_FORMAT),
+                                                       stop.strftime(FILE_TIME_FORMAT),
+                                                       file_format)
+
+def _write_xls(file_path, rows):
+    """
+    Method to write the rows of a statement in a workbook with the xls (BIFF) format
+
+    :param file_path: path to the workbook
+    :type file_path: str
+    :param rows: rows of the sheet
+    :type rows: list of list
+    """
+    if len(rows) > XLS_MAX_ROWS:
+        raise ValueError(f"The xls format only admits {XLS_MAX_ROWS} rows per sheet ({len(rows)} rows requested), use the xlsx format or more statements")
+    # end if
+
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet("Movimientos")
+    for row_index, row in enumerate(rows):
+        for column_index, value in enumerate(row):
+            sheet.write(row_index, column_index, value)
+        # end for
+    # end for
+    workbook.save(file_path)
+
+def _write_xlsx(file_path, rows):
+    """
+    Method to write the rows of a statement in a workbook with the xlsx format
+
+    :param file_path: path to the workbook
+    :type file_path: str
+    :param rows: rows of the sheet
+    :type rows: list of list
+    """
+    workbook = openpyxl.Workbook(write_only = True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append(row)
+    # end for
+    workbook.save(file_path)
+
+def write_statement(directory, generated_movements, generation_time = None, file_format = "xls"):
+    """
+    Method to write a synthetic statement with the layout exported by Santander
+    (title, empty rows up to the header row and the movements)
+
+    :param directory: directory where to write the statement
+    :type directory: str
+    :param generated_movements: rows of the statement (most recent movements first)
+    :type generated_movements: list of list
+    :param generation_time: time of the generation of the statement (the day after the most recent movement by default)
+    :type generation_time: datetime.datetime
+    :param file_format: format of the workbook, xls (BIFF as exported by Santander, limited to 65536 rows) or xlsx
+    :type file_format: str
+
+    :return: path to the statement
+    :rtype: str
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"The statements can only be written in the formats {FILE_FORMATS}")
+    # end if
+    start = datetime.datetime.strptime(generated_movements[-1][0], "%d/%m/%Y")
+    stop = datetime.datetime.strptime(generated_movements[0][0], "%d/%m/%Y")
+    if generation_time is None:
+        generation_time = stop + datetime.timedelta(days = 1)
+    # end if
+
+    rows = [[TITLE]] + [[] for i in range(movements.HEADER_ROW - 1)] + [COLUMNS] + generated_movements
+
+    file_path = os.path.join(directory, get_file_name(start, stop, generation_time, file_format))
+    if file_format == "xls":
+        _write_xls(file_path, rows)
+    else:
+        _write_xlsx(file_path, rows)
+    # end if
+
+    return file_path
+
+def write_statements(directory, rows, years, concepts, files = 1, seed = 0, file_format = "xls"):
+    """
+    Method to write the movements of a synthetic account split in consecutive statements
+
+    :param directory: directory where to write the statements
+    :type directory: str
+    :param rows: number of movements
+    :type rows: int
+    :param years: number of years covered by the movements
+    :type years: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param files: number of statements
+    :type files: int
+    :param seed: seed of the random generator
+    :type seed: int
+    :param file_format: format of the workbooks (xls or xlsx)
+    :type file_format: str
+
+    :return: paths to the statements in chronological order
+    :rtype: list
+    """
+    generated_movements = generate_movements(rows, years, concepts, seed = seed)
+    generated_movements.reverse()
+
+    file_paths = []
+    size = -(-len(generated_movements) // files)
+    statement_movements = []
+    for row in generated_movements:
+        # The statements are split at the change of day so that their validities do not overlap
+        if len(statement_movements) >= size and row[0] != statement_movements[-1][0]:
+            statement_movements.reverse()
+            file_paths.append(write_statement(directory, statement_movements, file_format = file_format))
+            statement_movements = []
+        # end if
+        statement_movements.append(row)
+    # end for
+    statement_movements.reverse()
+    file_paths.append(write_statement(directory, statement_movements, file_format = file_format))
+
+    return file_paths
+
+def generate_groups_xml(groups, concepts, seed = 0):
+    """
+    Method to generate a groups configuration matching the synthetic concepts
+
+    :param groups: number of groups
+    :type groups: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: content of the groups.xml file
+    :rtype: str
+    """
+    generator = random.Random(seed)
+    vocabulary = get_concepts(concepts)
+    content = ["<groups>"]
+    for i in range(groups):
+        # The rules cover the most frequent counterparts first
+        concept, signs = vocabulary[i % len(vocabulary)]
+        content.append("  <group>")
+        content.append(f"    <name>Group {i}</name>")
+        content.append("    <matching_rules>")
+        content.append("      <rule>")
+        content.append(f"        <match>{escape(concept)}</match>")
+        content.append(f"        <amount>{escape(generator.choice(signs))}</amount>")
+        content.append("      </rule>")
+        content.append("    </matching_rules>")
+        content.append("  </group>")
+    # end for
+    content.append("</groups>")
+
+    return "\n".join(content) + "\n"
+
+def generate_entities_xml(entities, concepts):
+    """
+    Method to generate an entities configuration matching the counterparts of the synthetic concepts
+
+    :param entities: number of entities
+    :type entities: int
+    :param concepts: number of different concepts
+    :type concepts: int
+
+    :return: content of the entities.xml file
+    :rtype: str
+    """
+    vocabulary = get_concepts(concepts)
+    content = ["<entities>"]
+    for i in range(entities):
+        concept = vocabulary[i % len(vocabulary)][0]
+        content.append("  <entity>")
+        content.append(f"    <name>Entity {i}</name>")
+        content.append("    <matching_strings>")
+        content.append(f"      <string>{escape(concept.split()[-1])}</string>")
+        content.append("    </matching_strings>")
+        content.append("  </entity>")
+    # end for
+    content.append("</entities>")
+
+    return "\n".join(content) + "\n"
+
+def write_rules(directory, groups, entities, concepts, seed = 0):
+    """
+    Method to write the groups.xml and entities.xml files matching the synthetic concepts
+
+    :param directory: directory where to write the configuration
+    :type directory: str
+    :param groups: number of groups
+    :type groups: int
+    :param entities: number of entities
+    :type entities: int
+    :param concepts: number of different concepts
+    :type concepts: int
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return: paths to the groups.xml and entities.xml files
+    :rtype: tuple
+    """
+    groups_path = os.path.join(directory, "groups.xml")
+    with open(groups_path, "w") as groups_file:
+        groups_file.write(generate_groups_xml(groups, concepts, seed))
+    # end with
+    entities_path = os.path.join(directory, "entities.xml")
+    with open(entities_path, "w") as entities_file:
+        entities_file.write(generate_entities_xml(entities, concepts))
+    # end with
+
+    return groups_path, entities_path
+
+def main():
+
+    args_parser = argparse.ArgumentParser(description="Generator of synthetic Santander statements and of their rules configuration")
+    args_parser.add_argument("-o", dest="directory", type=str, required=True,
+                             help="Directory where to write the statements and the configuration")
+    args_parser.add_argument("-r", dest="rows", type=int, default=10000,
+                             help="Number of movements")
+    args_parser.add_argument("-y", dest="years", type=int, default=2,
+                             help="Number of years covered by the movements")
+    args_parser.add_argument("-c", dest="concepts", type=int, default=500,
+                             help="Number of different concepts")
+    args_parser.add_argument("-f", dest="files", type=int, default=1,
+                             help="Number of statements")
+    args_parser.add_argument("-g", dest="groups", type=int, default=200,
+                             help="Number of groups")
+    args_parser.add_argument("-e", dest="entities", type=int, default=200,
+                             help="Number of entities")
+    args_parser.add_argument("-s", dest="seed", type=int, default=0,
+                             help="Seed of the random generator")
+    args_parser.add_argument("-x", dest="file_format", type=str, choices=FILE_FORMATS, default="xls",
+                             help="Format of the statements (xls by default as exported by Santander)")
+    args = args_parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok = True)
+    for file_path in write_statements(args.directory, args.rows, args.years, args.concepts, args.files, args.seed, args.file_format):
+        print(file_path)
+    # end for
+    for file_path in write_rules(args.directory, args.groups, args.entities, args.concepts, args.seed):
+        print(file_path)
+    # end for
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,680 @@
+"""
+Aggregation engine for the movements of the bank accounts
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import datetime
+from bisect import bisect_left
+from collections import namedtuple, Counter
+
+# Import SQLAlchemy utilities
+from sqlalchemy import and_, or_, exists
+
+# Import datamodel
+from eboa.datamodel.events import Event, EventDouble, EventText, EventLink, EventKey
+from eboa.datamodel.gauges import Gauge
+
+# Import daily balances
+from bankboa.ingestions.ingestion_transactions import daily_balances
+
+# Import row level comparison of movements
+from bankboa.ingestions.ingestion_transactions import movements_diff
+
+# Maximum number of event UUIDs used in a single IN clause
+EVENT_UUIDS_CHUNK_SIZE = 1000
+
+# Light representation of a MOVEMENT event for aggregation purposes
+Movement = namedtuple("Movement", ["event_uuid", "start", "amount", "groups", "entities"])
+
+# Light representation of an aggregated event for the rollup into longer periods
+AggregatedMovement = namedtuple("AggregatedMovement", ["event_uuid", "start", "name", "amount"])
+
+def coalesce_periods(periods):
+    """
+    Method to merge the periods which overlap or are contiguous
+
+    :param periods: list of tuples (start, stop)
+    :type periods: list
+
+    :return: list of merged tuples (start, stop) sorted by start
+    :rtype: list
+    """
+    ranges = []
+    for start, stop in sorted(periods):
+        if len(ranges) > 0 and start <= ranges[-1][1]:
+            if stop > ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], stop)
+            # end if
+        else:
+            ranges.append((start, stop))
+        # end if
+    # end for
+
+    return ranges
+
+def get_movements(query, periods, keys = None):
+    """
+    Method to obtain the MOVEMENT events starting inside the given periods
+    with one bulk query per range of contiguous periods
+
+    :param query: Query instance
+    :type query: Query
+    :param periods: list of tuples (start, stop)
+    :type periods: list
+    :param keys: groups and entities whose movements are needed (None to obtain all the movements)
+    :type keys: dict
+
+    :return: list of movements sorted by start
+    :rtype: list of Movement
+    """
+    movements = []
+    for start, stop in coalesce_periods(periods):
+        if keys is None:
+            movement_events = [(event.event_uuid, event.start) for event in query.get_events(
+                gauge_names = {"filter": "MOVEMENT", "op": "=="},
+                start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">="}],
+                order_by = {"field": "start", "descending": False})]
+        else:
+            # Only the movements classified in any of the groups or entities
+            movement_events = query.session.query(Event.event_uuid, Event.start).join(
+                Gauge, Event.gauge_uuid == Gauge.gauge_uuid).join(
+                    EventText, EventText.event_uuid == Event.event_uuid).filter(
+                        Gauge.name == "MOVEMENT",
+                        Event.start >= start,
+                        Event.start < stop,
+                        or_(and_(EventText.name.like("group%"), EventText.value.in_(sorted(keys["groups"]))),
+                            and_(EventText.name.like("entity%"), EventText.value.in_(sorted(keys["entities"]))))).distinct().order_by(Event.start).all()
+        # end if
+
+        if len(movement_events) == 0:
+            continue
+        # end if
+
+        amounts = {}
+        groups = {}
+        entities = {}
+        event_uuids = [event_uuid for event_uuid, event_start in movement_events]
+        for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+            chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+
+            event_doubles = query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk),
+                                                                    EventDouble.name == "amount")
+            for event_double in event_doubles:
+                amounts[event_double.event_uuid] = amounts.get(event_double.event_uuid, 0) + event_double.value
+            # end for
+
+            event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                                or_(EventText.name.like("group%"),
+                                                                    EventText.name.like("entity%")))
+            for event_text in event_texts:
+                if event_text.name.startswith("group"):
+                    groups.setdefault(event_text.event_uuid, set()).add(event_text.value)
+                else:
+                    entities.setdefault(event_text.event_uuid, set()).add(event_text.value)
+                # end if
+            # end for
+        # end for
+
+        for event_uuid, event_start in movement_events:
+            movements.append(Movement(event_uuid,
+                                      event_start,
+                                      amounts.get(event_uuid, 0),
+                                      frozenset(groups.get(event_uuid, ())),
+                                      frozenset(entities.get(event_uuid, ()))))
+        # end for
+    # end for
+
+    return movements
+
+def get_update_movements(query, update_events, update_keys):
+    """
+    Method to obtain the movements needed to aggregate the periods marked to be updated.
+    For the periods with registered changed keys, only the movements classified
+    in the changed groups or entities are obtained
+
+    :param query: Query instance
+    :type query: Query
+    :param update_events: UPDATE_MONTH or UPDATE_YEAR events
+    :type update_events: list
+    :param update_keys: changed keys per event UUID as returned by get_update_keys
+    :type update_keys: dict
+
+    :return: list of movements sorted by start (without repetitions)
+    :rtype: list of Movement
+    """
+    all_periods = []
+    changed_periods = []
+    changed_keys = {"groups": set(), "entities": set()}
+    for event in update_events:
+        keys = update_keys[event.event_uuid]
+        if keys is None:
+            all_periods.append((event.start, event.stop))
+        else:
+            changed_periods.append((event.start, event.stop))
+            changed_keys["groups"].update(keys["groups"])
+            changed_keys["entities"].update(keys["entities"])
+        # end if
+    # end for
+
+    movements = {movement.event_uuid: movement for movement in get_movements(query, all_periods)}
+    if len(changed_periods) > 0:
+        for movement in get_movements(query, changed_periods, changed_keys):
+            movements.setdefault(movement.event_uuid, movement)
+        # end for
+    # end if
+
+    return sorted(movements.values(), key = lambda movement: movement.start)
+
+def get_movement_balances(query, start, stop):
+    """
+    Method to obtain the amount and the balance of the MOVEMENT events starting inside the period (start excluded)
+
+    :param query: Query instance
+    :type query: Query
+    :param start: start of the period (excluded)
+    :type start: datetime
+    :param stop: stop of the period (excluded)
+    :type stop: datetime
+
+    :return: list of movements sorted by start
+    :rtype: list of MovementBalance
+    """
+    movement_events = query.get_events(
+        gauge_names = {"filter": "MOVEMENT", "op": "=="},
+        start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">"}],
+        order_by = {"field": "start", "descending": False})
+
+    values = {}
+    event_uuids = [event.event_uuid for event in movement_events]
+    for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+        chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+        event_doubles = query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk),
+                                                                EventDouble.name.in_(["amount", "balance"]))
+        for event_double in event_doubles:
+            values.setdefault(event_double.event_uuid, {})[event_double.name] = event_double.value
+        # end for
+    # end for
+
+    return [daily_balances.MovementBalance(event.start,
+                                           values.get(event.event_uuid, {}).get("amount", 0),
+                                           values.get(event.event_uuid, {}).get("balance"))
+            for event in movement_events]
+
+def get_stored_movements(query, start, stop):
+    """
+    Method to obtain the key of the MOVEMENT events starting inside the period to compare them with the ones of a statement
+
+    :param query: Query instance
+    :type query: Query
+    :param start: start of the period
+    :type start: datetime
+    :param stop: stop of the period (excluded)
+    :type stop: datetime
+
+    :return: list of movements sorted by start
+    :rtype: list of StoredMovement
+    """
+    movement_events = query.get_events(
+        gauge_names = {"filter": "MOVEMENT", "op": "=="},
+        start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">="}],
+        order_by = {"field": "start", "descending": False})
+
+    amounts = {}
+    concepts = {}
+    event_uuids = [event.event_uuid for event in movement_events]
+    for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+        chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+        event_doubles = query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk),
+                                                                EventDouble.name == "amount")
+        for event_double in event_doubles:
+            amounts[event_double.event_uuid] = event_double.value
+        # end for
+        event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                            EventText.name == "concept")
+        for event_text in event_texts:
+            concepts[event_text.event_uuid] = event_text.value
+        # end for
+    # end for
+
+    return [movements_diff.StoredMovement(movements_diff.get_movement_key(event.start, amounts.get(event.event_uuid, 0), concepts.get(event.event_uuid)), event.stop)
+            for event in movement_events]
+
+def aggregate_movements(movements, periods, attribute):
+    """
+    Method to bucket the movements starting inside each period by group or by entity
+
+    :param movements: list of movements sorted by start
+    :type movements: list of Movement
+    :param periods: list of tuples (start, stop) with start included and stop excluded
+    :type periods: list
+    :param attribute: name of the attribute of the movements to bucket by (groups or entities)
+    :type attribute: str
+
+    :return: dictionary with the amount and the list of event UUIDs per group or entity for each period
+    :rtype: dict
+    """
+    starts = [movement.start for movement in movements]
+    aggregations = {}
+    for start, stop in periods:
+        buckets = aggregations.setdefault((start, stop), {})
+        for movement in movements[bisect_left(starts, start):bisect_left(starts, stop)]:
+            for name in getattr(movement, attribute):
+                bucket = buckets.setdefault(name, {"amount": 0, "event_uuids": []})
+                bucket["amount"] += movement.amount
+                bucket["event_uuids"].append(movement.event_uuid)
+            # end for
+        # end for
+    # end for
+
+    return aggregations
+
+def get_movements_from_records(movement_records):
+    """
+    Method to obtain the light representation of movements not inserted yet
+
+    :param movement_records: movements of the statement
+    :type movement_records: iterable of MovementRecord
+
+    :return: list of movements
+    :rtype: list of Movement
+    """
+    movements = []
+    for movement_record in movement_records:
+        groups, entities = movement_record.get_classification()
+        movements.append(Movement(None,
+                                  datetime.datetime.fromisoformat(movement_record.start),
+                                  movement_record.amount,
+                                  frozenset(groups),
+                                  frozenset(entities)))
+    # end for
+
+    return movements
+
+def get_month_start(date):
+    """
+    Method to obtain the start of the month of a date
+
+    :param date: date
+    :type date: datetime
+
+    :return: start of the month
+    :rtype: datetime
+    """
+    return datetime.datetime(date.year, date.month, 1)
+
+def get_year_start(date):
+    """
+    Method to obtain the start of the year of a date
+
+    :param date: date
+    :type date: datetime
+
+    :return: start of the year
+    :rtype: datetime
+    """
+    return datetime.datetime(date.year, 1, 1)
+
+def _add_keys(keys, period_start, groups, entities):
+    """
+    Method to add groups and entities to the changed keys of a period
+
+    :param keys: changed keys per period start
+    :type keys: dict
+    :param period_start: start of the period
+    :type period_start: datetime
+    :param groups: changed groups
+    :type groups: iterable
+    :param entities: changed entities
+    :type entities: iterable
+    """
+    period_keys = keys.setdefault(period_start, {"groups": set(), "entities": set()})
+    period_keys["groups"].update(groups)
+    period_keys["entities"].update(entities)
+
+def get_changed_keys(previous_movements, movements):
+    """
+    Method to obtain the groups and entities whose aggregation changes per month and per year
+    when replacing the previous movements with the new ones
+
+    :param previous_movements: movements stored in the DDBB
+    :type previous_movements: list of Movement
+    :param movements: movements replacing the stored ones
+    :type movements: list of Movement
+
+    :return: tuple with the changed keys per month start and the changed keys per year start
+    :rtype: tuple
+    """
+    def signature(movement):
+        return (movement.start, movement.amount, movement.groups, movement.entities)
+    # end def
+
+    previous_signatures = Counter(signature(movement) for movement in previous_movements)
+    signatures = Counter(signature(movement) for movement in movements)
+
+    month_keys = {}
+    year_keys = {}
+    for start, amount, groups, entities in (previous_signatures - signatures) + (signatures - previous_signatures):
+        _add_keys(month_keys, get_month_start(start), groups, entities)
+        _add_keys(year_keys, get_year_start(start), groups, entities)
+    # end for
+
+    return month_keys, year_keys
+
+def get_update_keys(query, update_events):
+    """
+    Method to obtain the changed keys registered in the UPDATE_MONTH or UPDATE_YEAR events.
+    Events without changed keys request the aggregation of all the groups and entities
+
+    :param query: Query instance
+    :type query: Query
+    :param update_events: UPDATE_MONTH or UPDATE_YEAR events
+    :type update_events: list
+
+    :return: changed keys per event UUID (None if all the keys have to be aggregated)
+    :rtype: dict
+    """
+    keys = {event.event_uuid: None for event in update_events}
+    event_uuids = list(keys)
+    for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+        chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+        event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                            EventText.name.like("changed_%"))
+        for event_text in event_texts:
+            if keys[event_text.event_uuid] is None:
+                keys[event_text.event_uuid] = {"groups": set(), "entities": set()}
+            # end if
+            if event_text.name.startswith("changed_group"):
+                keys[event_text.event_uuid]["groups"].add(event_text.value)
+            elif event_text.name.startswith("changed_entity"):
+                keys[event_text.event_uuid]["entities"].add(event_text.value)
+            # end if
+        # end for
+    # end for
+
+    return keys
+
+def get_update_generation_time(query, dim_signature, start, stop, generation_time = None):
+    """
+    Method to obtain a generation time for the marks of the periods superseding the stored ones.
+    The marks of later statements have later generation times, so only the ingestion
+    of grouped movements (which consumed the stored marks) and the reclassification need it
+
+    :param query: Query instance
+    :type query: Query
+    :param dim_signature: DIM signature of the marks (UPDATE_MONTHS_SANTANDER or UPDATE_YEARS_SANTANDER)
+    :type dim_signature: str
+    :param start: start of the marked periods
+    :type start: datetime
+    :param stop: stop of the marked periods
+    :type stop: datetime
+    :param generation_time: generation time of the source (used if it already supersedes the stored marks)
+    :type generation_time: datetime
+
+    :return: generation time
+    :rtype: datetime
+    """
+    sources = query.get_sources(dim_signatures = {"filter": dim_signature, "op": "=="},
+                                validity_stop_filters = [{"date": start.isoformat(), "op": ">"}],
+                                validity_start_filters = [{"date": stop.isoformat(), "op": "<"}])
+    generation_times = [source.generation_time + datetime.timedelta(microseconds = 1) for source in sources]
+    if generation_time is not None:
+        generation_times.append(generation_time)
+    # end if
+
+    return max(generation_times, default = datetime.datetime(2015, 1, 1))
+
+def get_pending_keys(query, gauge_name, start, stop):
+    """
+    Method to obtain the changed keys of the periods marked to be updated
+    and not aggregated yet
+
+    :param query: Query instance
+    :type query: Query
+    :param gauge_name: name of the gauge of the update events (UPDATE_MONTH or UPDATE_YEAR)
+    :type gauge_name: str
+    :param start: start of the window to look into
+    :type start: datetime
+    :param stop: stop of the window to look into
+    :type stop: datetime
+
+    :return: changed keys per period start (None if all the keys have to be aggregated)
+    :rtype: dict
+    """
+    update_events = query.get_events(
+        gauge_names = {"filter": gauge_name, "op": "=="},
+        start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">="}],
+        value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+    update_keys = get_update_keys(query, update_events)
+    pending_keys = {}
+    for event in update_events:
+        if event.start in pending_keys and pending_keys[event.start] is None:
+            continue
+        elif update_keys[event.event_uuid] is None:
+            pending_keys[event.start] = None
+        else:
+            _add_keys(pending_keys, event.start, update_keys[event.event_uuid]["groups"], update_keys[event.event_uuid]["entities"])
+        # end if
+    # end for
+
+    return pending_keys
+
+def build_update_values(period_start, changed_keys, pending_keys):
+    """
+    Method to build the values of an UPDATE_MONTH or UPDATE_YEAR event
+
+    :param period_start: start of the period
+    :type period_start: datetime
+    :param changed_keys: keys changed by the ingestion per period start
+    :type changed_keys: dict
+    :param pending_keys: keys pending to be aggregated per period start
+    :type pending_keys: dict
+
+    :return: list of values
+    :rtype: list
+    """
+    if period_start in pending_keys and pending_keys[period_start] is None:
+        # All the keys have to be aggregated
+        return [
+            {"name": "status",
+             "type": "text",
+             "value": "UPDATE"}
+        ]
+    # end if
+
+    keys = {"groups": set(), "entities": set()}
+    for period_keys in (changed_keys.get(period_start), pending_keys.get(period_start)):
+        if period_keys is not None:
+            keys["groups"].update(period_keys["groups"])
+            keys["entities"].update(period_keys["entities"])
+        # end if
+    # end for
+
+    if len(keys["groups"]) == 0 and len(keys["entities"]) == 0:
+        return [
+            {"name": "status",
+             "type": "text",
+             "value": "UPDATED"}
+        ]
+    # end if
+
+    values = [
+        {"name": "status",
+         "type": "text",
+         "value": "UPDATE"}
+    ]
+    for i, group in enumerate(sorted(keys["groups"])):
+        values.append(
+            {"name": f"changed_group{i}",
+             "type": "text",
+             "value": group}
+        )
+    # end for
+    for i, entity in enumerate(sorted(keys["entities"])):
+        values.append(
+            {"name": f"changed_entity{i}",
+             "type": "text",
+             "value": entity}
+        )
+    # end for
+
+    return values
+
+def get_aggregated_events_per_name(query, gauge_name, value_name, periods):
+    """
+    Method to obtain the aggregated events stored per period and per group or entity
+
+    :param query: Query instance
+    :type query: Query
+    :param gauge_name: name of the gauge of the aggregated events
+    :type gauge_name: str
+    :param value_name: name of the value holding the group or entity (group or entity)
+    :type value_name: str
+    :param periods: list of tuples (start, stop)
+    :type periods: list
+
+    :return: list of event UUIDs per group or entity for each period start
+    :rtype: dict
+    """
+    aggregated_names = {}
+    for start, stop in coalesce_periods(periods):
+        aggregated_events = query.get_events(
+            gauge_names = {"filter": gauge_name, "op": "=="},
+            start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">="}])
+
+        starts = {event.event_uuid: event.start for event in aggregated_events}
+        event_uuids = list(starts)
+        for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+            chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+            event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                                EventText.name == value_name)
+            for event_text in event_texts:
+                aggregated_names.setdefault(starts[event_text.event_uuid], {}).setdefault(event_text.value, []).append(event_text.event_uuid)
+            # end for
+        # end for
+    # end for
+
+    return aggregated_names
+
+def get_aggregated_movements(query, gauge_name, value_name, periods):
+    """
+    Method to obtain the aggregated events starting inside the given periods
+    with one bulk query per range of contiguous periods
+
+    :param query: Query instance
+    :type query: Query
+    :param gauge_name: name of the gauge of the aggregated events
+    :type gauge_name: str
+    :param value_name: name of the value holding the group or entity (group or entity)
+    :type value_name: str
+    :param periods: list of tuples (start, stop)
+    :type periods: list
+
+    :return: list of aggregated movements sorted by start
+    :rtype: list of AggregatedMovement
+    """
+    aggregated_movements = []
+    for start, stop in coalesce_periods(periods):
+        aggregated_events = query.get_events(
+            gauge_names = {"filter": gauge_name, "op": "=="},
+            start_filters = [{"date": stop.isoformat(), "op": "<"}, {"date": start.isoformat(), "op": ">="}],
+            order_by = {"field": "start", "descending": False})
+
+        names = {}
+        amounts = {}
+        event_uuids = [event.event_uuid for event in aggregated_events]
+        for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+            chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+            event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                                EventText.name == value_name)
+            for event_text in event_texts:
+                names[event_text.event_uuid] = event_text.value
+            # end for
+
+            event_doubles = query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk),
+                                                                    EventDouble.name == "amount")
+            for event_double in event_doubles:
+                amounts[event_double.event_uuid] = event_double.value
+            # end for
+        # end for
+
+        for event in aggregated_events:
+            if event.event_uuid in names:
+                aggregated_movements.append(AggregatedMovement(event.event_uuid,
+                                                               event.start,
+                                                               names[event.event_uuid],
+                                                               amounts.get(event.event_uuid, 0)))
+            # end if
+        # end for
+    # end for
+
+    return aggregated_movements
+
+def get_legacy_aggregated_events(query):
+    """
+    Method to obtain the aggregated events stored before the aggregations were inserted as EVENT_KEYS.
+    These events have no key, so they are not replaced by the keyed aggregations
+
+    :param query: Query instance
+    :type query: Query
+
+    :return: list of tuples (event UUID, gauge name, start)
+    :rtype: list
+    """
+    return query.session.query(Event.event_uuid, Gauge.name, Event.start).join(
+        Gauge, Event.gauge_uuid == Gauge.gauge_uuid).filter(
+            Gauge.name.like("AGGREGATED_MOVEMENTS_%"),
+            ~exists().where(EventKey.event_uuid == Event.event_uuid)).all()
+
+def erase_aggregated_events(query, event_uuids):
+    """
+    Method to erase aggregated events in bulk with their values and their links
+
+    :param query: Query instance
+    :type query: Query
+    :param event_uuids: UUIDs of the aggregated events
+    :type event_uuids: list
+    """
+    try:
+        for i in range(0, len(event_uuids), EVENT_UUIDS_CHUNK_SIZE):
+            chunk = event_uuids[i:i + EVENT_UUIDS_CHUNK_SIZE]
+            query.session.query(EventText).filter(EventText.event_uuid.in_(chunk)).delete(synchronize_session = False)
+            query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk)).delete(synchronize_session = False)
+            query.session.query(EventLink).filter(or_(EventLink.event_uuid.in_(chunk),
+                                                      EventLink.event_uuid_link.in_(chunk))).delete(synchronize_session = False)
+            query.session.query(Event).filter(Event.event_uuid.in_(chunk)).delete(synchronize_session = False)
+        # end for
+        query.session.commit()
+    except Exception:
+        query.session.rollback()
+        raise
+    # end try
+
+def rollup_aggregated_movements(aggregated_movements, periods):
+    """
+    Method to bucket the aggregated movements of shorter periods (months)
+    starting inside each longer period (years) by group or by entity
+
+    :param aggregated_movements: list of aggregated movements sorted by start
+    :type aggregated_movements: list of AggregatedMovement
+    :param periods: list of tuples (start, stop) with start included and stop excluded
+    :type periods: list
+
+    :return: dictionary with the amount and the list of UUIDs of the aggregated events per group or entity for each period
+    :rtype: dict
+    """
+    starts = [aggregated_movement.start for aggregated_movement in aggregated_movements]
+    aggregations = {}
+    for start, stop in periods:
+        buckets = aggregations.setdefault((start, stop), {})
+        for aggregated_movement in aggregated_movements[bisect_left(starts, start):bisect_left(starts, stop)]:
+            bucket = buckets.setdefault(aggregated_movement.name, {"amount": 0, "event_uuids": []})
+            bucket["amount"] += aggregated_movement.amount
+            bucket["event_uuids"].append(aggregated_movement.event_uuid)
+        # end for
+    # end for
+
+    return aggregations
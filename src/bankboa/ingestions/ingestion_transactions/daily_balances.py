@@ -0,0 +1,118 @@
+"""
+Materialized daily balances of the bank accounts
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import datetime
+from collections import namedtuple
+
+# Light representation of a MOVEMENT event for the daily balances
+MovementBalance = namedtuple("MovementBalance", ["start", "amount", "balance"])
+
+# Balance at the end of a day and money moved during the day
+DailyBalance = namedtuple("DailyBalance", ["day", "balance", "inflow", "outflow", "number_of_movements"])
+
+def get_operation_day(start):
+    """
+    Method to obtain the operation day of a movement from its start.
+
+    The movements sharing the operation date are moved back one microsecond each
+    from the midnight of the operation date, so the operation day is the start
+    rounded up to the next midnight
+
+    :param start: start of the MOVEMENT event
+    :type start: datetime
+
+    :return: midnight of the operation day
+    :rtype: datetime
+    """
+    day = datetime.datetime(start.year, start.month, start.day)
+    if day < start:
+        day += datetime.timedelta(days = 1)
+    # end if
+
+    return day
+
+def get_movement_balances_from_records(movement_records):
+    """
+    Method to obtain the light representation of movements not inserted yet
+
+    :param movement_records: movements of the statement
+    :type movement_records: iterable of MovementRecord
+
+    :return: list of movements
+    :rtype: list of MovementBalance
+    """
+    return [MovementBalance(datetime.datetime.fromisoformat(movement_record.start), movement_record.amount, movement_record.balance)
+            for movement_record in movement_records]
+
+def build_daily_balances(movement_balances):
+    """
+    Method to compute the balance at the end of each day and the inflow and outflow of the day.
+    Only the days with movements are returned
+
+    :param movement_balances: movements in any order
+    :type movement_balances: list of MovementBalance
+
+    :return: daily balances sorted by day
+    :rtype: list of DailyBalance
+    """
+    daily_balances = []
+    for movement in sorted(movement_balances, key = lambda movement: movement.start):
+        day = get_operation_day(movement.start)
+        if len(daily_balances) == 0 or daily_balances[-1].day != day:
+            daily_balances.append(DailyBalance(day, None, 0.0, 0.0, 0))
+        # end if
+        daily_balance = daily_balances[-1]
+
+        # The balance of the last movement of the day is the balance at the end of the day
+        daily_balances[-1] = DailyBalance(day,
+                                          movement.balance,
+                                          daily_balance.inflow + max(movement.amount, 0),
+                                          daily_balance.outflow + min(movement.amount, 0),
+                                          daily_balance.number_of_movements + 1)
+    # end for
+
+    return daily_balances
+
+def build_daily_balance_events(daily_balances):
+    """
+    Method to build the DAILY_BALANCE events covering each day
+
+    :param daily_balances: daily balances sorted by day
+    :type daily_balances: list of DailyBalance
+
+    :return: list of DAILY_BALANCE events
+    :rtype: list
+    """
+    daily_balance_events = []
+    for daily_balance in daily_balances:
+        daily_balance_events.append({
+            "gauge": {
+                "insertion_type": "INSERT_and_ERASE",
+                "name": "DAILY_BALANCE",
+                "system": "BANCO SANTANDER"
+            },
+            "start": daily_balance.day.isoformat(),
+            "stop": (daily_balance.day + datetime.timedelta(days = 1)).isoformat(),
+            "values": [
+                {"name": "balance",
+                 "type": "double",
+                 "value": daily_balance.balance},
+                {"name": "inflow",
+                 "type": "double",
+                 "value": daily_balance.inflow},
+                {"name": "outflow",
+                 "type": "double",
+                 "value": daily_balance.outflow},
+                {"name": "number_of_movements",
+                 "type": "double",
+                 "value": daily_balance.number_of_movements}
+            ]
+        })
+    # end for
+
+    return daily_balance_events
@@ -0,0 +1,152 @@
+"""
+Fingerprints of the content of the Santander statements to detect re-deliveries
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import hashlib
+from collections import namedtuple
+from dateutil import parser
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Hash of the normalized movements of a statement with the validity of its MOVEMENT events
+StatementFingerprint = namedtuple("StatementFingerprint", ["fingerprint", "number_of_movements", "validity_start", "validity_stop"])
+
+def _normalize_movements(prepared_movements):
+    """
+    Method to normalize the movements of a statement independently of the format of the workbook
+
+    :param prepared_movements: movements prepared by prepare_movements
+    :type prepared_movements: pandas.DataFrame
+
+    :return: one line per movement
+    :rtype: str
+    """
+    columns = zip(prepared_movements["operation_date"].tolist(),
+                  prepared_movements["value_date"].tolist(),
+                  prepared_movements["concept"].tolist(),
+                  prepared_movements["amount"].tolist(),
+                  prepared_movements["balance"].tolist())
+
+    return "".join(f"{operation_date}|{value_date}|{' '.join(str(concept).split())}|{amount:.2f}|{balance:.2f}\n"
+                   for operation_date, value_date, concept, amount, balance in columns)
+
+class StatementHasher():
+    """
+    Fingerprint of a statement obtained incrementally from its chunks of prepared movements,
+    so that it is computed in the same pass that builds the movements
+    """
+
+    def __init__(self):
+
+        self.content_hash = hashlib.sha256()
+        self.number_of_movements = 0
+        self.validity_start = None
+        self.validity_stop = None
+
+    def update(self, prepared_movements):
+        """
+        Method to add the next chunk of prepared movements of the statement
+
+        :param prepared_movements: movements prepared by prepare_movements
+        :type prepared_movements: pandas.DataFrame
+        """
+        if len(prepared_movements) == 0:
+            return
+        # end if
+        self.content_hash.update(_normalize_movements(prepared_movements).encode("utf-8"))
+        self.number_of_movements += len(prepared_movements)
+        chunk_start = prepared_movements["start"].min()
+        chunk_stop = prepared_movements["stop"].max()
+        self.validity_start = chunk_start if self.validity_start is None else min(self.validity_start, chunk_start)
+        self.validity_stop = chunk_stop if self.validity_stop is None else max(self.validity_stop, chunk_stop)
+
+    def get_fingerprint(self):
+        """
+        Method to obtain the fingerprint of the movements added
+
+        :return: fingerprint of the statement (None if the statement has no movements)
+        :rtype: StatementFingerprint
+        """
+        if self.number_of_movements == 0:
+            return None
+        # end if
+
+        return StatementFingerprint(self.content_hash.hexdigest(), self.number_of_movements, self.validity_start, self.validity_stop)
+
+def get_statement_fingerprint(chunks):
+    """
+    Method to obtain the fingerprint of the movements of a statement.
+    The rows are normalized before hashing so that the fingerprint does not depend
+    on the metadata of the workbook or on the representation of the cells
+
+    :param chunks: chunks of movements of the statement in order
+    :type chunks: iterable of pandas.DataFrame
+
+    :return: fingerprint of the statement (None if the statement has no movements)
+    :rtype: StatementFingerprint
+    """
+    statement_hasher = StatementHasher()
+    for prepared_movements in movements.iterate_prepared_movements(chunks):
+        statement_hasher.update(prepared_movements)
+    # end for
+
+    return statement_hasher.get_fingerprint()
+
+def build_fingerprint_event(statement_fingerprint):
+    """
+    Method to build the STATEMENT_FINGERPRINT event of a statement.
+
+    The event covers the validity of the MOVEMENT events of the statement, so a later
+    statement replacing part of the movements also cuts the event of the fingerprint
+
+    :param statement_fingerprint: fingerprint of the statement
+    :type statement_fingerprint: StatementFingerprint
+
+    :return: STATEMENT_FINGERPRINT event
+    :rtype: dict
+    """
+    return {
+        "gauge": {
+            "insertion_type": "INSERT_and_ERASE",
+            "name": "STATEMENT_FINGERPRINT",
+            "system": "BANCO SANTANDER"
+        },
+        "start": statement_fingerprint.validity_start,
+        "stop": statement_fingerprint.validity_stop,
+        "values": [
+            {"name": "fingerprint",
+             "type": "text",
+             "value": statement_fingerprint.fingerprint},
+            {"name": "number_of_movements",
+             "type": "double",
+             "value": statement_fingerprint.number_of_movements}
+        ]
+    }
+
+def is_statement_ingested(query, statement_fingerprint):
+    """
+    Method to check if the movements of a statement are the ones stored in the DDBB.
+    This is the case when the event of an identical fingerprint covers the whole
+    validity of the statement (it has not been cut by a later statement)
+
+    :param query: Query instance
+    :type query: Query
+    :param statement_fingerprint: fingerprint of the statement
+    :type statement_fingerprint: StatementFingerprint
+
+    :return: True if the statement has already been ingested
+    :rtype: bool
+    """
+    fingerprint_events = query.get_events(
+        gauge_names = {"filter": "STATEMENT_FINGERPRINT", "op": "=="},
+        value_filters = [{"name": {"filter": "fingerprint", "op": "=="}, "type": "text", "value": {"op": "==", "filter": statement_fingerprint.fingerprint}}])
+
+    validity_start = parser.parse(statement_fingerprint.validity_start)
+    validity_stop = parser.parse(statement_fingerprint.validity_stop)
+
+    return any(event.start == validity_start and event.stop == validity_stop for event in fingerprint_events)
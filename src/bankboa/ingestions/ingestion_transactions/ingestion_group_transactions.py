@@ -11,25 +11,34 @@ import argparse
 from dateutil import parser
 import datetime
 import json
-import openpyxl
-import pandas as pd
 from dateutil.relativedelta import relativedelta
 import pdb
 
-# Import xml parser
-from lxml import etree
-
 # Import EBOA ingestion functions helpers
-import eboa.ingestion.functions as eboa_ingestion_functions
 import eboa.ingestion.xpath_functions as xpath_functions
 from eboa.engine.functions import get_resources_path, get_schemas_path
 
 # Import query
 from eboa.engine.query import Query
 
+# Import engine exit codes
+import eboa.engine.engine as eboa_engine
+
 # Import datamodel
 from eboa.datamodel.events import Event, EventText
 
+# Import aggregation engine
+from bankboa.ingestions.ingestion_transactions import aggregation
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import instrumentation of the stages
+from bankboa.ingestions.ingestion_transactions import instrumentation
+
+# Import asynchronous writer of the ingestion progress
+from bankboa.ingestions.ingestion_transactions import progress
+
 # Import debugging
 from eboa.debugging import debug
 
@@ -44,19 +53,149 @@ logger = logging_module.logger
 
 version = "1.0"
 
+# Roll up the yearly aggregations from the monthly ones instead of from the movements
+rollup_years = os.environ.get("BANKBOA_ROLLUP_YEARS", "true").lower() == "true"
+
+def _build_aggregated_movements_events(update_event, buckets, names, value_name, gauge_name, back_ref = "MOVEMENT"):
+    """
+    Method to build the aggregated events of the transactions per group or per entity
+
+    :param update_event: event marking the period to be aggregated
+    :type update_event: Event
+    :param buckets: amount and list of event UUIDs per group or entity for the period
+    :type buckets: dict
+    :param names: names of the groups or entities with movements in the period in the order to be generated
+    :type names: list
+    :param value_name: name of the value holding the group or entity (group or entity)
+    :type value_name: str
+    :param gauge_name: name of the gauge of the aggregated events
+    :type gauge_name: str
+    :param back_ref: name of the link from the linked events (MOVEMENT or the gauge of the monthly aggregations)
+    :type back_ref: str
+
+    :return: list of aggregated events
+    :rtype: list
+    """
+    aggregated_events = []
+    for name in names:
+
+        bucket = buckets[name]
+
+        values = [
+            {"name": "bank",
+             "type": "text",
+             "value": "BANCO SANTANDER"},
+            {"name": value_name,
+             "type": "text",
+             "value": name},
+            {"name": "amount",
+             "type": "double",
+             "value": bucket["amount"]}
+        ]
+
+        links = []
+        for event_uuid in bucket["event_uuids"]:
+            links.append({
+                "link": str(event_uuid),
+                "link_mode": "by_uuid",
+                "name": gauge_name,
+                "back_ref": back_ref
+            })
+        # end for
+
+        aggregated_events.append({
+            "key": f"{gauge_name};{update_event.start.isoformat()};{name}",
+            "gauge": {
+                "insertion_type": "EVENT_KEYS",
+                "name": gauge_name,
+                "system": "BANCO SANTANDER"
+            },
+            "start": update_event.start.isoformat(),
+            "stop": update_event.stop.isoformat(),
+            "values": values,
+            "links": links
+        })
+    # end for
+
+    return aggregated_events
+
+def _get_names_to_aggregate(names, buckets, aggregated_names, changed_names):
+    """
+    Method to obtain the groups or entities to be aggregated for a period
+
+    :param names: configured names of the groups or entities in order
+    :type names: list
+    :param buckets: amount and list of event UUIDs per group or entity for the period
+    :type buckets: dict
+    :param aggregated_names: event UUIDs of the aggregated events already stored for the period per group or entity
+    :type aggregated_names: dict
+    :param changed_names: names changed since the last aggregation (None if all of them have to be aggregated)
+    :type changed_names: set
+
+    :return: tuple with the list of names with movements and the list of UUIDs of the stored aggregated events
+    of the names without movements (to be erased)
+    :rtype: tuple
+    """
+    candidates = names + sorted(set(aggregated_names).difference(names))
+    if changed_names is not None:
+        candidates = [name for name in candidates if name in changed_names]
+    # end if
+
+    # Names without movements in the period lose their stored aggregations
+    stale_event_uuids = []
+    for name in candidates:
+        if name not in buckets:
+            stale_event_uuids += aggregated_names.get(name, [])
+        # end if
+    # end for
+
+    return [name for name in candidates if name in buckets], stale_event_uuids
+
+def _erase_stale_aggregated_events(query, stale_event_uuids, ingestion_instrumentation):
+    """
+    Method to erase the aggregated events of the groups or entities left without movements in their periods
+
+    :param query: Query instance
+    :type query: Query
+    :param stale_event_uuids: UUIDs of the aggregated events
+    :type stale_event_uuids: list
+    :param ingestion_instrumentation: instrumentation of the stages of the ingestion
+    :type ingestion_instrumentation: Instrumentation
+    """
+    if len(stale_event_uuids) == 0:
+        return
+    # end if
+
+    with ingestion_instrumentation.stage("stale_erasure"):
+        aggregation.erase_aggregated_events(query, stale_event_uuids)
+    # end with
+    ingestion_instrumentation.count("stale_erasure", "events", len(stale_event_uuids))
+
 @debug
-def _generate_aggregated_movements_events(parsed_xls, source, engine, query):
+def _generate_aggregated_movements_events(source, engine, query, ingestion_instrumentation):
     """
     Method to generate the aggregated events of the transactions
 
-    :param parsed_xls: source of information already parsed
-    :type parsed_xls: pandas object
+    The MOVEMENT events of all the periods to be updated are obtained in bulk
+    and bucketed in memory by period and by group or entity.
+    Only the groups and entities registered as changed in the update events
+    are aggregated again (all of them if the update event does not register any)
+    and only their movements are obtained.
+    With the rollup of the years, only the months are aggregated from the movements.
+    The stored aggregated events of the groups and entities left without movements are erased
+    and their periods are returned to be marked as updated
+
     :param source: information of the source
     :type source: dict
     :param engine: Engine instance
     :type engine: Engine
     :param query: Query instance
     :type query: Query
+    :param ingestion_instrumentation: instrumentation of the stages of the ingestion
+    :type ingestion_instrumentation: Instrumentation
+
+    :return: aggregated events and periods with erased aggregated events per period type
+    :rtype: dict
     """
 
     # Default alert notification time
@@ -66,251 +205,226 @@ def _generate_aggregated_movements_events(parsed_xls, source, engine, query):
     # end if
 
     # Get XML configurations
-    groups_xml = etree.parse(get_resources_path() + "/groups.xml")
-    groups_xpath = etree.XPathEvaluator(groups_xml)
-    movement_groups = [node.text for node in groups_xpath("/groups/group/name")]
-    entities_xml = etree.parse(get_resources_path() + "/entities.xml")
-    entities_xpath = etree.XPathEvaluator(entities_xml)
-    movement_entities = [node.text for node in entities_xpath("/entities/entity/name")]
+    rules_matcher = rules.get_rules_matcher(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml")
+    movement_groups = rules_matcher.group_names
+    movement_entities = rules_matcher.entity_names
 
     events = {}
-    events["aggregated_movements_month"] = []
-
-    update_month_events = query.get_events(
-        gauge_names = {"filter": "UPDATE_MONTH", "op": "=="},
-        value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}],
-        order_by = {"field": "start", "descending": False})
-    
-    # Iterate through events
-    for event in update_month_events:
-
-        # Iterate through groups
-        for group in movement_groups + ["Spending no group", "Income no group"]:
-            
-            movement_events = query.get_events(
-                gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                start_filters = [{"date": event.stop.isoformat(), "op": "<"}, {"date": event.start.isoformat(), "op": ">="}],
-                value_filters = [{"name": {"filter": "group%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": group}}])
-
-            if len(movement_events) == 0:
-                continue
-
-            movement_events_uuids = [event.event_uuid for event in movement_events]
-            
-            amounts = [amount.value for event in movement_events for amount in event.eventDoubles if amount.name == "amount"]
-            
-            amount = sum(amounts)
-
-            values = [
-                {"name": "bank",
-                 "type": "text",
-                 "value": "BANCO SANTANDER"},
-                {"name": "group",
-                 "type": "text",
-                 "value": group},
-                {"name": "amount",
-                 "type": "double",
-                 "value": amount}
-            ]
-
-            links = []
-            for event_uuid in movement_events_uuids:
-                links.append({
-                    "link": str(event_uuid),
-                    "link_mode": "by_uuid",
-                    "name": "AGGREGATED_MOVEMENTS_GROUP_MONTH",
-                    "back_ref": "MOVEMENT"
-                })
-            # end for
 
-            events["aggregated_movements_month"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "AGGREGATED_MOVEMENTS_GROUP_MONTH",
-                    "system": "BANCO SANTANDER"
-                },
-                "start": event.start.isoformat(),
-                "stop": event.stop.isoformat(),
-                "values": values,
-                "links": links
-            })
-
-        # end for
-
-        # Iterate through entities
-        for entity in movement_entities + ["No entity"]:
-            
-            movement_events = query.get_events(
-                gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                start_filters = [{"date": event.stop.isoformat(), "op": "<"}, {"date": event.start.isoformat(), "op": ">="}],
-                value_filters = [{"name": {"filter": "entity%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": entity}}])
-
-            if len(movement_events) == 0:
-                continue
-
-            movement_events_uuids = [event.event_uuid for event in movement_events]
-            
-            amounts = [amount.value for event in movement_events for amount in event.eventDoubles if amount.name == "amount"]
-            
-            amount = sum(amounts)
-
-            values = [
-                {"name": "bank",
-                 "type": "text",
-                 "value": "BANCO SANTANDER"},
-                {"name": "entity",
-                 "type": "text",
-                 "value": entity},
-                {"name": "amount",
-                 "type": "double",
-                 "value": amount}
-            ]
-
-            links = []
-            for event_uuid in movement_events_uuids:
-                links.append({
-                    "link": str(event_uuid),
-                    "link_mode": "by_uuid",
-                    "name": "AGGREGATED_MOVEMENTS_ENTITY_MONTH",
-                    "back_ref": "MOVEMENT"
-                })
+    with ingestion_instrumentation.stage("aggregation_queries"):
+        update_month_events = query.get_events(
+            gauge_names = {"filter": "UPDATE_MONTH", "op": "=="},
+            value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}],
+            order_by = {"field": "start", "descending": False})
+
+        # With the rollup, the years are aggregated from the months once these are inserted
+        update_year_events = []
+        if not rollup_years:
+            update_year_events = query.get_events(
+                gauge_names = {"filter": "UPDATE_YEAR", "op": "=="},
+                value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}],
+                order_by = {"field": "start", "descending": False})
+        # end if
+
+        # Obtain the groups and entities to be aggregated again per update event
+        update_keys = aggregation.get_update_keys(query, update_month_events + update_year_events)
+
+        # Obtain the movements of all the periods to be updated at once
+        # (only the ones of the changed groups and entities where these are registered)
+        periods = [(event.start, event.stop) for event in update_month_events + update_year_events]
+        movements = aggregation.get_update_movements(query, update_month_events + update_year_events, update_keys)
+    # end with
+    ingestion_instrumentation.count("aggregation_queries", "movements", len(movements))
+
+    with ingestion_instrumentation.stage("aggregation"):
+        aggregations_groups = aggregation.aggregate_movements(movements, periods, "groups")
+        aggregations_entities = aggregation.aggregate_movements(movements, periods, "entities")
+    # end with
+
+    movement_groups = movement_groups + ["Spending no group", "Income no group"]
+    movement_entities = movement_entities + ["No entity"]
+
+    for events_name, erased_name, update_events, period_name in [("aggregated_movements_month", "erased_periods_month", update_month_events, "MONTH"),
+                                                                 ("aggregated_movements_year", "erased_periods_year", update_year_events, "YEAR")]:
+        group_gauge_name = f"AGGREGATED_MOVEMENTS_GROUP_{period_name}"
+        entity_gauge_name = f"AGGREGATED_MOVEMENTS_ENTITY_{period_name}"
+        update_periods = [(event.start, event.stop) for event in update_events]
+        with ingestion_instrumentation.stage("aggregation_queries"):
+            aggregated_groups = aggregation.get_aggregated_events_per_name(query, group_gauge_name, "group", update_periods)
+            aggregated_entities = aggregation.get_aggregated_events_per_name(query, entity_gauge_name, "entity", update_periods)
+        # end with
+
+        events[events_name] = []
+        events[erased_name] = []
+        stale_event_uuids = []
+        with ingestion_instrumentation.stage("event_build"):
+            for event in update_events:
+                keys = update_keys[event.event_uuid]
+                group_buckets = aggregations_groups[(event.start, event.stop)]
+                group_names, stale_group_event_uuids = _get_names_to_aggregate(movement_groups, group_buckets, aggregated_groups.get(event.start, {}), keys["groups"] if keys is not None else None)
+                events[events_name] += _build_aggregated_movements_events(event, group_buckets, group_names, "group", group_gauge_name)
+
+                entity_buckets = aggregations_entities[(event.start, event.stop)]
+                entity_names, stale_entity_event_uuids = _get_names_to_aggregate(movement_entities, entity_buckets, aggregated_entities.get(event.start, {}), keys["entities"] if keys is not None else None)
+                events[events_name] += _build_aggregated_movements_events(event, entity_buckets, entity_names, "entity", entity_gauge_name)
+
+                if len(stale_group_event_uuids + stale_entity_event_uuids) > 0:
+                    stale_event_uuids += stale_group_event_uuids + stale_entity_event_uuids
+                    events[erased_name].append((event.start.isoformat(), event.stop.isoformat()))
+                # end if
             # end for
+        # end with
+        ingestion_instrumentation.count("event_build", "events", len(events[events_name]))
 
-            events["aggregated_movements_month"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "AGGREGATED_MOVEMENTS_ENTITY_MONTH",
-                    "system": "BANCO SANTANDER"
-                },
-                "start": event.start.isoformat(),
-                "stop": event.stop.isoformat(),
-                "values": values,
-                "links": links
-            })
-
-        # end for
-
+        _erase_stale_aggregated_events(query, stale_event_uuids, ingestion_instrumentation)
     # end for
 
-    events["aggregated_movements_year"] = []
+    return events
 
-    update_year_events = query.get_events(
-        gauge_names = {"filter": "UPDATE_YEAR", "op": "=="},
-        value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}],
-        order_by = {"field": "start", "descending": False})
-    
-    # Iterate through events
-    for event in update_year_events:
+@debug
+def _generate_rolled_up_aggregated_movements_events(query, ingestion_instrumentation):
+    """
+    Method to generate the yearly aggregated events of the transactions
+    adding up the stored monthly aggregated events (linked instead of the movements).
+    The stored yearly aggregated events of the groups and entities left without monthly aggregations are erased
 
-        # Iterate through groups
-        for group in movement_groups + ["Spending no group", "Income no group"]:
-            
-            movement_events = query.get_events(
-                gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                start_filters = [{"date": event.stop.isoformat(), "op": "<"}, {"date": event.start.isoformat(), "op": ">="}],
-                value_filters = [{"name": {"filter": "group%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": group}}])
-            
-            if len(movement_events) == 0:
-                continue
+    :param query: Query instance
+    :type query: Query
+    :param ingestion_instrumentation: instrumentation of the stages of the ingestion
+    :type ingestion_instrumentation: Instrumentation
 
-            movement_events_uuids = [event.event_uuid for event in movement_events]
-            
-            amounts = [amount.value for event in movement_events for amount in event.eventDoubles if amount.name == "amount"]
-            
-            amount = sum(amounts)
-
-            values = [
-                {"name": "bank",
-                 "type": "text",
-                 "value": "BANCO SANTANDER"},
-                {"name": "group",
-                 "type": "text",
-                 "value": group},
-                {"name": "amount",
-                 "type": "double",
-                 "value": amount}
-            ]
-
-            links = []
-            for event_uuid in movement_events_uuids:
-                links.append({
-                    "link": str(event_uuid),
-                    "link_mode": "by_uuid",
-                    "name": "AGGREGATED_MOVEMENTS_GROUP_YEAR",
-                    "back_ref": "MOVEMENT"
-                })
+    :return: tuple with the list of yearly aggregated events and the list of periods with erased aggregated events
+    :rtype: tuple
+    """
+    rules_matcher = rules.get_rules_matcher(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml")
+
+    with ingestion_instrumentation.stage("aggregation_queries"):
+        update_year_events = query.get_events(
+            gauge_names = {"filter": "UPDATE_YEAR", "op": "=="},
+            value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}],
+            order_by = {"field": "start", "descending": False})
+
+        periods = [(event.start, event.stop) for event in update_year_events]
+        update_keys = aggregation.get_update_keys(query, update_year_events)
+    # end with
+
+    aggregated_events = []
+    erased_periods = set()
+    stale_event_uuids = []
+    for value_name, keys_name, names in [("group", "groups", rules_matcher.group_names + ["Spending no group", "Income no group"]),
+                                         ("entity", "entities", rules_matcher.entity_names + ["No entity"])]:
+        month_gauge_name = f"AGGREGATED_MOVEMENTS_{value_name.upper()}_MONTH"
+        year_gauge_name = f"AGGREGATED_MOVEMENTS_{value_name.upper()}_YEAR"
+        with ingestion_instrumentation.stage("aggregation_queries"):
+            month_aggregated_movements = aggregation.get_aggregated_movements(query, month_gauge_name, value_name, periods)
+            aggregated_names = aggregation.get_aggregated_events_per_name(query, year_gauge_name, value_name, periods)
+        # end with
+        ingestion_instrumentation.count("aggregation_queries", "monthly_aggregations", len(month_aggregated_movements))
+
+        with ingestion_instrumentation.stage("rollup"):
+            aggregations = aggregation.rollup_aggregated_movements(month_aggregated_movements, periods)
+        # end with
+
+        with ingestion_instrumentation.stage("event_build"):
+            for event in update_year_events:
+                keys = update_keys[event.event_uuid]
+                buckets = aggregations[(event.start, event.stop)]
+                names_to_aggregate, stale_names_event_uuids = _get_names_to_aggregate(names, buckets, aggregated_names.get(event.start, {}), keys[keys_name] if keys is not None else None)
+                aggregated_events += _build_aggregated_movements_events(event, buckets, names_to_aggregate, value_name, year_gauge_name, back_ref = month_gauge_name)
+
+                if len(stale_names_event_uuids) > 0:
+                    stale_event_uuids += stale_names_event_uuids
+                    erased_periods.add((event.start.isoformat(), event.stop.isoformat()))
+                # end if
             # end for
+        # end with
+    # end for
+    ingestion_instrumentation.count("event_build", "events", len(aggregated_events))
 
-            events["aggregated_movements_year"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "AGGREGATED_MOVEMENTS_GROUP_YEAR",
-                    "system": "BANCO SANTANDER"
-                },
-                "start": event.start.isoformat(),
-                "stop": event.stop.isoformat(),
-                "values": values,
-                "links": links
-            })
+    _erase_stale_aggregated_events(query, stale_event_uuids, ingestion_instrumentation)
 
-        # end for
+    return aggregated_events, sorted(erased_periods)
 
-        # Iterate through entities
-        for entity in movement_entities + ["No entity"]:
-            
-            movement_events = query.get_events(
-                gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                start_filters = [{"date": event.stop.isoformat(), "op": "<"}, {"date": event.start.isoformat(), "op": ">="}],
-                value_filters = [{"name": {"filter": "entity%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": entity}}])
+def _erase_legacy_aggregated_events(engine, query, file_name, reception_time, ingestion_instrumentation):
+    """
+    Method to erase the aggregated events stored before the aggregations were inserted as EVENT_KEYS
+    (the keyed aggregations do not replace them). The periods of these events are marked first to
+    aggregate all their groups and entities, so a failure only postpones their aggregation
 
-            if len(movement_events) == 0:
-                continue
+    :param engine: Engine instance
+    :type engine: Engine
+    :param query: Query instance
+    :type query: Query
+    :param file_name: name of the file being processed
+    :type file_name: str
+    :param reception_time: time of the reception of the file by the triggering
+    :type reception_time: str
+    :param ingestion_instrumentation: instrumentation of the stages of the ingestion
+    :type ingestion_instrumentation: Instrumentation
+    """
+    with ingestion_instrumentation.stage("aggregation_queries"):
+        legacy_events = aggregation.get_legacy_aggregated_events(query)
+    # end with
+    if len(legacy_events) == 0:
+        return
+    # end if
 
-            movement_events_uuids = [event.event_uuid for event in movement_events]
-            
-            amounts = [amount.value for event in movement_events for amount in event.eventDoubles if amount.name == "amount"]
-            
-            amount = sum(amounts)
-
-            values = [
-                {"name": "bank",
-                 "type": "text",
-                 "value": "BANCO SANTANDER"},
-                {"name": "entity",
-                 "type": "text",
-                 "value": entity},
-                {"name": "amount",
-                 "type": "double",
-                 "value": amount}
-            ]
-
-            links = []
-            for event_uuid in movement_events_uuids:
-                links.append({
-                    "link": str(event_uuid),
-                    "link_mode": "by_uuid",
-                    "name": "AGGREGATED_MOVEMENTS_ENTITY_YEAR",
-                    "back_ref": "MOVEMENT"
+    operations = []
+    for period_name, gauge_name, dim_signature, delta in [("MONTH", "UPDATE_MONTH", "UPDATE_MONTHS_SANTANDER", relativedelta(months=1)),
+                                                          ("YEAR", "UPDATE_YEAR", "UPDATE_YEARS_SANTANDER", relativedelta(years=1))]:
+        period_starts = set(start for event_uuid, legacy_gauge_name, start in legacy_events if legacy_gauge_name.endswith(period_name))
+        for start, stop in aggregation.coalesce_periods([(period_start, period_start + delta) for period_start in period_starts]):
+            update_events = []
+            period_start = start
+            while period_start < stop:
+                update_events.append({
+                    "gauge": {
+                        "insertion_type": "INSERT_and_ERASE",
+                        "name": gauge_name,
+                        "system": "BANCO SANTANDER"
+                    },
+                    "start": period_start.isoformat(),
+                    "stop": (period_start + delta).isoformat(),
+                    "values": [
+                        {"name": "status",
+                         "type": "text",
+                         "value": "UPDATE"}
+                    ]
                 })
-            # end for
-
-            events["aggregated_movements_year"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "AGGREGATED_MOVEMENTS_ENTITY_YEAR",
-                    "system": "BANCO SANTANDER"
+                period_start = period_start + delta
+            # end while
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": dim_signature,
+                    "exec": os.path.basename(__file__),
+                    "version": version
                 },
-                "start": event.start.isoformat(),
-                "stop": event.stop.isoformat(),
-                "values": values,
-                "links": links
+                "source": {
+                    "name": f"{file_name}#LEGACY_AGGREGATIONS#{len(operations)}",
+                    "reception_time": reception_time,
+                    "generation_time": aggregation.get_update_generation_time(query, dim_signature, start, stop).isoformat(),
+                    "reported_validity_start": start.isoformat(),
+                    "reported_validity_stop": stop.isoformat(),
+                    "validity_start": start.isoformat(),
+                    "validity_stop": stop.isoformat()
+                },
+                "events": update_events
             })
-
         # end for
-
     # end for
 
-    return events
+    with ingestion_instrumentation.stage("legacy_erasure"):
+        exit_status = engine.treat_data({"operations": operations})
+        if len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) > 0:
+            logger.error(f"The periods of {len(legacy_events)} aggregated events without key could not be marked to be aggregated, so the events are not erased")
+            return
+        # end if
+        aggregation.erase_aggregated_events(query, [event_uuid for event_uuid, legacy_gauge_name, start in legacy_events])
+    # end with
+    ingestion_instrumentation.count("legacy_erasure", "events", len(legacy_events))
+    logger.info(f"Erased {len(legacy_events)} aggregated events without key, their periods are aggregated again")
 
 def process_file(file_path, engine, query, reception_time):
     """Function to process the file and insert its relevant information
@@ -337,30 +451,19 @@ def process_file(file_path, engine, query, reception_time):
 
     file_name = os.path.basename(file_path)
 
-    # Get the general source entry (processor = None, version = None, DIM signature = PENDING_SOURCES)
-    # This is for registrering the ingestion progress
-    query_general_source = Query()
-    session_progress = query_general_source.session
-    general_source_progress = query_general_source.get_sources(names = {"filter": file_name, "op": "=="},
-                                                               dim_signatures = {"filter": "PENDING_SOURCES", "op": "=="},
-                                                               processors = {"filter": "", "op": "=="},
-                                                               processor_version_filters = [{"filter": "", "op": "=="}])
-
-    if len(general_source_progress) > 0:
-        general_source_progress = general_source_progress[0]
-    # end if
+    # Measure the stages of the ingestion
+    ingestion_instrumentation = instrumentation.Instrumentation(file_name, __name__)
+    ingestion_instrumentation.start()
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
+    # The progress is registered in the PENDING_SOURCES entry of the file by a background writer
+    progress.report(file_name, 10)
     
-    # Parse file
-    parsed_xls = pd.read_excel(file_path, header = 7)
-
     # Set metadata of source
     generation_time = (parser.parse(file_name[19:34]) + datetime.timedelta(microseconds=1)).isoformat()
     reported_validity_start = file_name[35:50]
     reported_validity_stop = file_name[51:66]
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 20)
+    progress.report(file_name, 20)
 
     source = {
         "name": file_name,
@@ -370,7 +473,7 @@ def process_file(file_path, engine, query, reception_time):
         "reported_validity_stop": reported_validity_stop
     }
     
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 40)
+    progress.report(file_name, 40)
 
     # Default alert notification time
     notification_time = (parser.parse(source["reported_validity_start"]) - datetime.timedelta(days=1)).isoformat()
@@ -378,10 +481,13 @@ def process_file(file_path, engine, query, reception_time):
         notification_time = datetime.datetime.now().isoformat()
     # end if
 
+    # Erase the aggregations stored without key (the periods are marked to be aggregated in this run)
+    _erase_legacy_aggregated_events(engine, query, file_name, reception_time, ingestion_instrumentation)
+
     # Generate aggregated events
-    events = _generate_aggregated_movements_events(parsed_xls, source, engine, query)
+    events = _generate_aggregated_movements_events(source, engine, query, ingestion_instrumentation)
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 90)
+    progress.report(file_name, 90)
     
     # Build the xml
     operations = []
@@ -393,145 +499,193 @@ def process_file(file_path, engine, query, reception_time):
         "message": ingestion_completeness_message
     } 
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 94)
+    progress.report(file_name, 94)
     
-    # Insert aggregated movements events
-    if len(events["aggregated_movements_month"]):
-        event_starts = [event["start"] for event in events["aggregated_movements_month"]]
-        event_starts.sort()
-        event_stops = [event["stop"] for event in events["aggregated_movements_month"]]
-        event_stops.sort()
+    # Build the operations (with the rollup of the years)
+    months_inserted = True
+    with ingestion_instrumentation.stage("operation_assembly"):
+        # Insert aggregated movements events
+        if len(events["aggregated_movements_month"]):
+            event_starts = [event["start"] for event in events["aggregated_movements_month"]]
+            event_starts.sort()
+            event_stops = [event["stop"] for event in events["aggregated_movements_month"]]
+            event_stops.sort()
     
-        source["validity_start"] = event_starts[0]
-        source["validity_stop"] = event_stops[-1]
+            source["validity_start"] = event_starts[0]
+            source["validity_stop"] = event_stops[-1]
             
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "AGGREGATED_MOVEMENTS_MONTH_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["aggregated_movements_month"]
-        })
-
-        eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 95)
-
-        events["update_months"] = []
-        month_start = parser.parse(event_starts[0][0:7], default=datetime.datetime(2015, 1, 1))
-        first_month_start = month_start
-        month_stop = month_start + relativedelta(months=1)
-        while month_start.isoformat() < event_stops[-1]:
-            last_month_stop = month_stop
-            events["update_months"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "UPDATE_MONTH",
-                    "system": "BANCO SANTANDER"
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "AGGREGATED_MOVEMENTS_MONTH_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
                 },
-                "start": month_start.isoformat(),
-                "stop": month_stop.isoformat(),
-                "values": [
-                    {"name": "status",
-                     "type": "text",
-                     "value": "UPDATED"}
-                ]
+                "source": source,
+                "events": events["aggregated_movements_month"]
             })
-            month_start = month_stop
-            month_stop = month_stop + relativedelta(months=1)
-        # end while
-
-        source = {
-            "name": file_name,
-            "reception_time": reception_time,
-            "generation_time": generation_time,
-            "reported_validity_start": reported_validity_start,
-            "reported_validity_stop": reported_validity_stop,
-            "validity_start": first_month_start.isoformat(),
-            "validity_stop": last_month_stop.isoformat()
-        }
-
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "UPDATE_MONTHS_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["update_months"]
-        })
 
-        eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 96)
+            if rollup_years:
+                # The years are rolled up from the stored monthly aggregations, so these are inserted first
+                with ingestion_instrumentation.stage("monthly_insertion"):
+                    exit_status = engine.treat_data({"operations": [operations.pop()]})
+                # end with
+                months_inserted = len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+                if not months_inserted:
+                    # The months and the years remain marked to be updated
+                    logger.error(f"The monthly aggregations of {file_name} could not be inserted so the months are not marked as updated and the years are not rolled up")
+                # end if
+            # end if
+        # end if
+
+        # Mark as updated the months aggregated (also the ones where only aggregations were erased)
+        event_starts = sorted([event["start"] for event in events["aggregated_movements_month"]] + [start for start, stop in events["erased_periods_month"]])
+        event_stops = sorted([event["stop"] for event in events["aggregated_movements_month"]] + [stop for start, stop in events["erased_periods_month"]])
+        if months_inserted and len(event_starts):
+            progress.report(file_name, 95)
+
+            events["update_months"] = []
+            month_start = parser.parse(event_starts[0][0:7], default=datetime.datetime(2015, 1, 1))
+            first_month_start = month_start
+            month_stop = month_start + relativedelta(months=1)
+            while month_start.isoformat() < event_stops[-1]:
+                last_month_stop = month_stop
+                events["update_months"].append({
+                    "gauge": {
+                        "insertion_type": "INSERT_and_ERASE",
+                        "name": "UPDATE_MONTH",
+                        "system": "BANCO SANTANDER"
+                    },
+                    "start": month_start.isoformat(),
+                    "stop": month_stop.isoformat(),
+                    "values": [
+                        {"name": "status",
+                         "type": "text",
+                         "value": "UPDATED"}
+                    ]
+                })
+                month_start = month_stop
+                month_stop = month_stop + relativedelta(months=1)
+            # end while
+
+            # The marks aggregated by this ingestion are superseded (also the ones of the reclassification)
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": aggregation.get_update_generation_time(query, "UPDATE_MONTHS_SANTANDER", first_month_start, last_month_stop, parser.parse(generation_time)).isoformat(),
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": first_month_start.isoformat(),
+                "validity_stop": last_month_stop.isoformat()
+            }
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "UPDATE_MONTHS_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
+                },
+                "source": source,
+                "events": events["update_months"]
+            })
 
-        event_starts = [event["start"] for event in events["aggregated_movements_year"]]
-        event_starts.sort()
-        event_stops = [event["stop"] for event in events["aggregated_movements_year"]]
-        event_stops.sort()
-    
-        source["validity_start"] = event_starts[0]
-        source["validity_stop"] = event_stops[-1]
-            
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "AGGREGATED_MOVEMENTS_YEAR_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["aggregated_movements_year"]
-        })
+            progress.report(file_name, 96)
+        # end if
+
+        # Roll up the years marked to be updated (also when no month had to be aggregated again)
+        if rollup_years and months_inserted:
+            events["aggregated_movements_year"], events["erased_periods_year"] = _generate_rolled_up_aggregated_movements_events(query, ingestion_instrumentation)
+        # end if
+
+        # Insert yearly aggregated movements events
+        if len(events["aggregated_movements_year"]):
+            event_starts = [event["start"] for event in events["aggregated_movements_year"]]
+            event_starts.sort()
+            event_stops = [event["stop"] for event in events["aggregated_movements_year"]]
+            event_stops.sort()
+
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": generation_time,
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": event_starts[0],
+                "validity_stop": event_stops[-1]
+            }
+        
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "AGGREGATED_MOVEMENTS_YEAR_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
+                },
+                "source": source,
+                "events": events["aggregated_movements_year"]
+            })
 
-        eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 97)
-
-        events["update_years"] = []
-        year_start = parser.parse(event_starts[0][0:7], default=datetime.datetime(2015, 1, 1))
-        first_year_start = year_start
-        year_stop = year_start + relativedelta(years=1)
-        while year_start.isoformat() < event_stops[-1]:
-            last_year_stop = year_stop
-            events["update_years"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "UPDATE_YEAR",
-                    "system": "BANCO SANTANDER"
+            progress.report(file_name, 97)
+        # end if
+
+        # Mark as updated the years aggregated (also the ones where only aggregations were erased)
+        event_starts = sorted([event["start"] for event in events["aggregated_movements_year"]] + [start for start, stop in events["erased_periods_year"]])
+        event_stops = sorted([event["stop"] for event in events["aggregated_movements_year"]] + [stop for start, stop in events["erased_periods_year"]])
+        if len(event_starts):
+            events["update_years"] = []
+            year_start = parser.parse(event_starts[0][0:7], default=datetime.datetime(2015, 1, 1))
+            first_year_start = year_start
+            year_stop = year_start + relativedelta(years=1)
+            while year_start.isoformat() < event_stops[-1]:
+                last_year_stop = year_stop
+                events["update_years"].append({
+                    "gauge": {
+                        "insertion_type": "INSERT_and_ERASE",
+                        "name": "UPDATE_YEAR",
+                        "system": "BANCO SANTANDER"
+                    },
+                    "start": year_start.isoformat(),
+                    "stop": year_stop.isoformat(),
+                    "values": [
+                        {"name": "status",
+                         "type": "text",
+                         "value": "UPDATED"}
+                    ]
+                })
+                year_start = year_stop
+                year_stop = year_stop + relativedelta(years=1)
+            # end while
+
+            # The marks aggregated by this ingestion are superseded (also the ones of the reclassification)
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": aggregation.get_update_generation_time(query, "UPDATE_YEARS_SANTANDER", first_year_start, last_year_stop, parser.parse(generation_time)).isoformat(),
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": first_year_start.isoformat(),
+                "validity_stop": last_year_stop.isoformat()
+            }
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "UPDATE_YEARS_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
                 },
-                "start": year_start.isoformat(),
-                "stop": year_stop.isoformat(),
-                "values": [
-                    {"name": "status",
-                     "type": "text",
-                     "value": "UPDATED"}
-                ]
+                "source": source,
+                "events": events["update_years"]
             })
-            year_start = year_stop
-            year_stop = year_stop + relativedelta(years=1)
-        # end while
-
-        source = {
-            "name": file_name,
-            "reception_time": reception_time,
-            "generation_time": generation_time,
-            "reported_validity_start": reported_validity_start,
-            "reported_validity_stop": reported_validity_stop,
-            "validity_start": first_year_start.isoformat(),
-            "validity_stop": last_year_stop.isoformat()
-        }
-
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "UPDATE_YEARS_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["update_years"]
-        })
-    # end if
+        # end if
+    # end with
+    ingestion_instrumentation.count("operation_assembly", "operations", len(operations))
+
+    progress.report(file_name, 100)
 
     query.close_session()
 
+    logger.info(ingestion_instrumentation.emit())
+
     return data
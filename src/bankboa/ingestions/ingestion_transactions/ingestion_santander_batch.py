@@ -0,0 +1,185 @@
+"""
+Batch ingestion of MOVEMENTS files from Santander bank
+
+The files are parsed and their MOVEMENT events generated in a pool of
+processes while the resulting operations are handed to the eboa engine
+one file at a time in generation time order
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import argparse
+import datetime
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Import EBOA ingestion
+import eboa.ingestion.eboa_ingestion as ingestion
+import eboa.engine.engine as eboa_engine
+from eboa.engine.functions import get_resources_path
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import fingerprints of the statements
+from bankboa.ingestions.ingestion_transactions import fingerprints
+
+# Import ingestion of the Santander movements
+from bankboa.ingestions.ingestion_transactions import ingestion_santander_transactions
+
+# Import logging
+from eboa.logging import Log
+
+logging_module = Log(name = __name__)
+logger = logging_module.logger
+
+INGESTION_MODULE = "bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions"
+
+def get_generation_time(file_path):
+    """
+    Method to obtain the generation time from the name of a MOVEMENTS file
+
+    :param file_path: path to the file
+    :type file_path: str
+
+    :return: generation time as in the name of the file
+    :rtype: str
+    """
+    return os.path.basename(file_path)[19:34]
+
+def _generate_file_movements_events(file_path):
+    """
+    Method to parse a MOVEMENTS file and generate its movements and its fingerprint
+    (executed in the processes of the pool, the compact movements are cheaper to send back)
+
+    :param file_path: path to the file
+    :type file_path: str
+
+    :return: tuple with the movements, the fingerprint of the statement and the elapsed time in seconds
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    rules_matcher = rules.get_rules_matcher(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml")
+    # The fingerprint is obtained in the same pass that builds the movements
+    statement_hasher = fingerprints.StatementHasher()
+    movements_events = movements.MovementRecords(movements.iterate_movement_records(movements.read_statement(file_path), rules_matcher, statement_hasher.update))
+    statement_fingerprint = statement_hasher.get_fingerprint()
+
+    return movements_events, statement_fingerprint, time.perf_counter() - start
+
+def ingest_files(file_paths, processes = None, reception_time = None):
+    """
+    Method to ingest a batch of MOVEMENTS files.
+
+    The generation of the events is distributed through a pool of processes
+    keeping a bounded number of files in flight, while the insertion is
+    performed in generation time order to preserve the INSERT_and_ERASE semantics
+
+    :param file_paths: paths to the files
+    :type file_paths: list
+    :param processes: number of processes of the pool (number of CPUs by default)
+    :type processes: int
+    :param reception_time: time of the reception of the files (now by default)
+    :type reception_time: str
+
+    :return: timings per file and of the whole batch
+    :rtype: dict
+    """
+    if reception_time is None:
+        reception_time = datetime.datetime.now().isoformat()
+    # end if
+    if processes is None:
+        processes = os.cpu_count() or 1
+    # end if
+
+    file_paths = sorted(file_paths, key = lambda file_path: (get_generation_time(file_path), os.path.basename(file_path)))
+
+    report = {"files": [], "movements": 0, "errors": 0}
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers = processes) as executor:
+        pending = deque()
+        next_file = 0
+        while next_file < len(file_paths) or len(pending) > 0:
+            # Keep the pool busy while the previous files are being inserted
+            while next_file < len(file_paths) and len(pending) < 2 * processes:
+                pending.append((file_paths[next_file], executor.submit(_generate_file_movements_events, file_paths[next_file])))
+                next_file += 1
+            # end while
+
+            file_path, future = pending.popleft()
+            wait_start = time.perf_counter()
+            try:
+                movements_events, statement_fingerprint, generation_elapsed = future.result()
+            except Exception as exception:
+                # Let the ingestion parse the file and register the failure
+                logger.error(f"The events of the file {file_path} could not be generated in the pool: {exception}")
+                movements_events = None
+                statement_fingerprint = None
+                generation_elapsed = 0
+            # end try
+            wait_elapsed = time.perf_counter() - wait_start
+
+            if movements_events is not None:
+                ingestion_santander_transactions.precompute_movements_events(file_path, movements_events, statement_fingerprint)
+            # end if
+            ingestion_start = time.perf_counter()
+            exit_status = ingestion.command_process_file(INGESTION_MODULE, file_path, reception_time)
+            ingestion_elapsed = time.perf_counter() - ingestion_start
+
+            # Release the events if the ingestion did not consume them
+            ingestion_santander_transactions.precomputed_movements_events.pop(os.path.abspath(file_path), None)
+            ingestion_santander_transactions.precomputed_fingerprints.pop(os.path.abspath(file_path), None)
+
+            failed = len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) > 0
+            if failed:
+                report["errors"] += 1
+            # end if
+
+            number_of_movements = len(movements_events) if movements_events is not None else 0
+            file_report = {
+                "file": os.path.basename(file_path),
+                "movements": number_of_movements,
+                "generation": generation_elapsed,
+                "wait": wait_elapsed,
+                "ingestion": ingestion_elapsed,
+                "ok": not failed
+            }
+            report["files"].append(file_report)
+            report["movements"] += number_of_movements
+            logger.info(f"Ingested file {file_report['file']} with {file_report['movements']} movements (generation: {generation_elapsed:.3f} s, wait: {wait_elapsed:.3f} s, ingestion: {ingestion_elapsed:.3f} s)")
+        # end while
+    # end with
+
+    report["elapsed"] = time.perf_counter() - batch_start
+    report["files_per_second"] = len(report["files"]) / report["elapsed"] if report["elapsed"] > 0 else 0
+    report["movements_per_second"] = report["movements"] / report["elapsed"] if report["elapsed"] > 0 else 0
+
+    return report
+
+def main():
+
+    args_parser = argparse.ArgumentParser(description="Batch ingestion of MOVEMENTS files from Santander bank")
+    args_parser.add_argument("file_paths", nargs="+",
+                             help="Paths to the MOVEMENTS files")
+    args_parser.add_argument("-p", dest="processes", type=int, default=None,
+                             help="Number of processes generating the events (number of CPUs by default)")
+    args = args_parser.parse_args()
+
+    report = ingest_files(args.file_paths, processes = args.processes)
+
+    for file_report in report["files"]:
+        print(f"{file_report['file']}: {file_report['movements']} movements, generation {file_report['generation']:.3f} s, wait {file_report['wait']:.3f} s, ingestion {file_report['ingestion']:.3f} s{'' if file_report['ok'] else ' (FAILED)'}")
+    # end for
+    print(f"Files: {len(report['files'])}, movements: {report['movements']}, errors: {report['errors']}, elapsed: {report['elapsed']:.3f} s")
+    print(f"Throughput: {report['files_per_second']:.2f} files/s, {report['movements_per_second']:.1f} movements/s")
+
+if __name__ == "__main__":
+
+    main()
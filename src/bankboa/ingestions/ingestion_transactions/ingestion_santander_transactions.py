@@ -7,24 +7,44 @@ module bankboa
 """
 # Import python utilities
 import os
+import copy
 import argparse
 from dateutil import parser
 import datetime
 import json
-import pandas as pd
 from dateutil.relativedelta import relativedelta
 
-# Import xml parser
-from lxml import etree
-
 # Import EBOA ingestion functions helpers
-import eboa.ingestion.functions as eboa_ingestion_functions
 import eboa.ingestion.xpath_functions as xpath_functions
 from eboa.engine.functions import get_resources_path, get_schemas_path
 
 # Import query
 from eboa.engine.query import Query
 
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import aggregation engine
+from bankboa.ingestions.ingestion_transactions import aggregation
+
+# Import daily balances
+from bankboa.ingestions.ingestion_transactions import daily_balances
+
+# Import fingerprints of the statements
+from bankboa.ingestions.ingestion_transactions import fingerprints
+
+# Import row level comparison of movements
+from bankboa.ingestions.ingestion_transactions import movements_diff
+
+# Import instrumentation of the stages
+from bankboa.ingestions.ingestion_transactions import instrumentation
+
+# Import asynchronous writer of the ingestion progress
+from bankboa.ingestions.ingestion_transactions import progress
+
 # Import debugging
 from eboa.debugging import debug
 
@@ -39,19 +59,47 @@ logger = logging_module.logger
 
 version = "1.0"
 
+# Replace only the windows of the DDBB where the movements of the statements differ from the stored ones
+diff_movements = os.environ.get("BANKBOA_DIFF_MOVEMENTS", "true").lower() == "true"
+
+# Movements already generated per file path (filled by the batch ingestion)
+precomputed_movements_events = {}
+
+# Fingerprints of the statements already obtained per file path (filled by the batch ingestion)
+precomputed_fingerprints = {}
+
+def precompute_movements_events(file_path, movements_events, statement_fingerprint = None):
+    """
+    Method to register the movements of a file generated beforehand
+    so that process_file does not parse the file again
+
+    :param file_path: path to the file
+    :type file_path: str
+    :param movements_events: movements of the file
+    :type movements_events: MovementRecords
+    :param statement_fingerprint: fingerprint of the statement (None if not available)
+    :type statement_fingerprint: StatementFingerprint
+    """
+    precomputed_movements_events[os.path.abspath(file_path)] = movements_events
+    if statement_fingerprint is not None:
+        precomputed_fingerprints[os.path.abspath(file_path)] = statement_fingerprint
+    # end if
+
 @debug
-def _generate_movements_events(parsed_xls, source, engine, query):
+def _generate_movements_events(prepared_chunks, source, engine, query, ingestion_instrumentation = None):
     """
     Method to generate the events of the movements files
 
-    :param parsed_xls: source of information already parsed
-    :type parsed_xls: pandas object
+    :param prepared_chunks: chunks of movements of the file prepared by movements.iterate_prepared_movements
+    :type prepared_chunks: iterable of pandas.DataFrame
     :param source: information of the source
     :type source: dict
     :param engine: Engine instance
     :type engine: Engine
     :param query: Query instance
     :type query: Query
+    :param ingestion_instrumentation: instrumentation of the stages of the ingestion (None to skip it)
+    :type ingestion_instrumentation: Instrumentation
     """
 
     # Default alert notification time
@@ -61,138 +109,33 @@ def _generate_movements_events(parsed_xls, source, engine, query):
     # end if
 
     # Get XML configurations
-    groups_xml = etree.parse(get_resources_path() + "/groups.xml")
-    groups_xpath = etree.XPathEvaluator(groups_xml)
-    entities_xml = etree.parse(get_resources_path() + "/entities.xml")
-    entities_xpath = etree.XPathEvaluator(entities_xml)
+    rules_matcher = rules.get_rules_matcher(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml")
     
     events = {}
-    events["movements"] = []
-    current_operation_date = None
-    current_microsecond_operation_date = 0
-    
-    # Iterate through rows
-    for index, row in parsed_xls.iterrows():
-
-        operation_date = parser.parse(row["FECHA OPERACIÓN"], dayfirst=True).isoformat()
 
-        if current_operation_date != operation_date:
-            current_operation_date = operation_date
-            current_microsecond_operation_date = 0
-        else:
-            current_microsecond_operation_date += 1
-        # end if
-        
-        value_date = parser.parse(row["FECHA VALOR"], dayfirst=True).isoformat()
-        start = (parser.parse(row["FECHA OPERACIÓN"], dayfirst=True) - datetime.timedelta(microseconds=current_microsecond_operation_date)).isoformat()
-        stop = (parser.parse(row["FECHA OPERACIÓN"], dayfirst=True) - datetime.timedelta(microseconds=current_microsecond_operation_date) + datetime.timedelta(days=1)).isoformat()
-        concept = row["CONCEPTO"]
-        amount = float(row["IMPORTE EUR"])
-        balance = float(row["SALDO"])
-
-        groups = groups_xpath("/groups/group[boolean(matching_rules/rule[contains($concept, match)][$amount > 0 and amount = '>0' or $amount < 0 and amount = '<0'])]", concept = concept, amount = amount)
-
-        entities = entities_xpath("/entities/entity[boolean(matching_strings/string[contains($concept, text())])]", concept = concept)
-
-        values = [
-            {"name": "bank",
-             "type": "text",
-             "value": "BANCO SANTANDER"},
-            {"name": "concept",
-             "type": "text",
-             "value": concept},
-            {"name": "amount",
-             "type": "double",
-             "value": amount},
-            {"name": "balance",
-             "type": "double",
-             "value": balance},
-            {"name": "value_date",
-             "type": "timestamp",
-             "value": value_date},
-            {"name": "operation_date",
-             "type": "timestamp",
-             "value": operation_date}
-        ]
-
-        # Insert groups
-        i = 0
-        for group in groups:
-            values.append(
-                {"name": f"group{i}",
-                 "type": "text",
-                 "value": group.xpath("name")[0].text},
-            )
-            i += 1
-        # end for
-        if i == 0:
-            values.append(
-                {"name": "number_of_groups",
-                 "type": "double",
-                 "value": 1}
-            )
-            if amount < 0:
-                values.append(
-                    {"name": "group0",
-                     "type": "text",
-                     "value": "Spending no group"}
-                )
-            else:
-                values.append(
-                    {"name": "group0",
-                     "type": "text",
-                     "value": "Income no group"}
-                )
-            # end if
-        else:
-            values.append(
-                {"name": "number_of_groups",
-                 "type": "double",
-                 "value": i}
-            )
-        # end if
-            
-        # Insert entities
-        i = 0
-        for entity in entities:
-            values.append(
-                {"name": f"entity{i}",
-                 "type": "text",
-                 "value": entity.xpath("name")[0].text},
-            )
-            i += 1
+    if ingestion_instrumentation is None:
+        # Build the compact movements from the columns chunk by chunk
+        # (the MOVEMENT events are built only for the operations)
+        events["movements"] = movements.MovementRecords(movements.iterate_prepared_movement_records(prepared_chunks, rules_matcher))
+    else:
+        # Measure the matching of each chunk (on a copy not to alter the cached matcher)
+        # apart from the rest of the building of the events
+        rules_matcher = copy.copy(rules_matcher)
+        rules_matcher.classify_movements = ingestion_instrumentation.timed("rule_matching", rules_matcher.classify_movements)
+        cache_statistics = rules.classification_cache.get_statistics()
+        with ingestion_instrumentation.stage("event_build"):
+            events["movements"] = movements.MovementRecords(movements.iterate_prepared_movement_records(prepared_chunks, rules_matcher))
+        # end with
+        ingestion_instrumentation.count("event_build", "events", len(events["movements"]))
+        ingestion_instrumentation.count("rule_matching", "movements", len(events["movements"]))
+
+        # Report the use of the cache of classifications to size it
+        previous_cache_statistics = cache_statistics
+        cache_statistics = rules.classification_cache.get_statistics()
+        for counter in ["hits", "misses", "evictions"]:
+            ingestion_instrumentation.count("rule_matching", f"cache_{counter}", cache_statistics[counter] - previous_cache_statistics[counter])
         # end for
-        if i == 0:
-            values.append(
-                {"name": "number_of_entities",
-                 "type": "double",
-                 "value": 1}
-            )
-            values.append(
-                {"name": "entity0",
-                 "type": "text",
-                 "value": "No entity"}
-            )
-        else:
-            values.append(
-                {"name": "number_of_entities",
-                 "type": "double",
-                 "value": i}
-            )
-        # end if
-            
-        events["movements"].append({
-            "gauge": {
-                "insertion_type": "INSERT_and_ERASE",
-                "name": "MOVEMENT",
-                "system": "BANCO SANTANDER"
-            },
-            "start": start,
-            "stop": stop,
-            "values": values,
-        })
-
-    # end for
+    # end if
 
     return events
 
@@ -221,30 +164,19 @@ def process_file(file_path, engine, query, reception_time):
 
     file_name = os.path.basename(file_path)
 
-    # Get the general source entry (processor = None, version = None, DIM signature = PENDING_SOURCES)
-    # This is for registrering the ingestion progress
-    query_general_source = Query()
-    session_progress = query_general_source.session
-    general_source_progress = query_general_source.get_sources(names = {"filter": file_name, "op": "=="},
-                                                               dim_signatures = {"filter": "PENDING_SOURCES", "op": "=="},
-                                                               processors = {"filter": "", "op": "=="},
-                                                               processor_version_filters = [{"filter": "", "op": "=="}])
-
-    if len(general_source_progress) > 0:
-        general_source_progress = general_source_progress[0]
-    # end if
+    # Measure the stages of the ingestion
+    ingestion_instrumentation = instrumentation.Instrumentation(file_name, __name__)
+    ingestion_instrumentation.start()
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
-    
-    # Parse file
-    parsed_xls = pd.read_excel(file_path, header = 7)
+    # The progress is registered in the PENDING_SOURCES entry of the file by a background writer
+    progress.report(file_name, 10)
 
     # Set metadata of source
     generation_time = file_name[19:34]
     reported_validity_start = file_name[35:50]
     reported_validity_stop = file_name[51:66]
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 20)
+    progress.report(file_name, 20)
 
     source = {
         "name": file_name,
@@ -254,7 +186,7 @@ def process_file(file_path, engine, query, reception_time):
         "reported_validity_stop": reported_validity_stop,
     }
     
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 40)
+    progress.report(file_name, 40)
 
     # Default alert notification time
     notification_time = (parser.parse(source["reported_validity_start"]) - datetime.timedelta(days=1)).isoformat()
@@ -262,10 +194,47 @@ def process_file(file_path, engine, query, reception_time):
         notification_time = datetime.datetime.now().isoformat()
     # end if
 
-    # Generate movements events
-    events = _generate_movements_events(parsed_xls, source, engine, query)
+    # Obtain the movements events generated beforehand or parse and prepare the file in chunks of rows.
+    # The fingerprint of the statement is obtained from the prepared chunks, which are kept
+    # to match the rules only if the statement is not a re-delivery
+    events = None
+    prepared_chunks = None
+    if os.path.abspath(file_path) in precomputed_movements_events:
+        events = {"movements": precomputed_movements_events.pop(os.path.abspath(file_path))}
+        statement_fingerprint = precomputed_fingerprints.pop(os.path.abspath(file_path), None)
+        ingestion_instrumentation.count("event_build", "precomputed_events", len(events["movements"]))
+    else:
+        parsed_xls = ingestion_instrumentation.iterate("excel_parse", movements.read_statement(file_path), "rows", len)
+        statement_hasher = fingerprints.StatementHasher()
+        prepared_chunks = []
+        with ingestion_instrumentation.stage("movement_preparation"):
+            for prepared_movements in movements.iterate_prepared_movements(parsed_xls):
+                statement_hasher.update(prepared_movements)
+                prepared_chunks.append(prepared_movements)
+            # end for
+        # end with
+        statement_fingerprint = statement_hasher.get_fingerprint()
+    # end if
+
+    # Skip the re-deliveries of statements whose movements are already stored
+    # (no movement is inserted and no period is marked to be aggregated again)
+    re_delivered = False
+    if statement_fingerprint is not None:
+        with ingestion_instrumentation.stage("fingerprint"):
+            re_delivered = fingerprints.is_statement_ingested(query, statement_fingerprint)
+        # end with
+    # end if
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 90)
+    if re_delivered:
+        logger.info(f"The movements of the file {file_name} are already ingested (fingerprint {statement_fingerprint.fingerprint}), so the file is skipped")
+        ingestion_instrumentation.count("fingerprint", "skipped_statements", 1)
+        events = {"movements": movements.MovementRecords()}
+    elif events is None:
+        events = _generate_movements_events(prepared_chunks, source, engine, query, ingestion_instrumentation = ingestion_instrumentation)
+    # end if
+    prepared_chunks = None
+
+    progress.report(file_name, 90)
     
     # Build the xml
     operations = []
@@ -277,133 +246,221 @@ def process_file(file_path, engine, query, reception_time):
         "message": ingestion_completeness_message
     } 
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 94)
+    progress.report(file_name, 94)
     
-    # Insert movements events
-    if len(events["movements"]):
-        event_starts = [event["start"] for event in events["movements"]]
-        event_starts.sort()
-        event_stops = [event["stop"] for event in events["movements"]]
-        event_stops.sort()
-
-        source = {
-            "name": file_name,
-            "reception_time": reception_time,
-            "generation_time": generation_time,
-            "reported_validity_start": reported_validity_start,
-            "reported_validity_stop": reported_validity_stop,
-            "validity_start": event_starts[0],
-            "validity_stop": event_stops[-1]
-        }
-
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "MOVEMENTS_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["movements"]
-        })
-
-        eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 96)
-
-        events["update_months"] = []
-        month_start = parser.parse(event_starts[0][0:7], default=datetime.datetime(2015, 1, 1))
-        first_month_start = month_start
-        month_stop = month_start + relativedelta(months=1)
-        while month_start.isoformat() < event_stops[-1]:
-            last_month_stop = month_stop
-            events["update_months"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "UPDATE_MONTH",
-                    "system": "BANCO SANTANDER"
+    # Build the operations (with the queries needed to maintain the aggregations)
+    changed_windows = []
+    with ingestion_instrumentation.stage("operation_assembly"):
+        # Insert movements events
+        if len(events["movements"]):
+            # Validity covered by the movements (maintained while generating them)
+            validity_start = events["movements"].validity_start
+            validity_stop = events["movements"].validity_stop
+
+            # Obtain the windows of the DDBB to replace with the movements of the statement
+            if diff_movements:
+                with ingestion_instrumentation.stage("aggregation_queries"):
+                    stored_movements = aggregation.get_stored_movements(query, parser.parse(validity_start), parser.parse(validity_stop))
+                # end with
+                changed_windows = movements_diff.get_changed_windows(events["movements"], stored_movements)
+            else:
+                changed_windows = [movements_diff.ChangedWindow(validity_start, validity_stop, events["movements"].movement_records)]
+            # end if
+            events["changed_movements"] = [movement_record for changed_window in changed_windows for movement_record in changed_window.movement_records]
+            ingestion_instrumentation.count("operation_assembly", "changed_movements", len(events["changed_movements"]))
+
+            # Every window is inserted as a different source (the first one keeps the name of the file)
+            for i, changed_window in enumerate(changed_windows):
+                source = {
+                    "name": file_name if i == 0 else f"{file_name}#{i}",
+                    "reception_time": reception_time,
+                    "generation_time": generation_time,
+                    "reported_validity_start": reported_validity_start,
+                    "reported_validity_stop": reported_validity_stop,
+                    "validity_start": changed_window.validity_start,
+                    "validity_stop": changed_window.validity_stop
+                }
+
+                operations.append({
+                    "mode": "insert_and_erase",
+                    "dim_signature": {
+                        "name": "MOVEMENTS_SANTANDER",
+                        "exec": os.path.basename(__file__),
+                        "version": version
+                    },
+                    "source": source,
+                    "events": [movement_record.to_event() for movement_record in changed_window.movement_records]
+                })
+            # end for
+
+            # Register the fingerprint of the statement covering the validity of its movements
+            if statement_fingerprint is not None:
+                source = {
+                    "name": file_name,
+                    "reception_time": reception_time,
+                    "generation_time": generation_time,
+                    "reported_validity_start": reported_validity_start,
+                    "reported_validity_stop": reported_validity_stop,
+                    "validity_start": validity_start,
+                    "validity_stop": validity_stop
+                }
+
+                operations.append({
+                    "mode": "insert_and_erase",
+                    "dim_signature": {
+                        "name": "STATEMENT_FINGERPRINTS_SANTANDER",
+                        "exec": os.path.basename(__file__),
+                        "version": version
+                    },
+                    "source": source,
+                    "events": [fingerprints.build_fingerprint_event(statement_fingerprint)]
+                })
+            # end if
+        # end if
+
+        # Maintain the daily balances and the aggregations only where the movements changed
+        if len(changed_windows):
+            changed_start = changed_windows[0].validity_start
+            changed_stop = changed_windows[-1].validity_stop
+
+            # Maintain the balance of each day with movements. The stored movements of the first day
+            # previous to the ones replaced are not erased so they are taken into account
+            first_start = parser.parse(changed_start)
+            first_day = daily_balances.get_operation_day(first_start)
+            with ingestion_instrumentation.stage("aggregation_queries"):
+                movement_balances = aggregation.get_movement_balances(query, first_day - datetime.timedelta(days=1), first_start)
+            # end with
+            movement_balances += daily_balances.get_movement_balances_from_records([movement_record for movement_record in events["movements"]
+                                                                                    if changed_start <= movement_record.start < changed_stop])
+            events["daily_balances"] = daily_balances.build_daily_balance_events(daily_balances.build_daily_balances(movement_balances))
+
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": generation_time,
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": events["daily_balances"][0]["start"],
+                "validity_stop": events["daily_balances"][-1]["stop"]
+            }
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "DAILY_BALANCES_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
                 },
-                "start": month_start.isoformat(),
-                "stop": month_stop.isoformat(),
-                "values": [
-                    {"name": "status",
-                     "type": "text",
-                     "value": "UPDATE"}
-                ]
+                "source": source,
+                "events": events["daily_balances"]
             })
-            month_start = month_stop
-            month_stop = month_stop + relativedelta(months=1)
-        # end while
-
-        source = {
-            "name": file_name,
-            "reception_time": reception_time,
-            "generation_time": generation_time,
-            "reported_validity_start": reported_validity_start,
-            "reported_validity_stop": reported_validity_stop,
-            "validity_start": first_month_start.isoformat(),
-            "validity_stop": last_month_stop.isoformat()
-        }
-
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "UPDATE_MONTHS_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["update_months"]
-        })
-
-        eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 98)
-
-        events["update_years"] = []
-        year_start = parser.parse(event_starts[0][0:4], default=datetime.datetime(2015, 1, 1))
-        first_year_start = year_start
-        year_stop = year_start + relativedelta(years=1)
-        while year_start.isoformat() < event_stops[-1]:
-            last_year_stop = year_stop
-            events["update_years"].append({
-                "gauge": {
-                    "insertion_type": "INSERT_and_ERASE",
-                    "name": "UPDATE_YEAR",
-                    "system": "BANCO SANTANDER"
+
+            progress.report(file_name, 96)
+
+            # Obtain the groups and entities whose aggregations change with respect to the stored movements
+            with ingestion_instrumentation.stage("aggregation_queries"):
+                previous_movements = aggregation.get_movements(query, [(parser.parse(changed_window.validity_start), parser.parse(changed_window.validity_stop))
+                                                                       for changed_window in changed_windows])
+            # end with
+            changed_month_keys, changed_year_keys = aggregation.get_changed_keys(previous_movements, aggregation.get_movements_from_records(events["changed_movements"]))
+
+            events["update_months"] = []
+            month_start = parser.parse(changed_start[0:7], default=datetime.datetime(2015, 1, 1))
+            first_month_start = month_start
+            with ingestion_instrumentation.stage("aggregation_queries"):
+                pending_month_keys = aggregation.get_pending_keys(query, "UPDATE_MONTH", month_start, parser.parse(changed_stop))
+            # end with
+            month_stop = month_start + relativedelta(months=1)
+            while month_start.isoformat() < changed_stop:
+                last_month_stop = month_stop
+                events["update_months"].append({
+                    "gauge": {
+                        "insertion_type": "INSERT_and_ERASE",
+                        "name": "UPDATE_MONTH",
+                        "system": "BANCO SANTANDER"
+                    },
+                    "start": month_start.isoformat(),
+                    "stop": month_stop.isoformat(),
+                    "values": aggregation.build_update_values(month_start, changed_month_keys, pending_month_keys)
+                })
+                month_start = month_stop
+                month_stop = month_stop + relativedelta(months=1)
+            # end while
+
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": generation_time,
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": first_month_start.isoformat(),
+                "validity_stop": last_month_stop.isoformat()
+            }
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "UPDATE_MONTHS_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
                 },
-                "start": year_start.isoformat(),
-                "stop": year_stop.isoformat(),
-                "values": [
-                    {"name": "status",
-                     "type": "text",
-                     "value": "UPDATE"}
-                ]
+                "source": source,
+                "events": events["update_months"]
             })
-            year_start = year_stop
-            year_stop = year_stop + relativedelta(years=1)
-        # end while
-
-        source = {
-            "name": file_name,
-            "reception_time": reception_time,
-            "generation_time": generation_time,
-            "reported_validity_start": reported_validity_start,
-            "reported_validity_stop": reported_validity_stop,
-            "validity_start": first_year_start.isoformat(),
-            "validity_stop": last_year_stop.isoformat()
-        }
-
-        operations.append({
-            "mode": "insert_and_erase",
-            "dim_signature": {
-                "name": "UPDATE_YEARS_SANTANDER",
-                "exec": os.path.basename(__file__),
-                "version": version
-            },
-            "source": source,
-            "events": events["update_years"]
-        })
-    # end if
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 100)
+            progress.report(file_name, 98)
+
+            events["update_years"] = []
+            year_start = parser.parse(changed_start[0:4], default=datetime.datetime(2015, 1, 1))
+            first_year_start = year_start
+            with ingestion_instrumentation.stage("aggregation_queries"):
+                pending_year_keys = aggregation.get_pending_keys(query, "UPDATE_YEAR", year_start, parser.parse(changed_stop))
+            # end with
+            year_stop = year_start + relativedelta(years=1)
+            while year_start.isoformat() < changed_stop:
+                last_year_stop = year_stop
+                events["update_years"].append({
+                    "gauge": {
+                        "insertion_type": "INSERT_and_ERASE",
+                        "name": "UPDATE_YEAR",
+                        "system": "BANCO SANTANDER"
+                    },
+                    "start": year_start.isoformat(),
+                    "stop": year_stop.isoformat(),
+                    "values": aggregation.build_update_values(year_start, changed_year_keys, pending_year_keys)
+                })
+                year_start = year_stop
+                year_stop = year_stop + relativedelta(years=1)
+            # end while
+
+            source = {
+                "name": file_name,
+                "reception_time": reception_time,
+                "generation_time": generation_time,
+                "reported_validity_start": reported_validity_start,
+                "reported_validity_stop": reported_validity_stop,
+                "validity_start": first_year_start.isoformat(),
+                "validity_stop": last_year_stop.isoformat()
+            }
+
+            operations.append({
+                "mode": "insert_and_erase",
+                "dim_signature": {
+                    "name": "UPDATE_YEARS_SANTANDER",
+                    "exec": os.path.basename(__file__),
+                    "version": version
+                },
+                "source": source,
+                "events": events["update_years"]
+            })
+        # end if
+    # end with
+    ingestion_instrumentation.count("operation_assembly", "operations", len(operations))
+
+    progress.report(file_name, 100)
 
     query.close_session()
 
+    logger.info(ingestion_instrumentation.emit())
+
     return data
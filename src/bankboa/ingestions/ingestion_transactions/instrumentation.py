@@ -0,0 +1,295 @@
+"""
+Stage level instrumentation of the ingestions of transactions
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import sys
+import json
+import time
+import datetime
+import tempfile
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+# Environment variable enabling cProfile and tracemalloc (true or false)
+PROFILE_VARIABLE = "BANKBOA_PROFILE"
+
+# Environment variable with the directory for the cProfile statistics (temporary directory by default)
+PROFILE_DIRECTORY_VARIABLE = "BANKBOA_PROFILE_DIRECTORY"
+
+# Environment variable with the file where the records are appended as JSON lines
+RECORDS_FILE_VARIABLE = "BANKBOA_INSTRUMENTATION_FILE"
+
+# Number of top allocations reported by tracemalloc
+TOP_ALLOCATIONS = 10
+
+def profiling_enabled():
+    """
+    Method to check if the profiling is enabled through the environment
+
+    :return: True if cProfile and tracemalloc have to be used
+    :rtype: bool
+    """
+    return os.environ.get(PROFILE_VARIABLE, "false").lower() == "true"
+
+def get_max_rss():
+    """
+    Method to obtain the maximum resident set size of the process
+
+    :return: maximum resident set size in bytes (None if not available)
+    :rtype: int
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # end try
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        # Linux reports kilobytes
+        max_rss *= 1024
+    # end if
+
+    return max_rss
+
+class Instrumentation():
+    """
+    Recorder of the wall time, CPU time, memory and counts of the stages of the ingestion of a file.
+
+    The times of a stage exclude the ones of the stages nested inside it.
+    When the profiling is enabled, the memory of a stage is the peak traced by tracemalloc
+    inside it (peak_memory). Otherwise it is the maximum resident set size of the process
+    when the stage finishes (process_max_rss), a high-water mark of the whole process that
+    includes the memory reached by the previous stages
+    """
+
+    def __init__(self, file_name, module, profile = None):
+        self.file_name = file_name
+        self.module = module
+        self.profile = profiling_enabled() if profile is None else profile
+        self.memory_name = "peak_memory" if self.profile else "process_max_rss"
+        self.stages = {}
+        self.stack = []
+        self.profiler = None
+        self.started_tracemalloc = False
+        self.start_time = None
+        self.wall_start = None
+        self.cpu_start = None
+        self.record = None
+
+    def start(self):
+        """
+        Method to start the instrumentation (and the profiling if enabled)
+        """
+        self.start_time = datetime.datetime.now().isoformat()
+        if self.profile:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+            # end if
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        # end if
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def _get_stage(self, name):
+        """
+        Method to obtain the record of a stage creating it if needed
+
+        :param name: name of the stage
+        :type name: str
+
+        :return: record of the stage
+        :rtype: dict
+        """
+        if name not in self.stages:
+            self.stages[name] = {"stage": name, "calls": 0, "wall_time": 0.0, "cpu_time": 0.0, self.memory_name: 0, "counts": {}}
+        # end if
+
+        return self.stages[name]
+
+    def _update_peak_memory(self, stage):
+        """
+        Method to register the current peak of memory in a stage
+        (the traced peak or the high-water mark of the process)
+
+        :param stage: record of the stage
+        :type stage: dict
+        """
+        if self.profile:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        else:
+            peak_memory = get_max_rss() or 0
+        # end if
+        stage[self.memory_name] = max(stage[self.memory_name], peak_memory)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Method to measure a stage inside a with statement.
+        A stage measured several times accumulates its times and calls
+
+        :param name: name of the stage
+        :type name: str
+        """
+        stage = self._get_stage(name)
+        frame = {"stage": stage, "nested_wall_time": 0.0, "nested_cpu_time": 0.0}
+        parent = self.stack[-1] if len(self.stack) > 0 else None
+        if self.profile:
+            # The peak reached so far belongs to the parent stage
+            if parent is not None:
+                self._update_peak_memory(parent["stage"])
+            # end if
+            tracemalloc.reset_peak()
+        # end if
+        self.stack.append(frame)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stage
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            self.stack.pop()
+
+            stage["calls"] += 1
+            stage["wall_time"] += wall_time - frame["nested_wall_time"]
+            stage["cpu_time"] += cpu_time - frame["nested_cpu_time"]
+            self._update_peak_memory(stage)
+            if parent is not None:
+                parent["nested_wall_time"] += wall_time
+                parent["nested_cpu_time"] += cpu_time
+                parent["stage"][self.memory_name] = max(parent["stage"][self.memory_name], stage[self.memory_name])
+            # end if
+        # end try
+
+    def count(self, name, count_name, value):
+        """
+        Method to add to a count (rows, events...) of a stage
+
+        :param name: name of the stage
+        :type name: str
+        :param count_name: name of the count
+        :type count_name: str
+        :param value: value to add
+        :type value: int
+        """
+        counts = self._get_stage(name)["counts"]
+        counts[count_name] = counts.get(count_name, 0) + value
+
+    def iterate(self, name, iterable, count_name = None, get_count = None):
+        """
+        Method to measure the time spent obtaining the items of an iterable in a stage
+
+        :param name: name of the stage
+        :type name: str
+        :param iterable: iterable to measure (lazily evaluated)
+        :type iterable: iterable
+        :param count_name: name of the count of items (not counted if None)
+        :type count_name: str
+        :param get_count: function returning the value to count per item (1 if None)
+        :type get_count: function
+
+        :return: generator of the items
+        :rtype: generator
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                # end try
+            # end with
+            if count_name is not None:
+                self.count(name, count_name, get_count(item) if get_count is not None else 1)
+            # end if
+            yield item
+        # end while
+
+    def timed(self, name, function):
+        """
+        Method to measure every call to a function in a stage.
+        Every call is a measurement, so it is meant for functions processing
+        a chunk of items and not for the ones called per item
+
+        :param name: name of the stage
+        :type name: str
+        :param function: function to measure
+        :type function: function
+
+        :return: function measured
+        :rtype: function
+        """
+        def timed_function(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+            # end with
+        # end def
+
+        return timed_function
+
+    def finish(self):
+        """
+        Method to finish the instrumentation and build its record
+
+        :return: record with the totals and the stages in order of first measurement
+        :rtype: dict
+        """
+        if self.record is not None:
+            return self.record
+        # end if
+
+        wall_time = time.perf_counter() - self.wall_start
+        cpu_time = time.process_time() - self.cpu_start
+        self.record = {
+            "file": self.file_name,
+            "module": self.module,
+            "start": self.start_time,
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "max_rss": get_max_rss(),
+            "stages": list(self.stages.values())
+        }
+
+        if self.profile:
+            self.profiler.disable()
+            profile_directory = os.environ.get(PROFILE_DIRECTORY_VARIABLE, tempfile.gettempdir())
+            profile_path = os.path.join(profile_directory, f"{self.file_name}.{os.getpid()}.prof")
+            self.profiler.dump_stats(profile_path)
+            self.record["profile"] = profile_path
+
+            self.record["top_allocations"] = [str(statistic) for statistic in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]]
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+            # end if
+        # end if
+
+        return self.record
+
+    def emit(self):
+        """
+        Method to finish the instrumentation and serialize its record.
+        The record is also appended to the file configured in the environment (if any)
+
+        :return: record serialized to JSON in one line
+        :rtype: str
+        """
+        serialized_record = json.dumps(self.finish(), separators = (",", ":"))
+        records_file = os.environ.get(RECORDS_FILE_VARIABLE)
+        if records_file:
+            with open(records_file, "a") as records:
+                records.write(serialized_record + "\n")
+            # end with
+        # end if
+
+        return serialized_record
@@ -0,0 +1,578 @@
+"""
+Preparation of the movements contained in the Santander statements
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+from dateutil import parser
+import numpy as np
+import pandas as pd
+
+# Import excel readers
+import openpyxl
+import xlrd
+
+# Format of the dates in the Santander statements
+DATE_FORMAT = "%d/%m/%Y"
+
+# Row (starting from 0) holding the names of the columns in the Santander statements
+HEADER_ROW = 7
+
+# Number of rows read at once from the Santander statements
+CHUNK_SIZE = 10000
+
+# Entity of the movements without matching entities
+DEFAULT_ENTITY = "No entity"
+
+def _iterate_xls_rows(file_path):
+    """
+    Method to iterate through the rows of the first sheet of a xls workbook
+    without loading the rest of the workbook.
+
+    xlrd does not stream BIFF records, so the cells of the whole sheet are loaded
+    when the sheet is opened and the memory grows with the size of the statement
+
+    :param file_path: path to the workbook
+    :type file_path: str
+
+    :return: generator of lists of cell values
+    :rtype: generator
+    """
+    workbook = xlrd.open_workbook(file_path, on_demand = True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        for row_index in range(sheet.nrows):
+            row = []
+            for cell in sheet.row(row_index):
+                if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    row.append(None)
+                elif cell.ctype == xlrd.XL_CELL_DATE:
+                    row.append(xlrd.xldate_as_datetime(cell.value, workbook.datemode))
+                elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                    row.append(bool(cell.value))
+                else:
+                    row.append(cell.value)
+                # end if
+            # end for
+            yield row
+        # end for
+    finally:
+        workbook.release_resources()
+    # end try
+
+def _iterate_xlsx_rows(file_path):
+    """
+    Method to iterate through the rows of the first sheet of a xlsx workbook
+    in read only mode
+
+    :param file_path: path to the workbook
+    :type file_path: str
+
+    :return: generator of lists of cell values
+    :rtype: generator
+    """
+    # The workbook is opened from a file object as openpyxl rejects paths with xls extension
+    with open(file_path, "rb") as workbook_file:
+        workbook = openpyxl.load_workbook(workbook_file, read_only = True, data_only = True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only = True):
+                yield list(row)
+            # end for
+        finally:
+            workbook.close()
+        # end try
+    # end with
+
+def read_statement(file_path, chunk_size = CHUNK_SIZE):
+    """
+    Method to read the movements of a Santander statement lazily in chunks of rows.
+    The format of the workbook (xls or xlsx) is detected from its content.
+
+    Only the xlsx statements are read within the memory of a chunk. The cells of the
+    xls statements are loaded whole by xlrd (see _iterate_xls_rows) and only their
+    conversion to DataFrames is chunked. In both cases, the movements built from the
+    chunks are kept until the operations of the file are returned to eboa, which
+    takes the complete list of MOVEMENT events of every operation
+
+    :param file_path: path to the statement
+    :type file_path: str
+    :param chunk_size: maximum number of rows per chunk
+    :type chunk_size: int
+
+    :return: generator of chunks of movements with the columns of the statement
+    :rtype: generator of pandas.DataFrame
+    """
+    with open(file_path, "rb") as statement_file:
+        signature = statement_file.read(2)
+    # end with
+
+    if signature == b"PK":
+        rows = _iterate_xlsx_rows(file_path)
+    else:
+        rows = _iterate_xls_rows(file_path)
+    # end if
+
+    columns = None
+    chunk = []
+    for row_index, row in enumerate(rows):
+        if row_index < HEADER_ROW:
+            continue
+        elif row_index == HEADER_ROW:
+            columns = row
+            continue
+        # end if
+
+        # Skip empty rows
+        if all(value is None or value == "" for value in row):
+            continue
+        # end if
+
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield pd.DataFrame(chunk, columns = columns)
+            chunk = []
+        # end if
+    # end for
+
+    if len(chunk) > 0:
+        yield pd.DataFrame(chunk, columns = columns)
+    # end if
+
+def _parse_dates(dates):
+    """
+    Method to parse a column of day first dates in one pass.
+    Only the cells not following the expected format are parsed with dateutil
+
+    :param dates: column of dates
+    :type dates: pandas.Series
+
+    :return: column of parsed dates
+    :rtype: pandas.Series
+    """
+    parsed_dates = pd.to_datetime(dates, format = DATE_FORMAT, errors = "coerce")
+    failed = parsed_dates.isna()
+    if failed.any():
+        parsed_dates = parsed_dates.astype(object)
+        parsed_dates[failed] = [parser.parse(date, dayfirst=True) for date in dates[failed]]
+        parsed_dates = pd.to_datetime(parsed_dates)
+    # end if
+
+    return parsed_dates
+
+def _isoformat(dates):
+    """
+    Method to convert a column of dates to ISO format strings
+    (same result as datetime.isoformat)
+
+    :param dates: column of dates
+    :type dates: pandas.Series
+
+    :return: column of ISO format strings
+    :rtype: pandas.Series
+    """
+    values = dates.to_numpy(dtype = "datetime64[us]")
+    isoformat_dates = np.datetime_as_string(values, unit = "s")
+    with_microseconds = dates.dt.microsecond.to_numpy() != 0
+    if with_microseconds.any():
+        isoformat_dates = np.where(with_microseconds, np.datetime_as_string(values, unit = "us"), isoformat_dates)
+    # end if
+
+    return pd.Series(isoformat_dates, index = dates.index, dtype = object)
+
+def _prepare_movements(parsed_xls, previous_run):
+    """
+    Method to prepare the columns of the movements needed to generate the events.
+
+    Movements sharing the operation date in consecutive rows are moved back
+    one microsecond each (from the first one of the run) to obtain different
+    starts
+
+    :param parsed_xls: movements of the statement
+    :type parsed_xls: pandas.DataFrame
+    :param previous_run: operation date and offset of the last movement of the previous chunk (if any)
+    :type previous_run: tuple
+
+    :return: tuple with the prepared movements and the operation date and offset of the last movement
+    :rtype: tuple
+    """
+    operation_dates = _parse_dates(parsed_xls["FECHA OPERACIÓN"])
+    value_dates = _parse_dates(parsed_xls["FECHA VALOR"])
+
+    # Offset in microseconds inside each run of consecutive rows with the same operation date
+    runs = (operation_dates != operation_dates.shift()).cumsum()
+    offsets = operation_dates.groupby(runs).cumcount()
+    if previous_run is not None and len(operation_dates) > 0 and operation_dates.iloc[0] == previous_run[0]:
+        # The first run continues the last run of the previous chunk
+        offsets = offsets.where(runs != runs.iloc[0], offsets + previous_run[1] + 1)
+    # end if
+    starts = operation_dates - pd.to_timedelta(offsets, unit = "us")
+    stops = starts + pd.Timedelta(days = 1)
+
+    prepared_movements = pd.DataFrame({
+        "concept": parsed_xls["CONCEPTO"],
+        "amount": parsed_xls["IMPORTE EUR"].astype(float),
+        "balance": parsed_xls["SALDO"].astype(float),
+        "operation_date": _isoformat(operation_dates),
+        "value_date": _isoformat(value_dates),
+        "start": _isoformat(starts),
+        "stop": _isoformat(stops)
+    }, index = parsed_xls.index)
+
+    last_run = previous_run
+    if len(operation_dates) > 0:
+        last_run = (operation_dates.iloc[-1], offsets.iloc[-1])
+    # end if
+
+    return prepared_movements, last_run
+
+def prepare_movements(parsed_xls):
+    """
+    Method to prepare the columns of the movements needed to generate the events
+
+    :param parsed_xls: movements of the statement
+    :type parsed_xls: pandas.DataFrame
+
+    :return: movements with the columns concept, amount, balance, operation_date, value_date, start and stop
+    :rtype: pandas.DataFrame
+    """
+    return _prepare_movements(parsed_xls, None)[0]
+
+def iterate_prepared_movements(chunks):
+    """
+    Method to prepare the movements of a statement read in chunks
+
+    :param chunks: chunks of movements of the statement in order
+    :type chunks: iterable of pandas.DataFrame
+
+    :return: generator of chunks of prepared movements
+    :rtype: generator of pandas.DataFrame
+    """
+    last_run = None
+    for chunk in chunks:
+        prepared_movements, last_run = _prepare_movements(chunk, last_run)
+        yield prepared_movements
+    # end for
+
+def _build_classification_values(names, value_name, number_name, default_name):
+    """
+    Method to build the values holding the groups or the entities of a movement
+
+    :param names: names of the matching groups or entities
+    :type names: list
+    :param value_name: prefix of the values (group or entity)
+    :type value_name: str
+    :param number_name: name of the value holding the number of groups or entities
+    :type number_name: str
+    :param default_name: name to use when there are no matching groups or entities
+    :type default_name: str
+
+    :return: list of values
+    :rtype: list
+    """
+    if len(names) == 0:
+        return [
+            {"name": number_name,
+             "type": "double",
+             "value": 1},
+            {"name": f"{value_name}0",
+             "type": "text",
+             "value": default_name}
+        ]
+    # end if
+
+    values = [
+        {"name": f"{value_name}{i}",
+         "type": "text",
+         "value": name} for i, name in enumerate(names)
+    ]
+    values.append(
+        {"name": number_name,
+         "type": "double",
+         "value": len(names)}
+    )
+
+    return values
+
+def get_default_group(amount):
+    """
+    Method to obtain the group of a movement without matching groups
+
+    :param amount: amount of the movement
+    :type amount: float
+
+    :return: name of the group
+    :rtype: str
+    """
+    return "Spending no group" if amount < 0 else "Income no group"
+
+def build_classification_values(groups, entities, amount):
+    """
+    Method to build the values holding the groups and the entities of a movement
+
+    :param groups: names of the matching groups
+    :type groups: list
+    :param entities: names of the matching entities
+    :type entities: list
+    :param amount: amount of the movement
+    :type amount: float
+
+    :return: list of values
+    :rtype: list
+    """
+    return (_build_classification_values(groups, "group", "number_of_groups", get_default_group(amount)) +
+            _build_classification_values(entities, "entity", "number_of_entities", DEFAULT_ENTITY))
+
+class MovementRecord():
+    """
+    Compact representation of a movement of a statement.
+    The MOVEMENT event with the structure to be inserted into the DDBB is built only when serialized
+    """
+
+    __slots__ = ("concept", "amount", "balance", "value_date", "operation_date", "start", "stop", "groups", "entities")
+
+    def __init__(self, concept, amount, balance, value_date, operation_date, start, stop, groups, entities):
+        """
+        :param concept: concept of the movement
+        :type concept: str
+        :param amount: amount of the movement
+        :type amount: float
+        :param balance: balance after the movement
+        :type balance: float
+        :param value_date: value date in ISO format
+        :type value_date: str
+        :param operation_date: operation date in ISO format
+        :type operation_date: str
+        :param start: start of the MOVEMENT event in ISO format
+        :type start: str
+        :param stop: stop of the MOVEMENT event in ISO format
+        :type stop: str
+        :param groups: names of the matching groups
+        :type groups: tuple
+        :param entities: names of the matching entities
+        :type entities: tuple
+        """
+        self.concept = concept
+        self.amount = amount
+        self.balance = balance
+        self.value_date = value_date
+        self.operation_date = operation_date
+        self.start = start
+        self.stop = stop
+        self.groups = groups
+        self.entities = entities
+
+    def get_classification(self):
+        """
+        Method to obtain the groups and entities held by the values of the MOVEMENT event
+        (the default ones when there are no matching groups or entities)
+
+        :return: tuple with the tuple of group names and the tuple of entity names
+        :rtype: tuple
+        """
+        return (self.groups if len(self.groups) > 0 else (get_default_group(self.amount),),
+                self.entities if len(self.entities) > 0 else (DEFAULT_ENTITY,))
+
+    def to_event(self):
+        """
+        Method to build the MOVEMENT event of the movement
+
+        :return: MOVEMENT event with the structure to be inserted into the DDBB
+        :rtype: dict
+        """
+        values = [
+            {"name": "bank",
+             "type": "text",
+             "value": "BANCO SANTANDER"},
+            {"name": "concept",
+             "type": "text",
+             "value": self.concept},
+            {"name": "amount",
+             "type": "double",
+             "value": self.amount},
+            {"name": "balance",
+             "type": "double",
+             "value": self.balance},
+            {"name": "value_date",
+             "type": "timestamp",
+             "value": self.value_date},
+            {"name": "operation_date",
+             "type": "timestamp",
+             "value": self.operation_date}
+        ]
+        values += build_classification_values(self.groups, self.entities, self.amount)
+
+        return {
+            "gauge": {
+                "insertion_type": "INSERT_and_ERASE",
+                "name": "MOVEMENT",
+                "system": "BANCO SANTANDER"
+            },
+            "start": self.start,
+            "stop": self.stop,
+            "values": values,
+        }
+
+class MovementRecords():
+    """
+    Movements of a statement in the order of the statement.
+    The validity covered by their MOVEMENT events is maintained while they are added
+    """
+
+    def __init__(self, movement_records = ()):
+        """
+        :param movement_records: movements to add
+        :type movement_records: iterable of MovementRecord
+        """
+        self.movement_records = []
+        self.validity_start = None
+        self.validity_stop = None
+        self.extend(movement_records)
+
+    def append(self, movement_record):
+        """
+        Method to add a movement
+
+        :param movement_record: movement
+        :type movement_record: MovementRecord
+        """
+        self.movement_records.append(movement_record)
+        # The starts and stops share the ISO format so they are compared as strings
+        if self.validity_start is None or movement_record.start < self.validity_start:
+            self.validity_start = movement_record.start
+        # end if
+        if self.validity_stop is None or movement_record.stop > self.validity_stop:
+            self.validity_stop = movement_record.stop
+        # end if
+
+    def extend(self, movement_records):
+        """
+        Method to add several movements
+
+        :param movement_records: movements to add
+        :type movement_records: iterable of MovementRecord
+        """
+        for movement_record in movement_records:
+            self.append(movement_record)
+        # end for
+
+    def __len__(self):
+        return len(self.movement_records)
+
+    def __iter__(self):
+        return iter(self.movement_records)
+
+    def to_events(self):
+        """
+        Method to build the MOVEMENT events of the movements
+
+        :return: list of MOVEMENT events
+        :rtype: list
+        """
+        return [movement_record.to_event() for movement_record in self.movement_records]
+
+def build_movement_records(prepared_movements, rules_matcher):
+    """
+    Method to build the compact movements from the columns of the prepared movements.
+    The movements with the same classification share the tuples of groups and entities
+
+    :param prepared_movements: movements prepared by prepare_movements
+    :type prepared_movements: pandas.DataFrame
+    :param rules_matcher: compiled groups and entities rules
+    :type rules_matcher: RulesMatcher
+
+    :return: list of movements
+    :rtype: list of MovementRecord
+    """
+    movement_records = []
+
+    # Read the columns as lists of python objects
+    concepts = prepared_movements["concept"].tolist()
+    amounts = prepared_movements["amount"].tolist()
+
+    # Classify the movements of the chunk at once
+    classifications = rules_matcher.classify_movements(concepts, amounts)
+
+    columns = zip(concepts,
+                  amounts,
+                  prepared_movements["balance"].tolist(),
+                  prepared_movements["value_date"].tolist(),
+                  prepared_movements["operation_date"].tolist(),
+                  prepared_movements["start"].tolist(),
+                  prepared_movements["stop"].tolist(),
+                  classifications)
+
+    for concept, amount, balance, value_date, operation_date, start, stop, (groups, entities) in columns:
+
+        movement_records.append(MovementRecord(concept, amount, balance, value_date, operation_date, start, stop, groups, entities))
+    # end for
+
+    return movement_records
+
+def iterate_movement_records(chunks, rules_matcher, prepared_movements_callback = None):
+    """
+    Method to generate the compact movements of a statement read in chunks
+
+    :param chunks: chunks of movements of the statement in order
+    :type chunks: iterable of pandas.DataFrame
+    :param rules_matcher: compiled groups and entities rules
+    :type rules_matcher: RulesMatcher
+    :param prepared_movements_callback: function receiving every chunk of prepared movements in order (None to skip it)
+    :type prepared_movements_callback: function
+
+    :return: generator of movements
+    :rtype: generator
+    """
+    for prepared_movements in iterate_prepared_movements(chunks):
+        if prepared_movements_callback is not None:
+            prepared_movements_callback(prepared_movements)
+        # end if
+        yield from build_movement_records(prepared_movements, rules_matcher)
+    # end for
+
+def iterate_prepared_movement_records(prepared_chunks, rules_matcher):
+    """
+    Method to generate the compact movements of chunks of movements already prepared
+
+    :param prepared_chunks: chunks of movements prepared by iterate_prepared_movements in order
+    :type prepared_chunks: iterable of pandas.DataFrame
+    :param rules_matcher: compiled groups and entities rules
+    :type rules_matcher: RulesMatcher
+
+    :return: generator of movements
+    :rtype: generator
+    """
+    for prepared_movements in prepared_chunks:
+        yield from build_movement_records(prepared_movements, rules_matcher)
+    # end for
+
+def build_movements_events(prepared_movements, rules_matcher):
+    """
+    Method to build the MOVEMENT events from the columns of the prepared movements
+
+    :param prepared_movements: movements prepared by prepare_movements
+    :type prepared_movements: pandas.DataFrame
+    :param rules_matcher: compiled groups and entities rules
+    :type rules_matcher: RulesMatcher
+
+    :return: list of MOVEMENT events
+    :rtype: list
+    """
+    return [movement_record.to_event() for movement_record in build_movement_records(prepared_movements, rules_matcher)]
+
+def iterate_movements_events(chunks, rules_matcher):
+    """
+    Method to generate the MOVEMENT events of a statement read in chunks
+
+    :param chunks: chunks of movements of the statement in order
+    :type chunks: iterable of pandas.DataFrame
+    :param rules_matcher: compiled groups and entities rules
+    :type rules_matcher: RulesMatcher
+
+    :return: generator of MOVEMENT events
+    :rtype: generator
+    """
+    for movement_record in iterate_movement_records(chunks, rules_matcher):
+        yield movement_record.to_event()
+    # end for
@@ -0,0 +1,139 @@
+"""
+Row level comparison of the movements of a statement with the stored MOVEMENT events
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import datetime
+from collections import namedtuple, Counter
+
+# Import daily balances
+from bankboa.ingestions.ingestion_transactions import daily_balances
+
+# Stable key of a movement. The start holds the operation date and the index inside the day
+MovementKey = namedtuple("MovementKey", ["start", "amount", "concept"])
+
+# Movement stored in the DDBB with its key and the stop of its event
+StoredMovement = namedtuple("StoredMovement", ["key", "stop"])
+
+# Window of the DDBB to replace with the movements of the statement
+ChangedWindow = namedtuple("ChangedWindow", ["validity_start", "validity_stop", "movement_records"])
+
+def get_movement_key(start, amount, concept):
+    """
+    Method to obtain the stable key of a movement
+
+    :param start: start of the MOVEMENT event
+    :type start: datetime
+    :param amount: amount of the movement
+    :type amount: float
+    :param concept: concept of the movement
+    :type concept: str
+
+    :return: key of the movement
+    :rtype: MovementKey
+    """
+    return MovementKey(start, round(amount, 2), concept)
+
+def get_movement_key_from_record(movement_record):
+    """
+    Method to obtain the stable key of a movement not inserted yet
+
+    :param movement_record: movement of the statement
+    :type movement_record: MovementRecord
+
+    :return: key of the movement
+    :rtype: MovementKey
+    """
+    return get_movement_key(datetime.datetime.fromisoformat(movement_record.start), movement_record.amount, movement_record.concept)
+
+def _add_movement(days, start, stop):
+    """
+    Method to register the period of a movement in its operation day
+
+    :param days: movements of each operation day
+    :type days: dict
+    :param start: start of the MOVEMENT event
+    :type start: datetime
+    :param stop: stop of the MOVEMENT event
+    :type stop: datetime
+
+    :return: movements of the operation day of the movement
+    :rtype: dict
+    """
+    operation_day = daily_balances.get_operation_day(start)
+    if operation_day not in days:
+        days[operation_day] = {"start": start, "stop": stop, "movement_records": [], "incoming_keys": Counter(), "stored_keys": Counter()}
+    # end if
+    day = days[operation_day]
+    day["start"] = min(day["start"], start)
+    day["stop"] = max(day["stop"], stop)
+
+    return day
+
+def get_changed_windows(movement_records, stored_movements):
+    """
+    Method to obtain the windows of the DDBB where the movements of a statement differ from the stored ones.
+
+    The movements (of the statement and stored) are compared per operation day. The insertion of the
+    MOVEMENT events erases the stored events starting inside the validity of the source, so every window
+    starts with the first movement of its operation days and stops with the first movement of the next
+    operation day, keeping the stored events of the unchanged days. A changed day without movements in
+    the statement (all its movements were removed) is replaced together with the next day of the statement,
+    so the operation erasing it always inserts MOVEMENT events. The stored movements of days out of the
+    ones covered by the statement are not compared
+
+    :param movement_records: movements of the statement
+    :type movement_records: iterable of MovementRecord
+    :param stored_movements: stored movements starting in the window covered by the statement
+    :type stored_movements: list of StoredMovement
+
+    :return: windows sorted by start with the movements to insert in each one
+    :rtype: list of ChangedWindow
+    """
+    # Movements of each operation day
+    days = {}
+    for movement_record in movement_records:
+        start = datetime.datetime.fromisoformat(movement_record.start)
+        day = _add_movement(days, start, datetime.datetime.fromisoformat(movement_record.stop))
+        day["movement_records"].append((start, movement_record))
+        day["incoming_keys"][get_movement_key_from_record(movement_record)] += 1
+    # end for
+    if len(days) == 0:
+        return []
+    # end if
+    first_day = min(days)
+    last_day = max(days)
+    for stored_movement in stored_movements:
+        day = _add_movement(days, stored_movement.key.start, stored_movement.stop)
+        day["stored_keys"][stored_movement.key] += 1
+    # end for
+
+    # Join the consecutive changed days in windows
+    changed_windows = []
+    window = None
+    replace_next_day = False
+    for operation_day in sorted(days):
+        day = days[operation_day]
+        changed = first_day <= operation_day <= last_day and day["incoming_keys"] != day["stored_keys"]
+        if not changed and not replace_next_day:
+            if window is not None:
+                changed_windows.append(ChangedWindow(window["start"].isoformat(), day["start"].isoformat(), window["movement_records"]))
+                window = None
+            # end if
+            continue
+        # end if
+        if window is None:
+            window = {"start": day["start"], "stop": day["stop"], "movement_records": []}
+        # end if
+        window["stop"] = max(window["stop"], day["stop"])
+        window["movement_records"].extend(movement_record for start, movement_record in sorted(day["movement_records"], key = lambda movement: movement[0]))
+        replace_next_day = len(day["movement_records"]) == 0
+    # end for
+    if window is not None:
+        changed_windows.append(ChangedWindow(window["start"].isoformat(), window["stop"].isoformat(), window["movement_records"]))
+    # end if
+
+    return changed_windows
@@ -0,0 +1,182 @@
+"""
+Asynchronous writer of the progress of the ingestions of transactions
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import atexit
+import threading
+
+# Import EBOA ingestion functions helpers
+import eboa.ingestion.functions as eboa_ingestion_functions
+
+# Import query
+from eboa.engine.query import Query
+
+# Import logging
+from eboa.logging import Log
+
+logging_module = Log(name = __name__)
+logger = logging_module.logger
+
+# Minimum number of seconds between two rounds of writes (the reports received meanwhile are coalesced)
+MIN_INTERVAL = 0.5
+
+# Maximum number of seconds waiting for the pending reports on exit
+EXIT_TIMEOUT = 5
+
+class ProgressWriter():
+    """
+    Writer of the ingestion progress of the PENDING_SOURCES entries in a background thread.
+
+    The reports only register the last percentage per file, so the reports received
+    while a round of writes is in course or during the minimum interval between rounds
+    are coalesced into one write. The writes reuse the session of one Query
+    and the PENDING_SOURCES entries are looked up once per file
+    """
+
+    def __init__(self, query_factory, write_progress, min_interval = MIN_INTERVAL):
+        self.query_factory = query_factory
+        self.write_progress = write_progress
+        self.min_interval = min_interval
+        self.pending = {}
+        self.writing = False
+        self.flushing = False
+        self.thread = None
+        self.query = None
+        self.sources = {}
+        self.reports = 0
+        self.writes = 0
+        self.condition = threading.Condition()
+
+    def report(self, file_name, percentage):
+        """
+        Method to register the progress of the ingestion of a file without waiting for its write
+
+        :param file_name: name of the file (name of the PENDING_SOURCES entry)
+        :type file_name: str
+        :param percentage: progress of the ingestion
+        :type percentage: int
+        """
+        with self.condition:
+            self.reports += 1
+            self.pending[file_name] = percentage
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target = self._run, name = "ingestion_progress_writer", daemon = True)
+                self.thread.start()
+            # end if
+            self.condition.notify_all()
+        # end with
+
+    def flush(self, timeout = None):
+        """
+        Method to wait until the registered reports are written
+
+        :param timeout: maximum number of seconds to wait (no limit if None)
+        :type timeout: float
+
+        :return: True if every report has been written
+        :rtype: bool
+        """
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            flushed = self.condition.wait_for(lambda: len(self.pending) == 0 and not self.writing, timeout = timeout)
+            self.flushing = False
+        # end with
+
+        return flushed
+
+    def _get_source(self, file_name):
+        """
+        Method to obtain the PENDING_SOURCES entry of a file
+
+        :param file_name: name of the file
+        :type file_name: str
+
+        :return: PENDING_SOURCES entry (None if it does not exist)
+        :rtype: Source
+        """
+        if file_name not in self.sources:
+            sources = self.query.get_sources(names = {"filter": file_name, "op": "=="},
+                                             dim_signatures = {"filter": "PENDING_SOURCES", "op": "=="},
+                                             processors = {"filter": "", "op": "=="},
+                                             processor_version_filters = [{"filter": "", "op": "=="}])
+            self.sources[file_name] = sources[0] if len(sources) > 0 else None
+        # end if
+
+        return self.sources[file_name]
+
+    def _write(self, pending):
+        """
+        Method to write a round of reports
+
+        :param pending: last percentage per file name
+        :type pending: dict
+        """
+        if self.query is None:
+            self.query = self.query_factory()
+        # end if
+
+        for file_name, percentage in pending.items():
+            try:
+                source = self._get_source(file_name)
+                if source is not None:
+                    self.write_progress(self.query.session, source, percentage)
+                    self.writes += 1
+                # end if
+            except Exception as error:
+                logger.error(f"The progress {percentage} of {file_name} could not be written: {error}")
+                self.query.session.rollback()
+                self.sources.pop(file_name, None)
+            # end try
+
+            # The entry of a finished file is not needed anymore
+            if percentage >= 100:
+                self.sources.pop(file_name, None)
+            # end if
+        # end for
+
+    def _run(self):
+        """
+        Method executed by the background thread writing the reports
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self.pending) > 0)
+                pending = self.pending
+                self.pending = {}
+                self.writing = True
+            # end with
+
+            try:
+                self._write(pending)
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+                    # Coalesce the reports received during the interval (unless waited for)
+                    self.condition.wait_for(lambda: self.flushing, timeout = self.min_interval)
+                # end with
+            # end try
+        # end while
+
+# Writer shared by the ingestions executed in the process
+progress_writer = ProgressWriter(Query, eboa_ingestion_functions.insert_ingestion_progress)
+
+# The reports pending on exit are written before finishing the process
+atexit.register(progress_writer.flush, EXIT_TIMEOUT)
+
+def report(file_name, percentage):
+    """
+    Method to register the progress of the ingestion of a file with the shared writer
+
+    :param file_name: name of the file (name of the PENDING_SOURCES entry)
+    :type file_name: str
+    :param percentage: progress of the ingestion
+    :type percentage: int
+    """
+    progress_writer.report(file_name, percentage)
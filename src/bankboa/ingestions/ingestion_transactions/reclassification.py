@@ -0,0 +1,497 @@
+"""
+Reclassification of the stored movements when the groups and entities rules change
+
+The previous and the current rules are compared to obtain the matching strings
+of the added, removed or changed rules. Only the MOVEMENT events whose concept
+contains any of these strings are classified again and only the ones whose groups
+or entities change are rewritten (in place, keeping the links of the aggregations).
+The months and years of the rewritten movements are marked to be aggregated again
+by the ingestion of grouped movements
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import argparse
+import datetime
+from collections import namedtuple
+from dateutil.relativedelta import relativedelta
+
+# Import SQLAlchemy utilities
+from sqlalchemy import and_, or_
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.functions import get_resources_path
+
+# Import query
+from eboa.engine.query import Query
+
+# Import datamodel
+from eboa.datamodel.events import Event, EventText, EventDouble
+from eboa.datamodel.gauges import Gauge
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import aggregation engine
+from bankboa.ingestions.ingestion_transactions import aggregation
+
+# Import logging
+from eboa.logging import Log
+
+logging_module = Log(name = __name__)
+logger = logging_module.logger
+
+version = "1.0"
+
+# Maximum number of matching strings used in a single query
+STRINGS_CHUNK_SIZE = 100
+
+# Names of the values holding the number of groups and entities
+NUMBER_NAMES = ["number_of_groups", "number_of_entities"]
+
+# Classification of a stored MOVEMENT event
+# - groups and entities: names in the order of the values
+# - position, parent_level and parent_position: placement of the first value of the classification
+StoredClassification = namedtuple("StoredClassification", ["event_uuid", "start", "concept", "amount", "groups", "entities",
+                                                           "position", "parent_level", "parent_position"])
+
+# Stored classification with the values of the classification with the current rules
+Reclassification = namedtuple("Reclassification", ["stored_classification", "values"])
+
+def get_changed_strings(previous_groups, previous_entities, groups, entities):
+    """
+    Method to obtain the matching strings of the rules added, removed or changed between two configurations.
+    The order of the groups and entities is not taken into account as it does not change the aggregations
+
+    :param previous_groups: previous groups configuration
+    :type previous_groups: tuple of Group
+    :param previous_entities: previous entities configuration
+    :type previous_entities: tuple of Entity
+    :param groups: current groups configuration
+    :type groups: tuple of Group
+    :param entities: current entities configuration
+    :type entities: tuple of Entity
+
+    :return: matching strings (the empty string matches every concept)
+    :rtype: set
+    """
+    def get_rules(groups, entities):
+        group_rules = {("group", group.name, rule.match, rule.signs) for group in groups for rule in group.rules}
+        entity_rules = {("entity", entity.name, string, None) for entity in entities for string in entity.strings}
+        return group_rules | entity_rules
+    # end def
+
+    previous_rules = get_rules(previous_groups, previous_entities)
+    current_rules = get_rules(groups, entities)
+
+    return {string for kind, name, string, signs in previous_rules ^ current_rules}
+
+def get_stored_classifications(query, strings):
+    """
+    Method to obtain the classification of the MOVEMENT events whose concept contains any of the strings
+
+    :param query: Query instance
+    :type query: Query
+    :param strings: matching strings (the empty string selects every movement)
+    :type strings: set
+
+    :return: list of classifications sorted by start
+    :rtype: list of StoredClassification
+    """
+    movements_query = query.session.query(Event.event_uuid, Event.start, EventText.value).join(
+        Gauge, Event.gauge_uuid == Gauge.gauge_uuid).join(
+            EventText, and_(EventText.event_uuid == Event.event_uuid, EventText.name == "concept")).filter(
+                Gauge.name == "MOVEMENT")
+
+    concepts = {}
+    if "" in strings:
+        concepts = {event_uuid: (start, concept) for event_uuid, start, concept in movements_query}
+    else:
+        sorted_strings = sorted(strings)
+        for i in range(0, len(sorted_strings), STRINGS_CHUNK_SIZE):
+            chunk = sorted_strings[i:i + STRINGS_CHUNK_SIZE]
+            for event_uuid, start, concept in movements_query.filter(or_(*[EventText.value.contains(string, autoescape = True) for string in chunk])):
+                concepts[event_uuid] = (start, concept)
+            # end for
+        # end for
+    # end if
+
+    amounts = {}
+    classification_values = {}
+    event_uuids = list(concepts)
+    for i in range(0, len(event_uuids), aggregation.EVENT_UUIDS_CHUNK_SIZE):
+        chunk = event_uuids[i:i + aggregation.EVENT_UUIDS_CHUNK_SIZE]
+
+        event_doubles = query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(chunk),
+                                                                EventDouble.name.in_(["amount"] + NUMBER_NAMES))
+        for event_double in event_doubles:
+            if event_double.name == "amount":
+                amounts[event_double.event_uuid] = event_double.value
+            else:
+                classification_values.setdefault(event_double.event_uuid, []).append(event_double)
+            # end if
+        # end for
+
+        event_texts = query.session.query(EventText).filter(EventText.event_uuid.in_(chunk),
+                                                            or_(EventText.name.like("group%"),
+                                                                EventText.name.like("entity%")))
+        for event_text in event_texts:
+            classification_values.setdefault(event_text.event_uuid, []).append(event_text)
+        # end for
+    # end for
+
+    stored_classifications = []
+    for event_uuid, (start, concept) in concepts.items():
+        values = sorted(classification_values.get(event_uuid, []), key = lambda value: value.position)
+        if len(values) == 0:
+            continue
+        # end if
+        stored_classifications.append(StoredClassification(event_uuid,
+                                                           start,
+                                                           concept,
+                                                           amounts.get(event_uuid, 0),
+                                                           tuple(value.value for value in values if value.name.startswith("group")),
+                                                           tuple(value.value for value in values if value.name.startswith("entity")),
+                                                           values[0].position,
+                                                           values[0].parent_level,
+                                                           values[0].parent_position))
+    # end for
+    stored_classifications.sort(key = lambda stored_classification: stored_classification.start)
+
+    return stored_classifications
+
+def get_reclassifications(stored_classifications, rules_matcher):
+    """
+    Method to classify the stored movements with the current rules
+    keeping only the ones whose groups or entities change
+
+    :param stored_classifications: classifications of the stored movements
+    :type stored_classifications: list of StoredClassification
+    :param rules_matcher: compiled current rules
+    :type rules_matcher: RulesMatcher
+
+    :return: list of reclassifications
+    :rtype: list of Reclassification
+    """
+    reclassifications = []
+    for stored_classification in stored_classifications:
+        groups, entities = rules_matcher.match(stored_classification.concept, stored_classification.amount)
+        values = movements.build_classification_values(groups, entities, stored_classification.amount)
+        names = get_classification_names(values)
+        if names != (frozenset(stored_classification.groups), frozenset(stored_classification.entities)):
+            reclassifications.append(Reclassification(stored_classification, values))
+        # end if
+    # end for
+
+    return reclassifications
+
+def get_classification_names(values):
+    """
+    Method to obtain the groups and entities held by the values of a classification
+
+    :param values: values built by build_classification_values
+    :type values: list
+
+    :return: tuple with the set of groups and the set of entities
+    :rtype: tuple
+    """
+    return (frozenset(value["value"] for value in values if value["type"] == "text" and value["name"].startswith("group")),
+            frozenset(value["value"] for value in values if value["type"] == "text" and value["name"].startswith("entity")))
+
+def get_changed_keys(reclassifications):
+    """
+    Method to obtain the groups and entities whose aggregation changes per month and per year
+    (the previous and the new groups and entities of the reclassified movements)
+
+    :param reclassifications: reclassifications of the stored movements
+    :type reclassifications: list of Reclassification
+
+    :return: tuple with the changed keys per month start and the changed keys per year start
+    :rtype: tuple
+    """
+    previous_movements = []
+    new_movements = []
+    for stored_classification, values in reclassifications:
+        groups, entities = get_classification_names(values)
+        previous_movements.append(aggregation.Movement(stored_classification.event_uuid,
+                                                       stored_classification.start,
+                                                       stored_classification.amount,
+                                                       frozenset(stored_classification.groups),
+                                                       frozenset(stored_classification.entities)))
+        new_movements.append(aggregation.Movement(stored_classification.event_uuid,
+                                                  stored_classification.start,
+                                                  stored_classification.amount,
+                                                  groups,
+                                                  entities))
+    # end for
+
+    return aggregation.get_changed_keys(previous_movements, new_movements)
+
+def rewrite_classifications(query, reclassifications):
+    """
+    Method to replace the values of the groups and entities of the stored MOVEMENT events in bulk.
+    The events keep their UUIDs so the links of the aggregated events remain valid
+
+    :param query: Query instance
+    :type query: Query
+    :param reclassifications: reclassifications of the stored movements
+    :type reclassifications: list of Reclassification
+    """
+    try:
+        for i in range(0, len(reclassifications), aggregation.EVENT_UUIDS_CHUNK_SIZE):
+            chunk = reclassifications[i:i + aggregation.EVENT_UUIDS_CHUNK_SIZE]
+            event_uuids = [stored_classification.event_uuid for stored_classification, values in chunk]
+
+            query.session.query(EventText).filter(EventText.event_uuid.in_(event_uuids),
+                                                  or_(EventText.name.like("group%"),
+                                                      EventText.name.like("entity%"))).delete(synchronize_session = False)
+            query.session.query(EventDouble).filter(EventDouble.event_uuid.in_(event_uuids),
+                                                    EventDouble.name.in_(NUMBER_NAMES)).delete(synchronize_session = False)
+
+            texts = []
+            doubles = []
+            for stored_classification, values in chunk:
+                for position, value in enumerate(values, stored_classification.position):
+                    mapping = {"event_uuid": stored_classification.event_uuid,
+                               "name": value["name"],
+                               "value": value["value"],
+                               "position": position,
+                               "parent_level": stored_classification.parent_level,
+                               "parent_position": stored_classification.parent_position}
+                    if value["type"] == "text":
+                        texts.append(mapping)
+                    else:
+                        doubles.append(mapping)
+                    # end if
+                # end for
+            # end for
+            query.session.bulk_insert_mappings(EventText, texts)
+            query.session.bulk_insert_mappings(EventDouble, doubles)
+        # end for
+        query.session.commit()
+    except Exception:
+        query.session.rollback()
+        raise
+    # end try
+
+def _get_periods(period_starts, delta):
+    """
+    Method to join the consecutive periods in ranges
+
+    :param period_starts: starts of the periods
+    :type period_starts: iterable of datetime
+    :param delta: duration of the periods
+    :type delta: relativedelta
+
+    :return: list of tuples (start, stop) sorted by start
+    :rtype: list
+    """
+    return aggregation.coalesce_periods([(period_start, period_start + delta) for period_start in period_starts])
+
+def build_update_operations(query, changed_keys, gauge_name, dim_signature, delta, source_name, reception_time):
+    """
+    Method to build the operations marking the periods with changed keys to be aggregated again.
+    One operation is built per range of consecutive periods (so that the rest of periods keep their status)
+
+    The generation time follows the one of the stored marks of the periods, so that these are replaced.
+    The next ingestion of grouped movements supersedes the new marks once it aggregates the periods
+    (see get_update_generation_time)
+
+    :param query: Query instance
+    :type query: Query
+    :param changed_keys: changed keys per period start
+    :type changed_keys: dict
+    :param gauge_name: name of the gauge of the update events (UPDATE_MONTH or UPDATE_YEAR)
+    :type gauge_name: str
+    :param dim_signature: DIM signature of the update events
+    :type dim_signature: str
+    :param delta: duration of the periods
+    :type delta: relativedelta
+    :param source_name: name of the source of the operations
+    :type source_name: str
+    :param reception_time: reception time of the source
+    :type reception_time: str
+
+    :return: list of operations
+    :rtype: list
+    """
+    operations = []
+    for i, (start, stop) in enumerate(_get_periods(changed_keys, delta)):
+        pending_keys = aggregation.get_pending_keys(query, gauge_name, start, stop)
+        generation_time = aggregation.get_update_generation_time(query, dim_signature, start, stop)
+
+        update_events = []
+        period_start = start
+        while period_start < stop:
+            update_events.append({
+                "gauge": {
+                    "insertion_type": "INSERT_and_ERASE",
+                    "name": gauge_name,
+                    "system": "BANCO SANTANDER"
+                },
+                "start": period_start.isoformat(),
+                "stop": (period_start + delta).isoformat(),
+                "values": aggregation.build_update_values(period_start, changed_keys, pending_keys)
+            })
+            period_start = period_start + delta
+        # end while
+
+        operations.append({
+            "mode": "insert_and_erase",
+            "dim_signature": {
+                "name": dim_signature,
+                "exec": os.path.basename(__file__),
+                "version": version
+            },
+            "source": {
+                "name": source_name if i == 0 else f"{source_name}#{i}",
+                "reception_time": reception_time,
+                "generation_time": generation_time.isoformat(),
+                "reported_validity_start": start.isoformat(),
+                "reported_validity_stop": stop.isoformat(),
+                "validity_start": start.isoformat(),
+                "validity_stop": stop.isoformat()
+            },
+            "events": update_events
+        })
+    # end for
+
+    return operations
+
+def _mark_periods(query, month_keys, year_keys, source_name, reception_time):
+    """
+    Method to mark the months and years with changed keys to be aggregated again
+
+    :param query: Query instance
+    :type query: Query
+    :param month_keys: changed keys per month start
+    :type month_keys: dict
+    :param year_keys: changed keys per year start
+    :type year_keys: dict
+    :param source_name: name of the source of the operations
+    :type source_name: str
+    :param reception_time: reception time of the source
+    :type reception_time: str
+
+    :return: number of erroneous operations
+    :rtype: int
+    """
+    operations = build_update_operations(query, month_keys, "UPDATE_MONTH", "UPDATE_MONTHS_SANTANDER", relativedelta(months=1), source_name, reception_time)
+    operations += build_update_operations(query, year_keys, "UPDATE_YEAR", "UPDATE_YEARS_SANTANDER", relativedelta(years=1), source_name, reception_time)
+
+    engine = Engine()
+    try:
+        exit_status = engine.treat_data({"operations": operations})
+    finally:
+        engine.close_session()
+    # end try
+
+    return len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]])
+
+def reclassify(previous_groups_path, previous_entities_path, groups_path = None, entities_path = None, dry_run = False):
+    """
+    Method to reclassify the stored movements affected by the changes between the previous and the current rules
+
+    :param previous_groups_path: path to the previous groups.xml file
+    :type previous_groups_path: str
+    :param previous_entities_path: path to the previous entities.xml file
+    :type previous_entities_path: str
+    :param groups_path: path to the current groups.xml file (the configured one by default)
+    :type groups_path: str
+    :param entities_path: path to the current entities.xml file (the configured one by default)
+    :type entities_path: str
+    :param dry_run: flag to obtain the affected movements and periods without modifying the DDBB
+    :type dry_run: bool
+
+    :return: report with the changed strings and the numbers of movements, months and years affected
+    :rtype: dict
+    """
+    if groups_path is None:
+        groups_path = get_resources_path() + "/groups.xml"
+    # end if
+    if entities_path is None:
+        entities_path = get_resources_path() + "/entities.xml"
+    # end if
+
+    changed_strings = get_changed_strings(rules.get_groups(previous_groups_path), rules.get_entities(previous_entities_path),
+                                          rules.get_groups(groups_path), rules.get_entities(entities_path))
+    report = {"changed_strings": sorted(changed_strings), "candidates": 0, "reclassified": 0, "months": [], "years": [], "errors": 0}
+    if len(changed_strings) == 0:
+        return report
+    # end if
+
+    query = Query()
+    try:
+        stored_classifications = get_stored_classifications(query, changed_strings)
+        reclassifications = get_reclassifications(stored_classifications, rules.get_rules_matcher(groups_path, entities_path))
+        month_keys, year_keys = get_changed_keys(reclassifications)
+
+        report["candidates"] = len(stored_classifications)
+        report["reclassified"] = len(reclassifications)
+        report["months"] = [month_start.isoformat() for month_start in sorted(month_keys)]
+        report["years"] = [year_start.isoformat() for year_start in sorted(year_keys)]
+        if dry_run or len(reclassifications) == 0:
+            return report
+        # end if
+
+        # The periods are marked first so that a failure rewriting the movements only causes extra aggregations
+        now = datetime.datetime.now()
+        source_name = f"RECLASSIFICATION_{now.strftime('%Y%m%dT%H%M%S')}"
+        report["errors"] = _mark_periods(query, month_keys, year_keys, source_name, now.isoformat())
+        if report["errors"] > 0:
+            logger.error("The periods of the reclassified movements could not be marked to be aggregated, so the movements are not rewritten")
+            return report
+        # end if
+
+        rewrite_classifications(query, reclassifications)
+
+        # An ingestion of grouped movements run before the rewrite committed aggregated the previous
+        # classification and superseded the marks, so the periods are marked again
+        report["errors"] = _mark_periods(query, month_keys, year_keys, f"{source_name}_REWRITTEN", datetime.datetime.now().isoformat())
+        if report["errors"] > 0:
+            logger.error("The periods of the reclassified movements could not be marked again after rewriting the movements, so their aggregations could be outdated")
+        # end if
+
+        logger.info(f"Reclassified {len(reclassifications)} movements of {len(stored_classifications)} candidates matching {len(changed_strings)} changed strings")
+    finally:
+        query.close_session()
+    # end try
+
+    return report
+
+def main():
+
+    args_parser = argparse.ArgumentParser(description="Reclassification of the stored movements affected by the changes of the groups and entities rules")
+    args_parser.add_argument("-g", dest="previous_groups", type=str, required=True,
+                             help="Path to the previous groups.xml file")
+    args_parser.add_argument("-e", dest="previous_entities", type=str, required=True,
+                             help="Path to the previous entities.xml file")
+    args_parser.add_argument("--groups", dest="groups", type=str,
+                             help="Path to the current groups.xml file (the configured one by default)")
+    args_parser.add_argument("--entities", dest="entities", type=str,
+                             help="Path to the current entities.xml file (the configured one by default)")
+    args_parser.add_argument("-n", dest="dry_run", action="store_true",
+                             help="Report the affected movements and periods without modifying the DDBB")
+    args = args_parser.parse_args()
+
+    report = reclassify(args.previous_groups, args.previous_entities, args.groups, args.entities, args.dry_run)
+
+    print(f"Changed matching strings: {len(report['changed_strings'])}")
+    print(f"Movements: {report['candidates']} candidates, {report['reclassified']} reclassified{' (dry run)' if args.dry_run else ''}")
+    print(f"Months to aggregate: {', '.join(month[0:7] for month in report['months'])}")
+    print(f"Years to aggregate: {', '.join(year[0:4] for year in report['years'])}")
+    if report["errors"] > 0:
+        print(f"Erroneous operations: {report['errors']}")
+    # end if
+
+if __name__ == "__main__":
+
+    main()
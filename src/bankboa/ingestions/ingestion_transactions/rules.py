@@ -0,0 +1,514 @@
+"""
+Matcher of the movements against the configured groups and entities
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import math
+import threading
+from collections import deque, namedtuple, OrderedDict
+
+# Import xml parser
+from lxml import etree
+
+# Immutable representation of the rules configuration
+# - Rule: match string and set of allowed amount signs ('>0', '<0')
+# - Group: name of the group and tuple of rules
+# - Entity: name of the entity and tuple of matching strings
+Rule = namedtuple("Rule", ["match", "signs"])
+Group = namedtuple("Group", ["name", "rules"])
+Entity = namedtuple("Entity", ["name", "strings"])
+
+# Process wide cache of the parsed configurations
+# - configurations: path -> (file signature, parsed configuration)
+# - matchers: (groups signature, entities signature) -> RulesMatcher
+_cache = {"configurations": {}, "matchers": {}}
+_cache_lock = threading.Lock()
+
+# Maximum number of classifications kept in the process wide cache
+CLASSIFICATION_CACHE_SIZE = int(os.environ.get("BANKBOA_CLASSIFICATION_CACHE_SIZE", "50000"))
+
+class ClassificationCache():
+    """
+    Bounded LRU cache of the groups and entities matching the movements.
+
+    The classifications are keyed on the version of the rules, the concept and the sign
+    of the amount (the only property of the amount used by the rules)
+    """
+
+    def __init__(self, max_size = CLASSIFICATION_CACHE_SIZE):
+        self.max_size = max_size
+        self.classifications = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Method to obtain a classification marking it as the most recently used
+
+        :param key: version of the rules, concept and sign of the amount
+        :type key: tuple
+
+        :return: tuple with the group names and the entity names (None if not cached)
+        :rtype: tuple
+        """
+        with self.lock:
+            classification = self.classifications.get(key)
+            if classification is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.classifications.move_to_end(key)
+            # end if
+        # end with
+
+        return classification
+
+    def put(self, key, classification):
+        """
+        Method to register a classification evicting the least recently used ones if needed
+
+        :param key: version of the rules, concept and sign of the amount
+        :type key: tuple
+        :param classification: tuple with the group names and the entity names
+        :type classification: tuple
+        """
+        with self.lock:
+            self.classifications[key] = classification
+            self.classifications.move_to_end(key)
+            while len(self.classifications) > self.max_size:
+                self.classifications.popitem(last = False)
+                self.evictions += 1
+            # end while
+        # end with
+
+    def clear(self):
+        """
+        Method to remove the classifications (the counters are kept)
+        """
+        with self.lock:
+            self.classifications.clear()
+        # end with
+
+    def get_statistics(self):
+        """
+        Method to obtain the counters of the cache
+
+        :return: size, hits, misses, evictions and hit rate of the cache
+        :rtype: dict
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.classifications),
+                    "max_size": self.max_size,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups > 0 else None}
+        # end with
+
+# Classifications shared by the ingestions executed in the process
+classification_cache = ClassificationCache()
+
+class Automaton():
+    """
+    Aho-Corasick automaton to find all the patterns contained in a text
+    with a single pass over the text
+    """
+
+    def __init__(self, patterns):
+        """
+        Build the automaton
+
+        :param patterns: list of non empty patterns (the position in the list identifies the pattern)
+        :type patterns: list of str
+        """
+        self.transitions = [{}]
+        self.failures = [0]
+        self.outputs = [[]]
+
+        # Build the trie
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for character in pattern:
+                next_state = self.transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][character] = next_state
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append([])
+                # end if
+                state = next_state
+            # end for
+            self.outputs[state].append(pattern_id)
+        # end for
+
+        # Build the failure links in breadth first order
+        pending_states = deque(self.transitions[0].values())
+        while len(pending_states) > 0:
+            state = pending_states.popleft()
+            for character, next_state in self.transitions[state].items():
+                pending_states.append(next_state)
+                failure = self.failures[state]
+                while failure != 0 and character not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                # end while
+                self.failures[next_state] = self.transitions[failure].get(character, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failures[next_state]]
+            # end for
+        # end while
+
+    def search(self, text):
+        """
+        Find the patterns contained in the text
+
+        :param text: text to look into
+        :type text: str
+
+        :return: identifiers of the patterns contained in the text
+        :rtype: set
+        """
+        found = set()
+        state = 0
+        for character in text:
+            while state != 0 and character not in self.transitions[state]:
+                state = self.failures[state]
+            # end while
+            state = self.transitions[state].get(character, 0)
+            if self.outputs[state]:
+                found.update(self.outputs[state])
+            # end if
+        # end for
+
+        return found
+
+def _xpath_string(value):
+    """
+    Convert a value to string following the conversion applied by XPath
+    to the variables used in the matching rules
+
+    :param value: value to convert
+    :type value: object
+
+    :return: string representation of the value
+    :rtype: str
+    """
+    if isinstance(value, str):
+        return value
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, (int, float)):
+        if math.isnan(value):
+            return "NaN"
+        elif math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        elif float(value).is_integer():
+            return str(int(value))
+        # end if
+    # end if
+
+    return str(value)
+
+def parse_groups(groups_xml):
+    """
+    Method to extract the rules of the groups configuration
+
+    :param groups_xml: parsed groups configuration
+    :type groups_xml: lxml.etree._ElementTree
+
+    :return: groups in document order
+    :rtype: tuple of Group
+    """
+    groups = []
+    for group in groups_xml.xpath("/groups/group"):
+        group_rules = []
+        for rule in group.xpath("matching_rules/rule"):
+            group_rules.append(Rule(rule.xpath("string(match)"),
+                                    frozenset(amount.xpath("string()") for amount in rule.xpath("amount"))))
+        # end for
+        groups.append(Group(group.xpath("name")[0].text, tuple(group_rules)))
+    # end for
+
+    return tuple(groups)
+
+def parse_entities(entities_xml):
+    """
+    Method to extract the matching strings of the entities configuration
+
+    :param entities_xml: parsed entities configuration
+    :type entities_xml: lxml.etree._ElementTree
+
+    :return: entities in document order
+    :rtype: tuple of Entity
+    """
+    entities = []
+    for entity in entities_xml.xpath("/entities/entity"):
+        entities.append(Entity(entity.xpath("name")[0].text,
+                               tuple(string.xpath("string(text())") for string in entity.xpath("matching_strings/string"))))
+    # end for
+
+    return tuple(entities)
+
+def _get_signature(path):
+    """
+    Method to obtain the signature of a configuration file used to detect changes
+
+    :param path: path to the configuration file
+    :type path: str
+
+    :return: tuple with the path, the modification time and the size of the file
+    :rtype: tuple
+    """
+    status = os.stat(path)
+
+    return (path, status.st_mtime_ns, status.st_size)
+
+def _get_configuration(path, parse_function):
+    """
+    Method to obtain a parsed configuration, parsing it only when the file changed
+
+    :param path: path to the configuration file
+    :type path: str
+    :param parse_function: function extracting the rules from the parsed XML
+    :type parse_function: function
+
+    :return: tuple with the signature of the file and the parsed configuration
+    :rtype: tuple
+    """
+    signature = _get_signature(path)
+    with _cache_lock:
+        cached = _cache["configurations"].get(path)
+    # end with
+    if cached is not None and cached[0] == signature:
+        return cached
+    # end if
+
+    cached = (signature, parse_function(etree.parse(path)))
+    with _cache_lock:
+        _cache["configurations"][path] = cached
+    # end with
+
+    return cached
+
+def get_groups(groups_path):
+    """
+    Method to obtain the groups configuration from the process wide cache
+
+    :param groups_path: path to the groups.xml file
+    :type groups_path: str
+
+    :return: groups in document order
+    :rtype: tuple of Group
+    """
+    return _get_configuration(groups_path, parse_groups)[1]
+
+def get_entities(entities_path):
+    """
+    Method to obtain the entities configuration from the process wide cache
+
+    :param entities_path: path to the entities.xml file
+    :type entities_path: str
+
+    :return: entities in document order
+    :rtype: tuple of Entity
+    """
+    return _get_configuration(entities_path, parse_entities)[1]
+
+def get_rules_matcher(groups_path, entities_path):
+    """
+    Method to obtain the matcher of the current rules from the process wide cache.
+    The configurations are parsed and compiled again only when the files change
+
+    :param groups_path: path to the groups.xml file
+    :type groups_path: str
+    :param entities_path: path to the entities.xml file
+    :type entities_path: str
+
+    :return: compiled rules
+    :rtype: RulesMatcher
+    """
+    groups_signature, groups = _get_configuration(groups_path, parse_groups)
+    entities_signature, entities = _get_configuration(entities_path, parse_entities)
+    version = (groups_signature, entities_signature)
+    with _cache_lock:
+        rules_matcher = _cache["matchers"].get(version)
+    # end with
+    if rules_matcher is None:
+        rules_matcher = RulesMatcher(groups, entities, version)
+        with _cache_lock:
+            # Only the matcher of the current rules is kept
+            _cache["matchers"] = {version: rules_matcher}
+        # end with
+        # The classifications with the previous rules are not valid anymore
+        classification_cache.clear()
+    # end if
+
+    return rules_matcher
+
+class RulesMatcher():
+    """
+    Compiled version of the groups.xml and entities.xml configurations.
+
+    It returns the same groups and entities (in the same order) as the
+    following XPath queries:
+    - /groups/group[boolean(matching_rules/rule[contains($concept, match)][$amount > 0 and amount = '>0' or $amount < 0 and amount = '<0'])]
+    - /entities/entity[boolean(matching_strings/string[contains($concept, text())])]
+    """
+
+    def __init__(self, groups, entities, version = None, cache = None):
+        """
+        Compile the configurations
+
+        :param groups: groups configuration
+        :type groups: tuple of Group
+        :param entities: entities configuration
+        :type entities: tuple of Entity
+        :param version: identifier of the version of the configurations
+        :type version: tuple
+        :param cache: cache of the classifications (the process wide one if the version is given, none otherwise)
+        :type cache: ClassificationCache
+        """
+        self.version = version
+        if cache is None and version is not None:
+            cache = classification_cache
+        # end if
+        self.cache = cache
+        patterns = {}
+
+        # Compile groups
+        self.group_names = [group.name for group in groups]
+        self.group_patterns = {}
+        self.group_unconditional = []
+        for group_index, group in enumerate(groups):
+            for rule in group.rules:
+                constraint = (group_index, ">0" in rule.signs, "<0" in rule.signs)
+                if rule.match == "":
+                    # contains with an empty string is always true
+                    self.group_unconditional.append(constraint)
+                else:
+                    pattern_id = patterns.setdefault(rule.match, len(patterns))
+                    self.group_patterns.setdefault(pattern_id, []).append(constraint)
+                # end if
+            # end for
+        # end for
+
+        # Compile entities
+        self.entity_names = [entity.name for entity in entities]
+        self.entity_patterns = {}
+        self.entity_unconditional = set()
+        for entity_index, entity in enumerate(entities):
+            for string in entity.strings:
+                if string == "":
+                    # contains with an empty string is always true
+                    self.entity_unconditional.add(entity_index)
+                else:
+                    pattern_id = patterns.setdefault(string, len(patterns))
+                    self.entity_patterns.setdefault(pattern_id, []).append(entity_index)
+                # end if
+            # end for
+        # end for
+
+        self.automaton = Automaton(sorted(patterns, key = patterns.get))
+
+    def classify(self, concept, amount):
+        """
+        Obtain the groups and entities matching a movement (from the cache of classifications if available).
+        The cached tuples are shared by the movements with the same classification
+
+        :param concept: concept of the movement
+        :type concept: str
+        :param amount: amount of the movement
+        :type amount: float
+
+        :return: tuple with the tuple of group names and the tuple of entity names
+        :rtype: tuple
+        """
+        if self.cache is None:
+            group_names, entity_names = self._match(concept, amount)
+            return tuple(group_names), tuple(entity_names)
+        # end if
+
+        key = (self.version, concept, (amount > 0) - (amount < 0))
+        classification = self.cache.get(key)
+        if classification is None:
+            group_names, entity_names = self._match(concept, amount)
+            classification = (tuple(group_names), tuple(entity_names))
+            self.cache.put(key, classification)
+        # end if
+
+        return classification
+
+    def classify_movements(self, concepts, amounts):
+        """
+        Obtain the groups and entities matching a chunk of movements at once
+
+        :param concepts: concepts of the movements
+        :type concepts: list of str
+        :param amounts: amounts of the movements
+        :type amounts: list of float
+
+        :return: tuples with the tuple of group names and the tuple of entity names in the order of the movements
+        :rtype: list of tuple
+        """
+        return [self.classify(concept, amount) for concept, amount in zip(concepts, amounts)]
+
+    def match(self, concept, amount):
+        """
+        Obtain the groups and entities matching a movement (from the cache of classifications if available)
+
+        :param concept: concept of the movement
+        :type concept: str
+        :param amount: amount of the movement
+        :type amount: float
+
+        :return: tuple with the list of group names and the list of entity names
+        :rtype: tuple
+        """
+        group_names, entity_names = self.classify(concept, amount)
+
+        return list(group_names), list(entity_names)
+
+    def _match(self, concept, amount):
+        """
+        Obtain the groups and entities matching a movement evaluating the rules
+
+        :param concept: concept of the movement
+        :type concept: str
+        :param amount: amount of the movement
+        :type amount: float
+
+        :return: tuple with the list of group names and the list of entity names
+        :rtype: tuple
+        """
+        found = self.automaton.search(_xpath_string(concept))
+
+        # Groups
+        group_indexes = set()
+        positive = amount > 0
+        negative = amount < 0
+        if positive or negative:
+            constraints = list(self.group_unconditional)
+            for pattern_id in found:
+                constraints += self.group_patterns.get(pattern_id, [])
+            # end for
+            for group_index, allows_positive, allows_negative in constraints:
+                if (positive and allows_positive) or (negative and allows_negative):
+                    group_indexes.add(group_index)
+                # end if
+            # end for
+        # end if
+
+        # Entities
+        entity_indexes = set(self.entity_unconditional)
+        for pattern_id in found:
+            entity_indexes.update(self.entity_patterns.get(pattern_id, []))
+        # end for
+
+        return ([self.group_names[i] for i in sorted(group_indexes)],
+                [self.entity_names[i] for i in sorted(entity_indexes)])
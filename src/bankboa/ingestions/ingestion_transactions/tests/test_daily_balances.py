@@ -0,0 +1,48 @@
+"""
+Automated tests for the materialized daily balances
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import datetime
+
+# Import daily balances
+from bankboa.ingestions.ingestion_transactions import daily_balances
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+class TestDailyBalances(unittest.TestCase):
+
+    def test_get_operation_day(self):
+
+        assert daily_balances.get_operation_day(datetime.datetime(2023, 6, 2)) == datetime.datetime(2023, 6, 2)
+        assert daily_balances.get_operation_day(datetime.datetime(2023, 6, 1, 23, 59, 59, 999998)) == datetime.datetime(2023, 6, 2)
+
+    def test_build_daily_balances(self):
+
+        # Movements of a statement (newest first) sharing the operation date are moved back one microsecond each
+        movement_records = []
+        for start, amount, balance in [("2023-06-03T00:00:00", 20.0, 1070.0),
+                                       ("2023-06-02T23:59:59.999999", -50.0, 1050.0),
+                                       ("2023-06-02T00:00:00", -100.0, 1100.0),
+                                       ("2023-06-01T23:59:59.999999", 1000.0, 1200.0),
+                                       ("2023-06-01T23:59:59.999998", 200.0, 200.0)]:
+            movement_records.append(movements.MovementRecord("CONCEPT", amount, balance, None, None, start, None, (), ()))
+        # end for
+
+        balances = daily_balances.build_daily_balances(daily_balances.get_movement_balances_from_records(movement_records))
+
+        assert balances == [
+            daily_balances.DailyBalance(datetime.datetime(2023, 6, 2), 1100.0, 1200.0, -100.0, 3),
+            daily_balances.DailyBalance(datetime.datetime(2023, 6, 3), 1070.0, 20.0, -50.0, 2)
+        ]
+
+        events = daily_balances.build_daily_balance_events(balances)
+
+        assert [(event["start"], event["stop"]) for event in events] == [("2023-06-02T00:00:00", "2023-06-03T00:00:00"),
+                                                                         ("2023-06-03T00:00:00", "2023-06-04T00:00:00")]
+        assert events[0]["values"][0] == {"name": "balance", "type": "double", "value": 1100.0}
@@ -0,0 +1,104 @@
+"""
+Automated tests for the fingerprints of the Santander statements
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import datetime
+import pandas as pd
+
+# Import fingerprints of the statements
+from bankboa.ingestions.ingestion_transactions import fingerprints
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+class StoredEvent():
+    """
+    Object with the period of a stored event
+    """
+    def __init__(self, start, stop):
+        self.start = start
+        self.stop = stop
+
+class FingerprintEventsRecorder():
+    """
+    Object returning the stored STATEMENT_FINGERPRINT events in place of a Query
+    """
+    def __init__(self, events):
+        self.events = events
+        self.filters = []
+
+    def get_events(self, **kwargs):
+        self.filters.append(kwargs["value_filters"][0]["value"]["filter"])
+        return self.events
+
+class TestFingerprints(unittest.TestCase):
+
+    def setUp(self):
+
+        self.statement = pd.DataFrame({
+            "FECHA OPERACIÓN": ["03/06/2023", "02/06/2023", "02/06/2023"],
+            "FECHA VALOR": ["03/06/2023", "02/06/2023", "01/06/2023"],
+            "CONCEPTO": ["RECIBO LUZ", "NOMINA EMPRESA", "COMPRA TARJETA"],
+            "IMPORTE EUR": [-50.0, 1000.0, -20.5],
+            "SALDO": [1929.5, 1979.5, 979.5]
+        })
+
+    def test_normalized_content(self):
+
+        statement_fingerprint = fingerprints.get_statement_fingerprint([self.statement])
+
+        assert statement_fingerprint.number_of_movements == 3
+        assert statement_fingerprint.validity_start == "2023-06-01T23:59:59.999999"
+        assert statement_fingerprint.validity_stop == "2023-06-04T00:00:00"
+
+        # The representation of the cells and the chunks of the statement do not change the fingerprint
+        re_delivered_statement = self.statement.copy()
+        re_delivered_statement["CONCEPTO"] = ["RECIBO  LUZ ", "NOMINA EMPRESA", " COMPRA TARJETA"]
+        re_delivered_statement["IMPORTE EUR"] = ["-50", "1000.00", "-20.50"]
+        re_delivered_statement["FECHA VALOR"] = [datetime.datetime(2023, 6, 3), datetime.datetime(2023, 6, 2), datetime.datetime(2023, 6, 1)]
+
+        assert fingerprints.get_statement_fingerprint([re_delivered_statement.iloc[:2], re_delivered_statement.iloc[2:]]) == statement_fingerprint
+
+        # A change in the movements changes the fingerprint
+        changed_statement = self.statement.copy()
+        changed_statement.loc[2, "IMPORTE EUR"] = -20.4
+
+        assert fingerprints.get_statement_fingerprint([changed_statement]).fingerprint != statement_fingerprint.fingerprint
+
+        assert fingerprints.get_statement_fingerprint([self.statement.iloc[:0]]) is None
+
+    def test_fingerprint_while_building_movements(self):
+
+        # The fingerprint obtained in the same pass that builds the movements is the one of the statement
+        statement_hasher = fingerprints.StatementHasher()
+        movement_records = movements.MovementRecords(movements.iterate_movement_records([self.statement.iloc[:2], self.statement.iloc[2:]], rules.RulesMatcher((), ()), statement_hasher.update))
+
+        assert len(movement_records) == 3
+        assert statement_hasher.get_fingerprint() == fingerprints.get_statement_fingerprint([self.statement])
+
+    def test_is_statement_ingested(self):
+
+        statement_fingerprint = fingerprints.get_statement_fingerprint([self.statement])
+        fingerprint_event = fingerprints.build_fingerprint_event(statement_fingerprint)
+
+        assert fingerprint_event["start"] == statement_fingerprint.validity_start
+        assert fingerprint_event["stop"] == statement_fingerprint.validity_stop
+
+        # The stored event covers the whole validity of the statement
+        query = FingerprintEventsRecorder([StoredEvent(datetime.datetime(2023, 6, 1, 23, 59, 59, 999999), datetime.datetime(2023, 6, 4))])
+
+        assert fingerprints.is_statement_ingested(query, statement_fingerprint)
+        assert query.filters == [statement_fingerprint.fingerprint]
+
+        # The stored event was cut by a later statement
+        query = FingerprintEventsRecorder([StoredEvent(datetime.datetime(2023, 6, 1, 23, 59, 59, 999999), datetime.datetime(2023, 6, 3))])
+
+        assert not fingerprints.is_statement_ingested(query, statement_fingerprint)
@@ -12,6 +12,7 @@ import unittest
 import datetime
 import re
 import json
+import tempfile
 
 # Import engine of the DDBB
 import eboa.engine.engine as eboa_engine
@@ -21,6 +22,21 @@ from eboa.engine.query import Query
 # Import ingestion
 import eboa.ingestion.eboa_ingestion as ingestion
 
+# Import xml parser
+from lxml import etree
+
+# Import resources path
+from eboa.engine.functions import get_resources_path
+
+# Import generator of synthetic statements
+from bankboa.benchmarks import statement_generator
+
+# Import reclassification of the movements
+from bankboa.ingestions.ingestion_transactions import reclassification
+
+# Import aggregation engine
+from bankboa.ingestions.ingestion_transactions import aggregation
+
 class TestIngestionGroupTransactions(unittest.TestCase):
     def setUp(self):
         # Create the engine to manage the data
@@ -57,3 +73,364 @@ class TestIngestionGroupTransactions(unittest.TestCase):
         sources = self.query_eboa.get_sources()
 
         assert len(sources) == 1
+
+    def test_reingest_unchanged_movements(self):
+
+        # Movements of a year ending in December
+        statement_movements = statement_generator.generate_movements(300, 1, 20, stop = datetime.date(2024, 12, 20))
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            for module in ["ingestion_santander_transactions", "ingestion_group_transactions"]:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions." + module, file_path, "2018-01-01T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+            # end for
+
+            aggregated_events = self.query_eboa.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_%", "op": "like"})
+
+            # The next statement keeps the stored movements and adds one day of a new month and year
+            # (its fingerprint differs, so the movements are compared with the stored ones)
+            balance = round(statement_movements[0][4] + 100.0, 2)
+            statement_movements.insert(0, ["02/01/2025", "02/01/2025", "NOMINA COUNTERPART00000 000001", 100.0, balance])
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-02T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            # Only the month and the year of the new day have to be aggregated again
+            for gauge_name in ["UPDATE_MONTH", "UPDATE_YEAR"]:
+                update_events = self.query_eboa.get_events(gauge_names = {"filter": gauge_name, "op": "=="},
+                                                           value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+                assert [update_event.start for update_event in update_events] == [datetime.datetime(2025, 1, 1)]
+            # end for
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-02T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+        # end with
+
+        # The aggregations of the other months and years keep their events
+        new_aggregated_events = self.query_eboa.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_%", "op": "like"})
+        new_event_uuids = set(event.event_uuid for event in new_aggregated_events)
+
+        assert set(event.event_uuid for event in aggregated_events) <= new_event_uuids
+        assert len([event for event in new_aggregated_events if event.event_uuid not in set(event.event_uuid for event in aggregated_events) and event.start < datetime.datetime(2025, 1, 1)]) == 0
+        assert len([event for event in new_aggregated_events if event.start == datetime.datetime(2025, 1, 1)]) > 0
+
+    def test_remove_movements(self):
+
+        # Movements of a year ending in December
+        statement_movements = statement_generator.generate_movements(300, 1, 20, stop = datetime.date(2024, 12, 20))
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            for module in ["ingestion_santander_transactions", "ingestion_group_transactions"]:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions." + module, file_path, "2018-01-01T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+            # end for
+
+            # The next statement drops the movements of one concept in June, so its groups and entities lose them
+            removed_movements = [movement for movement in statement_movements if "COUNTERPART00003" in movement[2] and movement[0][3:] == "06/2024"]
+
+            assert len(removed_movements) > 0
+
+            statement_movements = [movement for movement in statement_movements if movement not in removed_movements]
+            generation_time = datetime.datetime.strptime(statement_movements[0][0], "%d/%m/%Y") + datetime.timedelta(days = 2)
+            file_path = statement_generator.write_statement(directory, statement_movements, generation_time)
+
+            for module in ["ingestion_santander_transactions", "ingestion_group_transactions"]:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions." + module, file_path, "2018-01-02T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+            # end for
+        # end with
+
+        update_events = self.query_eboa.get_events(gauge_names = {"filter": "UPDATE_%", "op": "like"},
+                                                   value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+        assert len(update_events) == 0
+
+        # Only the groups and entities with movements in a period keep its aggregations
+        movements = aggregation.get_movements(self.query_eboa, [(datetime.datetime(2023, 1, 1), datetime.datetime(2025, 1, 1))])
+        for value_name, attribute in [("group", "groups"), ("entity", "entities")]:
+            for period_name, get_period_start in [("MONTH", aggregation.get_month_start), ("YEAR", aggregation.get_year_start)]:
+                aggregated_events = self.query_eboa.get_events(gauge_names = {"filter": f"AGGREGATED_MOVEMENTS_{value_name.upper()}_{period_name}", "op": "=="})
+                aggregated_keys = set((event.start, [value.value for value in event.eventTexts if value.name == value_name][0]) for event in aggregated_events)
+
+                assert aggregated_keys == set((get_period_start(movement.start), name) for movement in movements for name in getattr(movement, attribute))
+                assert len([event for event in aggregated_events if len(event.eventLinks) == 0]) == 0
+            # end for
+        # end for
+
+    def test_erase_legacy_aggregations(self):
+
+        filename = "BANKSAN_MOVEMENTS__20250703T120000_20230602T000000_20250703T000000_0001.xls"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # Aggregation stored before the aggregations were inserted as EVENT_KEYS
+        exit_status = self.engine_eboa.treat_data({"operations": [{
+            "mode": "insert_and_erase",
+            "dim_signature": {"name": "AGGREGATED_MOVEMENTS_MONTH_SANTANDER", "exec": "ingestion_group_transactions.py", "version": "1.0"},
+            "source": {"name": "legacy.xls", "reception_time": "2018-01-01T00:00:00", "generation_time": "2018-01-01T00:00:00",
+                       "validity_start": "2023-06-01T00:00:00", "validity_stop": "2023-07-01T00:00:00"},
+            "events": [{"gauge": {"insertion_type": "INSERT_and_ERASE", "name": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "system": "BANCO SANTANDER"},
+                        "start": "2023-06-01T00:00:00",
+                        "stop": "2023-07-01T00:00:00",
+                        "values": [{"name": "bank", "type": "text", "value": "BANCO SANTANDER"},
+                                   {"name": "group", "type": "text", "value": "Legacy group"},
+                                   {"name": "amount", "type": "double", "value": 1.0}]}]
+        }]})
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+        assert len(aggregation.get_legacy_aggregated_events(self.query_eboa)) == 1
+
+        exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # The aggregation without key is erased and its period is aggregated again
+        assert len(aggregation.get_legacy_aggregated_events(self.query_eboa)) == 0
+        assert len(self.query_eboa.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
+                                              value_filters = [{"name": {"filter": "group", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "Legacy group"}}])) == 0
+        assert len(self.query_eboa.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
+                                              start_filters = [{"date": "2023-06-01T00:00:00", "op": "=="}])) > 0
+
+        update_events = self.query_eboa.get_events(gauge_names = {"filter": "UPDATE_%", "op": "like"},
+                                                   value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+        assert len(update_events) == 0
+
+    def test_rollup_years(self):
+
+        filename = "BANKSAN_MOVEMENTS__20250703T120000_20230602T000000_20250703T000000_0001.xls"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        for value_name in ["group", "entity"]:
+            year_events = self.query_eboa.get_events(gauge_names = {"filter": f"AGGREGATED_MOVEMENTS_{value_name.upper()}_YEAR", "op": "=="})
+
+            assert len(year_events) > 0
+
+            for year_event in year_events:
+                name = [value.value for value in year_event.eventTexts if value.name == value_name][0]
+                amount = [value.value for value in year_event.eventDoubles if value.name == "amount"][0]
+
+                # The year is linked to the months of the same group or entity and adds up their amounts
+                month_events = self.query_eboa.get_events(event_uuids = {"filter": [str(link.event_uuid_link) for link in year_event.eventLinks], "op": "in"})
+
+                assert len([event for event in month_events if event.gauge.name != f"AGGREGATED_MOVEMENTS_{value_name.upper()}_MONTH"]) == 0
+                assert len([event for event in month_events if [value.value for value in event.eventTexts if value.name == value_name] != [name]]) == 0
+                assert abs(sum([value.value for event in month_events for value in event.eventDoubles if value.name == "amount"]) - amount) < 1e-6
+            # end for
+        # end for
+
+    def test_diff_overlapping_statement(self):
+
+        # Two movements per day in average, so the events of most of the days overlap the ones of the next day
+        statement_movements = statement_generator.generate_movements(730, 1, 20)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-01T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-01T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+
+            # The next statement changes the amount of one movement
+            statement_movements[365][3] = round(statement_movements[365][3] + 1000, 2)
+            generation_time = datetime.datetime.strptime(statement_movements[0][0], "%d/%m/%Y") + datetime.timedelta(days = 2)
+            file_path = statement_generator.write_statement(directory, statement_movements, generation_time)
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-02T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+        # end with
+
+        new_movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+
+        assert len(new_movement_events) == len(movement_events)
+        assert len([event for event in new_movement_events for value in event.eventDoubles if value.name == "amount" and abs(value.value - statement_movements[365][3]) < 1e-6]) == 1
+
+        # Only the movements of the operation day of the changed one are replaced
+        kept_event_uuids = set(event.event_uuid for event in new_movement_events) & set(event.event_uuid for event in movement_events)
+
+        assert len(movement_events) - 10 < len(kept_event_uuids) < len(movement_events)
+
+        # Only the month and the year of the changed movement have to be aggregated again
+        for gauge_name in ["UPDATE_MONTH", "UPDATE_YEAR"]:
+            update_events = self.query_eboa.get_events(gauge_names = {"filter": gauge_name, "op": "=="},
+                                                       value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+            assert len(update_events) == 1
+        # end for
+
+    def test_reclassify_movements(self):
+
+        statement_movements = statement_generator.generate_movements(300, 1, 20)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            for module in ["ingestion_santander_transactions", "ingestion_group_transactions"]:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions." + module, file_path, "2018-01-01T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+            # end for
+
+            movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+
+            # The new rules add an entity matching the concept of some of the movements
+            entities_xml = etree.parse(get_resources_path() + "/entities.xml")
+            entity = etree.SubElement(entities_xml.getroot(), "entity")
+            etree.SubElement(entity, "name").text = "Counterpart 3"
+            etree.SubElement(etree.SubElement(entity, "matching_strings"), "string").text = "COUNTERPART00003"
+            entities_path = os.path.join(directory, "entities.xml")
+            entities_xml.write(entities_path)
+
+            report = reclassification.reclassify(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml",
+                                                 get_resources_path() + "/groups.xml", entities_path)
+
+            marked_periods = {}
+            for gauge_name in ["UPDATE_MONTH", "UPDATE_YEAR"]:
+                update_events = self.query_eboa.get_events(gauge_names = {"filter": gauge_name, "op": "=="},
+                                                           value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+                marked_periods[gauge_name] = set(event.start for event in update_events)
+            # end for
+
+            # The next ingestion of grouped movements aggregates the marked periods again
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-02T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+        # end with
+
+        reclassified_movements = [movement for movement in statement_movements if "COUNTERPART00003" in movement[2]]
+
+        assert report["changed_strings"] == ["COUNTERPART00003"]
+        assert report["candidates"] == len(reclassified_movements)
+        assert report["reclassified"] == len(reclassified_movements)
+        assert report["errors"] == 0
+
+        # The movements are rewritten in place
+        new_movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+
+        assert set(event.event_uuid for event in new_movement_events) == set(event.event_uuid for event in movement_events)
+
+        reclassified_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="},
+                                                         value_filters = [{"name": {"filter": "entity%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": "Counterpart 3"}}])
+
+        assert len(reclassified_events) == len(reclassified_movements)
+
+        # Only the months and years of the reclassified movements had to be aggregated again
+        for gauge_name, get_period_start in [("UPDATE_MONTH", aggregation.get_month_start), ("UPDATE_YEAR", aggregation.get_year_start)]:
+            assert marked_periods[gauge_name] == set(get_period_start(event.start) for event in reclassified_events)
+        # end for
+
+        # The ingestion of grouped movements superseded the marks of the reclassification
+        update_events = self.query_eboa.get_events(gauge_names = {"filter": "UPDATE_%", "op": "like"},
+                                                   value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+        assert len(update_events) == 0
+
+        for gauge_name in ["AGGREGATED_MOVEMENTS_ENTITY_MONTH", "AGGREGATED_MOVEMENTS_ENTITY_YEAR"]:
+            aggregated_events = self.query_eboa.get_events(gauge_names = {"filter": gauge_name, "op": "=="},
+                                                           value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "Counterpart 3"}}])
+
+            assert len(aggregated_events) > 0
+        # end for
+
+    def test_group_during_reclassification(self):
+
+        statement_movements = statement_generator.generate_movements(300, 1, 20)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = statement_generator.write_statement(directory, statement_movements)
+
+            for module in ["ingestion_santander_transactions", "ingestion_group_transactions"]:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions." + module, file_path, "2018-01-01T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+            # end for
+
+            # The new rules add an entity matching the concept of some of the movements
+            entities_xml = etree.parse(get_resources_path() + "/entities.xml")
+            entity = etree.SubElement(entities_xml.getroot(), "entity")
+            etree.SubElement(entity, "name").text = "Counterpart 3"
+            etree.SubElement(etree.SubElement(entity, "matching_strings"), "string").text = "COUNTERPART00003"
+            entities_path = os.path.join(directory, "entities.xml")
+            entities_xml.write(entities_path)
+
+            # An ingestion of grouped movements runs once the periods are marked and before the movements are rewritten
+            rewrite_classifications = reclassification.rewrite_classifications
+            def group_and_rewrite_classifications(query, reclassifications):
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-02T00:00:00")
+
+                assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+                rewrite_classifications(query, reclassifications)
+            # end def
+
+            reclassification.rewrite_classifications = group_and_rewrite_classifications
+            try:
+                report = reclassification.reclassify(get_resources_path() + "/groups.xml", get_resources_path() + "/entities.xml",
+                                                     get_resources_path() + "/groups.xml", entities_path)
+            finally:
+                reclassification.rewrite_classifications = rewrite_classifications
+            # end try
+
+            assert report["errors"] == 0
+
+            reclassified_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="},
+                                                             value_filters = [{"name": {"filter": "entity%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": "Counterpart 3"}}])
+
+            assert len(reclassified_events) == report["reclassified"]
+
+            # The periods aggregated with the previous classification remain marked to be aggregated again
+            for gauge_name, get_period_start in [("UPDATE_MONTH", aggregation.get_month_start), ("UPDATE_YEAR", aggregation.get_year_start)]:
+                update_events = self.query_eboa.get_events(gauge_names = {"filter": gauge_name, "op": "=="},
+                                                           value_filters = [{"name": {"filter": "status", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "UPDATE"}}])
+
+                assert set(event.start for event in update_events) == set(get_period_start(event.start) for event in reclassified_events)
+            # end for
+
+            exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_group_transactions", file_path, "2018-01-03T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+        # end with
+
+        # The aggregations follow the rewritten movements
+        amounts = {}
+        for event in reclassified_events:
+            month_start = aggregation.get_month_start(event.start)
+            amounts[month_start] = amounts.get(month_start, 0) + [value.value for value in event.eventDoubles if value.name == "amount"][0]
+        # end for
+
+        aggregated_events = self.query_eboa.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_MONTH", "op": "=="},
+                                                       value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": "Counterpart 3"}}])
+
+        assert set(event.start for event in aggregated_events) == set(amounts)
+        for event in aggregated_events:
+            assert abs([value.value for value in event.eventDoubles if value.name == "amount"][0] - amounts[event.start]) < 1e-6
+        # end for
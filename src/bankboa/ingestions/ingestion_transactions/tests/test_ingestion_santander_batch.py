@@ -0,0 +1,169 @@
+"""
+Automated tests for the batch ingestion of MOVEMENTS files from Santander bank
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import unittest
+import datetime
+import json
+import shutil
+import tempfile
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import generator of synthetic statements
+from bankboa.benchmarks import statement_generator
+
+# Import instrumentation of the ingestions
+from bankboa.ingestions.ingestion_transactions import instrumentation
+
+# Import ingestions
+from bankboa.ingestions.ingestion_transactions import ingestion_santander_transactions
+from bankboa.ingestions.ingestion_transactions import ingestion_santander_batch
+
+# Generation of the events of the batch ingestion
+generate_file_movements_events = ingestion_santander_batch._generate_file_movements_events
+
+def generate_file_movements_events_failing(file_path):
+    """
+    Method to generate the events of the files in the pool failing for the files marked in their name
+    """
+    if "_0002." in os.path.basename(file_path):
+        raise RuntimeError(f"Failure generating the events of {file_path}")
+    # end if
+
+    return generate_file_movements_events(file_path)
+
+class TestIngestionSantanderBatch(unittest.TestCase):
+    def setUp(self):
+        # Create the engine to manage the data
+        self.engine_eboa = Engine()
+        self.query_eboa = Query()
+
+        # Clear all tables before executing the test
+        self.query_eboa.clear_db()
+
+    def tearDown(self):
+        # Close connections to the DDBB
+        self.engine_eboa.close_session()
+        self.query_eboa.close_session()
+
+    def ingest_files(self, directory, file_paths):
+        """
+        Method to ingest a batch of files recording the stages of the ingestion of each file
+        """
+        records_file = os.path.join(directory, "records.jsonl")
+        os.environ[instrumentation.RECORDS_FILE_VARIABLE] = records_file
+        try:
+            report = ingestion_santander_batch.ingest_files(file_paths, processes = 2, reception_time = "2018-01-01T00:00:00")
+        finally:
+            del os.environ[instrumentation.RECORDS_FILE_VARIABLE]
+        # end try
+
+        # The ingestions ending unexpectedly do not record their stages
+        records = []
+        if os.path.exists(records_file):
+            with open(records_file) as records_lines:
+                records = [json.loads(line) for line in records_lines if json.loads(line)["module"].endswith("ingestion_santander_transactions")]
+            # end with
+        # end if
+
+        # The events generated in the pool are released once the files are ingested
+        assert len(ingestion_santander_transactions.precomputed_movements_events) == 0
+        assert len(ingestion_santander_transactions.precomputed_fingerprints) == 0
+
+        return report, {record["file"]: {stage["stage"]: stage for stage in record["stages"]} for record in records}
+
+    def write_statements(self, directory):
+        """
+        Method to write three statements of the same period changing the amount of one movement
+        """
+        statement_movements = statement_generator.generate_movements(200, 1, 20)
+        generation_time = datetime.datetime.strptime(statement_movements[0][0], "%d/%m/%Y") + datetime.timedelta(days = 1)
+
+        file_paths = []
+        amounts = []
+        for i in range(3):
+            statement_movements[100][3] = round(statement_movements[100][3] + 1000, 2)
+            amounts.append(statement_movements[100][3])
+            file_paths.append(statement_generator.write_statement(directory, statement_movements, generation_time + datetime.timedelta(days = i)))
+        # end for
+
+        return file_paths, amounts
+
+    def test_generation_time_order(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_paths, amounts = self.write_statements(directory)
+
+            report, stages = self.ingest_files(directory, list(reversed(file_paths)))
+        # end with
+
+        assert report["errors"] == 0
+
+        # The files are inserted in generation time order with the events generated in the pool
+        assert [file_report["file"] for file_report in report["files"]] == [os.path.basename(file_path) for file_path in file_paths]
+        for file_path in file_paths:
+            assert stages[os.path.basename(file_path)]["event_build"]["counts"]["precomputed_events"] == 200
+            assert "excel_parse" not in stages[os.path.basename(file_path)]
+        # end for
+
+        # The movements of the last statement prevail
+        movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+        stored_amounts = [value.value for event in movement_events for value in event.eventDoubles if value.name == "amount"]
+
+        assert len(movement_events) == 200
+        assert len([amount for amount in stored_amounts if abs(amount - amounts[-1]) < 1e-6]) == 1
+        assert len([amount for amount in stored_amounts for previous_amount in amounts[:-1] if abs(amount - previous_amount) < 1e-6]) == 0
+
+    def test_generation_failure(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_paths, amounts = self.write_statements(directory)
+
+            # The events of the second statement cannot be generated in the pool
+            failing_file_path = file_paths[1].replace("_0001.", "_0002.")
+            os.rename(file_paths[1], failing_file_path)
+            file_paths[1] = failing_file_path
+
+            ingestion_santander_batch._generate_file_movements_events = generate_file_movements_events_failing
+            try:
+                report, stages = self.ingest_files(directory, file_paths)
+            finally:
+                ingestion_santander_batch._generate_file_movements_events = generate_file_movements_events
+            # end try
+        # end with
+
+        # The ingestion parses the file instead
+        assert report["errors"] == 0
+        assert [file_report["ok"] for file_report in report["files"]] == [True, True, True]
+        assert "precomputed_events" not in stages[os.path.basename(failing_file_path)]["event_build"]["counts"]
+        assert stages[os.path.basename(failing_file_path)]["excel_parse"]["counts"]["rows"] > 0
+        for file_path in [file_paths[0], file_paths[2]]:
+            assert stages[os.path.basename(file_path)]["event_build"]["counts"]["precomputed_events"] == 200
+        # end for
+
+    def test_ingestion_failure(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_paths, amounts = self.write_statements(directory)
+
+            # The events are generated in the pool but the ingestion rejects the validity in the name of the file
+            file_name = os.path.basename(file_paths[0])
+            invalid_file_path = os.path.join(directory, file_name[0:35] + "X" * 15 + file_name[50:])
+            shutil.copyfile(file_paths[0], invalid_file_path)
+
+            report, stages = self.ingest_files(directory, [invalid_file_path])
+        # end with
+
+        # The events not consumed by the ingestion are released too (checked by ingest_files)
+        assert report["errors"] == 1
+        assert report["files"][0]["movements"] == 200
+        assert not report["files"][0]["ok"]
@@ -12,6 +12,7 @@ import unittest
 import datetime
 import re
 import json
+import tempfile
 
 # Import engine of the DDBB
 import eboa.engine.engine as eboa_engine
@@ -21,6 +22,9 @@ from eboa.engine.query import Query
 # Import ingestion
 import eboa.ingestion.eboa_ingestion as ingestion
 
+# Import instrumentation of the stages
+from bankboa.ingestions.ingestion_transactions import instrumentation
+
 class TestIngestionTransactions(unittest.TestCase):
     def setUp(self):
         # Create the engine to manage the data
@@ -62,3 +66,46 @@ class TestIngestionTransactions(unittest.TestCase):
         sources = self.query_eboa.get_sources()
 
         assert len(sources) == 1
+
+    def test_skip_re_delivered_statement(self):
+
+        filename = "BANKSAN_MOVEMENTS__20250703T120000_20230602T000000_20250703T000000_0001.xls"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        fingerprint_events = self.query_eboa.get_events(gauge_names = {"filter": "STATEMENT_FINGERPRINT", "op": "=="})
+
+        assert len(fingerprint_events) == 1
+
+        movement_events = self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})
+
+        # Ingest the same statement again recording the stages of the ingestion
+        with tempfile.TemporaryDirectory() as directory:
+            records_file = os.path.join(directory, "records.jsonl")
+            os.environ[instrumentation.RECORDS_FILE_VARIABLE] = records_file
+            try:
+                exit_status = ingestion.command_process_file("bankboa.ingestions.ingestion_transactions.ingestion_santander_transactions", file_path, "2018-01-02T00:00:00")
+            finally:
+                del os.environ[instrumentation.RECORDS_FILE_VARIABLE]
+            # end try
+
+            with open(records_file) as records:
+                record = [json.loads(line) for line in records if json.loads(line)["module"].endswith("ingestion_santander_transactions")][-1]
+            # end with
+        # end with
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # The statement is skipped before matching the rules
+        stages = {stage["stage"]: stage for stage in record["stages"]}
+        assert stages["fingerprint"]["counts"]["skipped_statements"] == 1
+        assert "movement_preparation" in stages
+        assert "rule_matching" not in stages
+        assert "event_build" not in stages
+
+        # The stored events have not been replaced
+        assert [event.event_uuid for event in self.query_eboa.get_events(gauge_names = {"filter": "STATEMENT_FINGERPRINT", "op": "=="})] == [fingerprint_events[0].event_uuid]
+        assert set(event.event_uuid for event in self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="})) == set(event.event_uuid for event in movement_events)
@@ -0,0 +1,79 @@
+"""
+Automated tests for the instrumentation of the stages of the ingestions
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import json
+import time
+import unittest
+import tempfile
+
+# Import instrumentation of the stages
+from bankboa.ingestions.ingestion_transactions import instrumentation
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_nested_stages(self):
+
+        ingestion_instrumentation = instrumentation.Instrumentation("file.xls", "module", profile = False)
+        ingestion_instrumentation.start()
+
+        def read_chunks():
+            for i in range(3):
+                time.sleep(0.01)
+                yield [i] * 10
+            # end for
+        # end def
+
+        with ingestion_instrumentation.stage("event_build"):
+            chunks = list(ingestion_instrumentation.iterate("excel_parse", read_chunks(), "rows", len))
+            time.sleep(0.02)
+        # end with
+
+        record = ingestion_instrumentation.finish()
+        stages = {stage["stage"]: stage for stage in record["stages"]}
+
+        assert len(chunks) == 3
+        assert stages["excel_parse"]["counts"] == {"rows": 30}
+        assert stages["excel_parse"]["wall_time"] >= 0.03
+        # The time of the parse is not accounted in the building of the events
+        assert 0.02 <= stages["event_build"]["wall_time"] < stages["excel_parse"]["wall_time"] + 0.02
+        assert record["wall_time"] >= stages["excel_parse"]["wall_time"] + stages["event_build"]["wall_time"]
+
+        # Without profiling, the memory is the high-water mark of the process
+        assert "peak_memory" not in stages["event_build"]
+        assert stages["event_build"]["process_max_rss"] >= stages["excel_parse"]["process_max_rss"] > 0
+
+    def test_emit_with_profiling(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            records_file = os.path.join(directory, "records.jsonl")
+            os.environ[instrumentation.RECORDS_FILE_VARIABLE] = records_file
+            os.environ[instrumentation.PROFILE_DIRECTORY_VARIABLE] = directory
+            try:
+                ingestion_instrumentation = instrumentation.Instrumentation("file.xls", "module", profile = True)
+                ingestion_instrumentation.start()
+                matched = ingestion_instrumentation.timed("rule_matching", lambda concept: [concept] * 1000)
+                for i in range(5):
+                    matched(str(i))
+                # end for
+                serialized_record = ingestion_instrumentation.emit()
+            finally:
+                del os.environ[instrumentation.RECORDS_FILE_VARIABLE]
+                del os.environ[instrumentation.PROFILE_DIRECTORY_VARIABLE]
+            # end try
+
+            record = json.loads(serialized_record)
+
+            assert record["stages"][0]["stage"] == "rule_matching"
+            assert record["stages"][0]["calls"] == 5
+            assert record["stages"][0]["peak_memory"] > 0
+            assert os.path.exists(record["profile"])
+            with open(records_file) as records:
+                assert [json.loads(line) for line in records] == [record]
+            # end with
+        # end with
@@ -0,0 +1,255 @@
+"""
+Automated tests for the preparation of the movements of the Santander statements
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import datetime
+import json
+import tempfile
+from dateutil import parser
+import pandas as pd
+import openpyxl
+
+# Import xml parser
+from lxml import etree
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import generator of synthetic statements
+from bankboa.benchmarks import statement_generator
+
+groups_configuration = """
+<groups>
+  <group>
+    <name>Payroll</name>
+    <matching_rules>
+      <rule>
+        <match>NOMINA</match>
+        <amount>&gt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Home</name>
+    <matching_rules>
+      <rule>
+        <match>RECIBO</match>
+        <amount>&lt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Bills</name>
+    <matching_rules>
+      <rule>
+        <match>RECIBO LUZ</match>
+        <amount>&lt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+</groups>
+"""
+
+entities_configuration = """
+<entities>
+  <entity>
+    <name>Company</name>
+    <matching_strings>
+      <string>NOMINA</string>
+    </matching_strings>
+  </entity>
+  <entity>
+    <name>Landlord</name>
+    <matching_strings>
+      <string>ALQUILER</string>
+    </matching_strings>
+  </entity>
+</entities>
+"""
+
+class TestMovements(unittest.TestCase):
+    def setUp(self):
+        self.parsed_xls = pd.DataFrame({
+            "FECHA OPERACIÓN": ["03/07/2025", "03/07/2025", "03/07/2025", "02/07/2025", "01/07/2025", "01/07/2025", "3/7/2025", "01/08/2025", "01/08/2025"],
+            "FECHA VALOR": ["03/07/2025", "04/07/2025", "03/07/2025", "02/07/2025", "2025-07-01", "01/07/2025", "03/07/2025", "01/08/2025", "31/07/2025"],
+            "CONCEPTO": ["NOMINA", "RECIBO ALQUILER", "COMPRA TARJETA", "BIZUM", "RECIBO LUZ", "RECIBO AGUA", "TRANSFERENCIA", "COMISION", "INTERESES"],
+            "IMPORTE EUR": [2500, -800.5, -25.3, 15, -60.1, -20, 100, -2, 0.5],
+            "SALDO": [3000.0, 500.0, 1300.5, 1325.8, 1310.8, 1370.9, 1390.9, 1290.9, 1292.9]
+        })
+
+    def test_prepare_movements(self):
+
+        prepared_movements = movements.prepare_movements(self.parsed_xls)
+
+        # Compare with the parsing done row by row
+        current_operation_date = None
+        current_microsecond_operation_date = 0
+        for (index, row), (prepared_index, prepared_row) in zip(self.parsed_xls.iterrows(), prepared_movements.iterrows()):
+            operation_date = parser.parse(row["FECHA OPERACIÓN"], dayfirst=True)
+            if current_operation_date != operation_date:
+                current_operation_date = operation_date
+                current_microsecond_operation_date = 0
+            else:
+                current_microsecond_operation_date += 1
+            # end if
+            start = operation_date - datetime.timedelta(microseconds=current_microsecond_operation_date)
+
+            assert prepared_row["operation_date"] == operation_date.isoformat()
+            assert prepared_row["value_date"] == parser.parse(row["FECHA VALOR"], dayfirst=True).isoformat()
+            assert prepared_row["start"] == start.isoformat()
+            assert prepared_row["stop"] == (start + datetime.timedelta(days=1)).isoformat()
+            assert prepared_row["concept"] == row["CONCEPTO"]
+            assert prepared_row["amount"] == float(row["IMPORTE EUR"])
+            assert prepared_row["balance"] == float(row["SALDO"])
+        # end for
+
+        assert list(prepared_movements["start"][0:3]) == ["2025-07-03T00:00:00", "2025-07-02T23:59:59.999999", "2025-07-02T23:59:59.999998"]
+
+    def test_build_movements_events(self):
+
+        groups_xml = etree.ElementTree(etree.fromstring(groups_configuration))
+        entities_xml = etree.ElementTree(etree.fromstring(entities_configuration))
+        rules_matcher = rules.RulesMatcher(rules.parse_groups(groups_xml), rules.parse_entities(entities_xml))
+
+        movements_events = movements.build_movements_events(movements.prepare_movements(self.parsed_xls), rules_matcher)
+
+        # Compare with the events built row by row
+        groups_xpath = etree.XPathEvaluator(groups_xml)
+        entities_xpath = etree.XPathEvaluator(entities_xml)
+        expected_movements_events = []
+        current_operation_date = None
+        current_microsecond_operation_date = 0
+        for index, row in self.parsed_xls.iterrows():
+            operation_date = parser.parse(row["FECHA OPERACIÓN"], dayfirst=True)
+            if current_operation_date != operation_date:
+                current_operation_date = operation_date
+                current_microsecond_operation_date = 0
+            else:
+                current_microsecond_operation_date += 1
+            # end if
+            start = operation_date - datetime.timedelta(microseconds=current_microsecond_operation_date)
+            concept = row["CONCEPTO"]
+            amount = float(row["IMPORTE EUR"])
+
+            groups = groups_xpath("/groups/group[boolean(matching_rules/rule[contains($concept, match)][$amount > 0 and amount = '>0' or $amount < 0 and amount = '<0'])]", concept = concept, amount = amount)
+            entities = entities_xpath("/entities/entity[boolean(matching_strings/string[contains($concept, text())])]", concept = concept)
+
+            values = [
+                {"name": "bank", "type": "text", "value": "BANCO SANTANDER"},
+                {"name": "concept", "type": "text", "value": concept},
+                {"name": "amount", "type": "double", "value": amount},
+                {"name": "balance", "type": "double", "value": float(row["SALDO"])},
+                {"name": "value_date", "type": "timestamp", "value": parser.parse(row["FECHA VALOR"], dayfirst=True).isoformat()},
+                {"name": "operation_date", "type": "timestamp", "value": operation_date.isoformat()}
+            ]
+            for i, group in enumerate(groups):
+                values.append({"name": f"group{i}", "type": "text", "value": group.xpath("name")[0].text})
+            # end for
+            if len(groups) == 0:
+                values.append({"name": "number_of_groups", "type": "double", "value": 1})
+                values.append({"name": "group0", "type": "text", "value": "Spending no group" if amount < 0 else "Income no group"})
+            else:
+                values.append({"name": "number_of_groups", "type": "double", "value": len(groups)})
+            # end if
+            for i, entity in enumerate(entities):
+                values.append({"name": f"entity{i}", "type": "text", "value": entity.xpath("name")[0].text})
+            # end for
+            if len(entities) == 0:
+                values.append({"name": "number_of_entities", "type": "double", "value": 1})
+                values.append({"name": "entity0", "type": "text", "value": "No entity"})
+            else:
+                values.append({"name": "number_of_entities", "type": "double", "value": len(entities)})
+            # end if
+
+            expected_movements_events.append({
+                "gauge": {
+                    "insertion_type": "INSERT_and_ERASE",
+                    "name": "MOVEMENT",
+                    "system": "BANCO SANTANDER"
+                },
+                "start": start.isoformat(),
+                "stop": (start + datetime.timedelta(days=1)).isoformat(),
+                "values": values,
+            })
+        # end for
+
+        assert json.dumps(movements_events) == json.dumps(expected_movements_events)
+
+    def test_movement_records(self):
+
+        groups_xml = etree.ElementTree(etree.fromstring(groups_configuration))
+        entities_xml = etree.ElementTree(etree.fromstring(entities_configuration))
+        rules_matcher = rules.RulesMatcher(rules.parse_groups(groups_xml), rules.parse_entities(entities_xml), ("version",), rules.ClassificationCache())
+        prepared_movements = movements.prepare_movements(pd.concat([self.parsed_xls, self.parsed_xls], ignore_index = True))
+
+        movement_records = movements.MovementRecords(movements.build_movement_records(prepared_movements, rules_matcher))
+
+        # The events are built only when serialized
+        assert json.dumps(movement_records.to_events()) == json.dumps(movements.build_movements_events(prepared_movements, rules.RulesMatcher(rules.parse_groups(groups_xml), rules.parse_entities(entities_xml))))
+
+        # The validity is maintained while adding the movements
+        assert len(movement_records) == len(prepared_movements)
+        assert movement_records.validity_start == min(prepared_movements["start"])
+        assert movement_records.validity_stop == max(prepared_movements["stop"])
+
+        # The movements with the same classification share the names of their groups and entities
+        records = list(movement_records)
+
+        assert records[0].groups is records[len(self.parsed_xls)].groups
+        assert not hasattr(records[0], "__dict__")
+
+    def test_read_statement_in_chunks(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = directory + "/BANKSAN_MOVEMENTS__20250703T120000_20250701T000000_20250703T000000_0001.xls"
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.append(["Consultas de movimientos"])
+            for i in range(6):
+                sheet.append([])
+            # end for
+            sheet.append(list(self.parsed_xls.columns))
+            for index, row in self.parsed_xls.iterrows():
+                sheet.append(list(row))
+            # end for
+            workbook.save(file_path)
+
+            chunks = list(movements.read_statement(file_path, chunk_size = 2))
+
+            assert len(chunks) == 5
+            assert pd.concat(chunks, ignore_index = True).equals(pd.read_excel(file_path, header = 7))
+
+            # The runs of operation dates continue through the chunks
+            movements_events = movements.iterate_movements_events(chunks, rules.RulesMatcher((), ()))
+            assert [event["start"] for event in movements_events] == list(movements.prepare_movements(self.parsed_xls)["start"])
+        # end with
+
+    def test_read_generated_statements(self):
+
+        generated_movements = statement_generator.generate_movements(50, 1, 10)
+
+        with tempfile.TemporaryDirectory() as directory:
+            chunks_by_format = {}
+            for file_format in statement_generator.FILE_FORMATS:
+                file_path = statement_generator.write_statement(directory, generated_movements, file_format = file_format)
+                assert file_path.endswith("." + file_format)
+                chunks_by_format[file_format] = pd.concat(movements.read_statement(file_path, chunk_size = 7), ignore_index = True)
+            # end for
+
+            # The xls statement is a BIFF workbook as the ones exported by Santander
+            with open(statement_generator.write_statement(directory, generated_movements), "rb") as statement_file:
+                assert statement_file.read(8) == b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+            # end with
+        # end with
+
+        assert len(chunks_by_format["xls"]) == 50
+        assert chunks_by_format["xls"].equals(chunks_by_format["xlsx"])
+        assert chunks_by_format["xls"]["IMPORTE EUR"].tolist() == [row[3] for row in generated_movements]
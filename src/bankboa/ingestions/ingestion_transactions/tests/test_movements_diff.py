@@ -0,0 +1,107 @@
+"""
+Automated tests for the row level comparison of the movements with the stored ones
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import datetime
+
+# Import row level comparison of movements
+from bankboa.ingestions.ingestion_transactions import movements_diff
+
+# Import preparation of movements
+from bankboa.ingestions.ingestion_transactions import movements
+
+def build_movement_event(start, amount, concept):
+    """
+    Method to build a movement with the values used by the comparison
+    """
+    start = datetime.datetime.fromisoformat(start)
+
+    return movements.MovementRecord(concept, amount, None, None, None, start.isoformat(), (start + datetime.timedelta(days = 1)).isoformat(), (), ())
+
+def get_stored_movements(movements_events):
+    """
+    Method to obtain the stored movements corresponding to inserted movements
+    """
+    return [movements_diff.StoredMovement(movements_diff.get_movement_key_from_record(movement_record), datetime.datetime.fromisoformat(movement_record.stop))
+            for movement_record in movements_events]
+
+class TestMovementsDiff(unittest.TestCase):
+
+    def setUp(self):
+
+        # Movements of consecutive days (2023-06-01 and 2023-06-02) and of a separated day (2023-06-05)
+        self.movements_events = [build_movement_event("2023-06-05T00:00:00", -20.0, "COMPRA TARJETA"),
+                                 build_movement_event("2023-06-04T23:59:59.999999", -30.0, "RECIBO LUZ"),
+                                 build_movement_event("2023-06-02T00:00:00", 1000.0, "NOMINA EMPRESA"),
+                                 build_movement_event("2023-06-01T00:00:00", -50.0, "RECIBO AGUA")]
+
+    def test_unchanged_movements(self):
+
+        assert movements_diff.get_changed_windows(self.movements_events, get_stored_movements(self.movements_events)) == []
+
+    def test_changed_movement(self):
+
+        stored_movements = get_stored_movements(self.movements_events)
+        movements_events = list(self.movements_events)
+        movements_events[1] = build_movement_event("2023-06-04T23:59:59.999999", -35.0, "RECIBO LUZ")
+
+        changed_windows = movements_diff.get_changed_windows(movements_events, stored_movements)
+
+        # Only the day of the changed movement is replaced
+        assert len(changed_windows) == 1
+        assert changed_windows[0].validity_start == "2023-06-04T23:59:59.999999"
+        assert changed_windows[0].validity_stop == "2023-06-06T00:00:00"
+        assert changed_windows[0].movement_records == [movements_events[1], movements_events[0]]
+
+    def test_added_and_removed_movements(self):
+
+        # The statement has a new movement and a stored one is removed
+        stored_movements = get_stored_movements(self.movements_events[1:] + [build_movement_event("2023-06-01T23:59:59.999999", -10.0, "COMISION")])
+
+        changed_windows = movements_diff.get_changed_windows(self.movements_events, stored_movements)
+
+        # The changed days (2023-06-02 and 2023-06-05) are consecutive, so they are replaced in the same window
+        assert [(changed_window.validity_start, changed_window.validity_stop) for changed_window in changed_windows] == [("2023-06-01T23:59:59.999999", "2023-06-06T00:00:00")]
+        assert changed_windows[0].movement_records == [self.movements_events[2], self.movements_events[1], self.movements_events[0]]
+
+        # The stored movements of days not covered by the statement are kept
+        stored_movements = get_stored_movements(self.movements_events + [build_movement_event("2023-06-07T00:00:00", -10.0, "COMISION")])
+
+        assert movements_diff.get_changed_windows(self.movements_events, stored_movements) == []
+
+    def test_removed_day(self):
+
+        # One movement per day, the movement of the fifth day is removed from the statement
+        stored_movements = get_stored_movements([build_movement_event("2023-06-{:02d}T00:00:00".format(day), -10.0 * day, "COMPRA TARJETA") for day in range(1, 11)])
+        movements_events = [build_movement_event("2023-06-{:02d}T00:00:00".format(day), -10.0 * day, "COMPRA TARJETA") for day in range(1, 11) if day != 5]
+
+        changed_windows = movements_diff.get_changed_windows(movements_events, stored_movements)
+
+        # The removed day is erased with the movements of the next day
+        assert [(changed_window.validity_start, changed_window.validity_stop) for changed_window in changed_windows] == [("2023-06-05T00:00:00", "2023-06-07T00:00:00")]
+        assert changed_windows[0].movement_records == [movements_events[4]]
+
+    def test_dense_statement(self):
+
+        # Two movements per day during 60 days, so the events of every day overlap the ones of the next day
+        movements_events = []
+        for day in range(60):
+            operation_date = datetime.datetime(2023, 6, 1) + datetime.timedelta(days = day)
+            movements_events.append(build_movement_event(operation_date.isoformat(), -20.0, "COMPRA TARJETA"))
+            movements_events.append(build_movement_event((operation_date - datetime.timedelta(microseconds = 1)).isoformat(), -30.0, "RECIBO LUZ"))
+        # end for
+        stored_movements = get_stored_movements(movements_events)
+        movements_events[61] = build_movement_event("2023-06-30T23:59:59.999999", -35.0, "RECIBO LUZ")
+
+        changed_windows = movements_diff.get_changed_windows(movements_events, stored_movements)
+
+        # Only the day of the changed movement is replaced
+        assert len(changed_windows) == 1
+        assert changed_windows[0].validity_start == "2023-06-30T23:59:59.999999"
+        assert changed_windows[0].validity_stop == "2023-07-01T23:59:59.999999"
+        assert changed_windows[0].movement_records == [movements_events[61], movements_events[60]]
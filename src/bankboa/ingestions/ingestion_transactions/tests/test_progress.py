@@ -0,0 +1,64 @@
+"""
+Automated tests for the asynchronous writer of the ingestion progress
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import threading
+
+# Import asynchronous writer of the ingestion progress
+from bankboa.ingestions.ingestion_transactions.progress import ProgressWriter
+
+class PendingSourcesRecorder():
+    """
+    Object recording the lookups of PENDING_SOURCES entries in place of a Query
+    """
+    def __init__(self):
+        self.session = "session"
+        self.lookups = []
+
+    def get_sources(self, names, **kwargs):
+        self.lookups.append(names["filter"])
+        return [names["filter"]]
+
+class TestProgress(unittest.TestCase):
+
+    def test_coalesced_reports(self):
+
+        writes = []
+        release_write = threading.Event()
+        queries = []
+
+        def query_factory():
+            queries.append(PendingSourcesRecorder())
+            return queries[-1]
+        # end def
+
+        def write_progress(session, source, percentage):
+            # The first write blocks until the rest of reports are registered
+            release_write.wait()
+            writes.append((source, percentage))
+        # end def
+
+        writer = ProgressWriter(query_factory, write_progress, min_interval = 60)
+
+        writer.report("file.xls", 10)
+        for percentage in [20, 40, 90, 94, 96, 98, 100]:
+            writer.report("file.xls", percentage)
+        # end for
+        release_write.set()
+
+        assert writer.flush(timeout = 5)
+
+        # The reports received while writing are coalesced into the last one
+        assert writes[-1] == ("file.xls", 100)
+        assert len(writes) <= 2
+        assert writer.reports == 8
+
+        # One Query and one lookup of the entry are used
+        assert len(queries) == 1
+        assert queries[0].lookups == ["file.xls"]
+        assert writer.sources == {}
@@ -0,0 +1,63 @@
+"""
+Automated tests for the reclassification of the stored movements
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import unittest
+import datetime
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+# Import reclassification of the movements
+from bankboa.ingestions.ingestion_transactions import reclassification
+
+def build_stored_classification(start, concept, amount, groups, entities):
+    """
+    Method to build the classification of a stored movement
+    """
+    return reclassification.StoredClassification(concept, datetime.datetime.fromisoformat(start), concept, amount, groups, entities, 6, -1, 0)
+
+class TestReclassification(unittest.TestCase):
+
+    def setUp(self):
+
+        self.groups = (rules.Group("Salary", (rules.Rule("NOMINA", frozenset([">0"])),)),
+                       rules.Group("Home", (rules.Rule("ALQUILER", frozenset(["<0"])), rules.Rule("LUZ", frozenset(["<0"])))))
+        self.entities = (rules.Entity("Company", ("EMPRESA",)),
+                         rules.Entity("Landlord", ("ALQUILER",)))
+
+    def test_changed_strings(self):
+
+        assert reclassification.get_changed_strings(self.groups, self.entities, tuple(reversed(self.groups)), self.entities) == set()
+
+        # Added rule, changed signs of a rule, renamed entity and removed entity
+        groups = (rules.Group("Salary", (rules.Rule("NOMINA", frozenset([">0"])), rules.Rule("PAGA", frozenset([">0"])))),
+                  rules.Group("Home", (rules.Rule("ALQUILER", frozenset(["<0"])), rules.Rule("LUZ", frozenset([">0", "<0"])))))
+        entities = (rules.Entity("Employer", ("EMPRESA",)),)
+
+        assert reclassification.get_changed_strings(self.groups, self.entities, groups, entities) == {"PAGA", "LUZ", "EMPRESA", "ALQUILER"}
+
+    def test_reclassifications(self):
+
+        stored_classifications = [build_stored_classification("2023-06-01T00:00:00", "NOMINA EMPRESA", 1000.0, ("Salary",), ("Company",)),
+                                  build_stored_classification("2023-06-02T00:00:00", "RECIBO LUZ", -50.0, ("Spending no group",), ("No entity",)),
+                                  build_stored_classification("2024-01-02T00:00:00", "RECIBO ALQUILER", -700.0, ("Home",), ("Landlord",))]
+
+        # The new rules classify the electricity bills into Home
+        reclassifications = reclassification.get_reclassifications(stored_classifications, rules.RulesMatcher(self.groups, self.entities))
+
+        assert [stored_classification.concept for stored_classification, values in reclassifications] == ["RECIBO LUZ"]
+        assert reclassifications[0].values == [{"name": "group0", "type": "text", "value": "Home"},
+                                               {"name": "number_of_groups", "type": "double", "value": 1},
+                                               {"name": "number_of_entities", "type": "double", "value": 1},
+                                               {"name": "entity0", "type": "text", "value": "No entity"}]
+
+        # Only the month and the year of the reclassified movement change, for the previous and the new groups
+        month_keys, year_keys = reclassification.get_changed_keys(reclassifications)
+
+        assert month_keys == {datetime.datetime(2023, 6, 1): {"groups": {"Spending no group", "Home"}, "entities": {"No entity"}}}
+        assert year_keys == {datetime.datetime(2023, 1, 1): {"groups": {"Spending no group", "Home"}, "entities": {"No entity"}}}
@@ -0,0 +1,232 @@
+"""
+Automated tests for the matcher of the movements against the groups and entities
+
+Written by Daniel Brosnan Blázquez
+
+module bankboa
+"""
+# Import python utilities
+import os
+import unittest
+import random
+import tempfile
+
+# Import xml parser
+from lxml import etree
+
+# Import rules matcher
+from bankboa.ingestions.ingestion_transactions import rules
+
+groups_configuration = """
+<groups>
+  <group>
+    <name>Payroll</name>
+    <matching_rules>
+      <rule>
+        <match>NOMINA</match>
+        <amount>&gt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Home</name>
+    <matching_rules>
+      <rule>
+        <match>ALQUILER</match>
+        <amount>&lt;0</amount>
+      </rule>
+      <rule>
+        <match>COMUNIDAD</match>
+        <amount>&lt;0</amount>
+        <amount>&gt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Cards</name>
+    <matching_rules>
+      <rule>
+        <match>TARJETA</match>
+        <match>NOMINA</match>
+        <amount>&lt;0</amount>
+      </rule>
+      <rule>
+        <match>COMPRA TARJETA</match>
+        <amount>&gt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Everything spent</name>
+    <matching_rules>
+      <rule>
+        <match></match>
+        <amount>&lt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Without sign</name>
+    <matching_rules>
+      <rule>
+        <match>BIZUM</match>
+      </rule>
+    </matching_rules>
+  </group>
+  <group>
+    <name>Nested match</name>
+    <matching_rules>
+      <rule>
+        <match>ABA<b>BAB</b></match>
+        <amount>&gt;0</amount>
+      </rule>
+    </matching_rules>
+  </group>
+</groups>
+"""
+
+entities_configuration = """
+<entities>
+  <entity>
+    <name>Company</name>
+    <matching_strings>
+      <string>NOMINA</string>
+      <string>EMPRESA</string>
+    </matching_strings>
+  </entity>
+  <entity>
+    <name>Landlord</name>
+    <matching_strings>
+      <string>ALQUILER</string>
+    </matching_strings>
+  </entity>
+  <entity>
+    <name>Overlapping</name>
+    <matching_strings>
+      <string>ABAB</string>
+      <string>BABA</string>
+    </matching_strings>
+  </entity>
+  <entity>
+    <name>Shop</name>
+    <matching_strings>
+      <string>TARJETA</string>
+    </matching_strings>
+  </entity>
+  <entity>
+    <name>Nobody</name>
+    <matching_strings>
+    </matching_strings>
+  </entity>
+</entities>
+"""
+
+class TestRules(unittest.TestCase):
+    def setUp(self):
+        self.groups_xml = etree.ElementTree(etree.fromstring(groups_configuration))
+        self.entities_xml = etree.ElementTree(etree.fromstring(entities_configuration))
+        self.groups_xpath = etree.XPathEvaluator(self.groups_xml)
+        self.entities_xpath = etree.XPathEvaluator(self.entities_xml)
+        self.rules_matcher = rules.RulesMatcher(rules.parse_groups(self.groups_xml), rules.parse_entities(self.entities_xml))
+
+    def xpath_match(self, concept, amount):
+
+        groups = self.groups_xpath("/groups/group[boolean(matching_rules/rule[contains($concept, match)][$amount > 0 and amount = '>0' or $amount < 0 and amount = '<0'])]", concept = concept, amount = amount)
+
+        entities = self.entities_xpath("/entities/entity[boolean(matching_strings/string[contains($concept, text())])]", concept = concept)
+
+        return ([group.xpath("name")[0].text for group in groups],
+                [entity.xpath("name")[0].text for entity in entities])
+
+    def test_parity_with_xpath(self):
+
+        concepts = ["NOMINA EMPRESA SA", "RECIBO ALQUILER PISO", "COMPRA TARJETA 1234 SUPERMERCADO",
+                    "TRANSFERENCIA BIZUM", "COMUNIDAD PROPIETARIOS", "ABABABA", "BABAB", "ABABAB",
+                    "nomina en minusculas", "", "SIN COINCIDENCIAS"]
+        amounts = [-1500.0, -0.01, 0.0, 0.01, 2500.0]
+
+        for concept in concepts:
+            for amount in amounts:
+                assert self.rules_matcher.match(concept, amount) == self.xpath_match(concept, amount)
+            # end for
+        # end for
+
+    def test_parity_with_xpath_random_concepts(self):
+
+        words = ["NOMINA", "ALQUILER", "COMUNIDAD", "TARJETA", "COMPRA", "BIZUM", "EMPRESA", "AB", "BA", "X"]
+        generator = random.Random(0)
+
+        for i in range(500):
+            concept = " ".join(generator.choice(words) for j in range(generator.randint(0, 6)))
+            amount = generator.choice([-1, 1]) * generator.random() * 1000
+            assert self.rules_matcher.match(concept, amount) == self.xpath_match(concept, amount)
+        # end for
+
+    def test_names(self):
+
+        assert self.rules_matcher.group_names == ["Payroll", "Home", "Cards", "Everything spent", "Without sign", "Nested match"]
+        assert self.rules_matcher.entity_names == ["Company", "Landlord", "Overlapping", "Shop", "Nobody"]
+
+    def test_classification_cache(self):
+
+        classification_cache = rules.ClassificationCache(max_size = 2)
+        rules_matcher = rules.RulesMatcher(rules.parse_groups(self.groups_xml), rules.parse_entities(self.entities_xml), ("version",), classification_cache)
+
+        for concept, amount in [("NOMINA EMPRESA SA", 2500.0), ("NOMINA EMPRESA SA", 1000.0), ("NOMINA EMPRESA SA", -10.0),
+                                ("RECIBO ALQUILER PISO", -700.0), ("NOMINA EMPRESA SA", 0.01)]:
+            assert rules_matcher.match(concept, amount) == self.xpath_match(concept, amount)
+        # end for
+
+        # The classifications are keyed on the sign of the amount and the least recently used one is evicted
+        statistics = classification_cache.get_statistics()
+
+        assert statistics["hits"] == 1
+        assert statistics["misses"] == 4
+        assert statistics["evictions"] == 2
+        assert statistics["size"] == 2
+        assert statistics["hit_rate"] == 0.2
+
+        # The returned lists do not alter the cached classification
+        rules_matcher.match("NOMINA EMPRESA SA", 1.0)[0].append("Altered")
+
+        assert rules_matcher.match("NOMINA EMPRESA SA", 1.0) == self.xpath_match("NOMINA EMPRESA SA", 1.0)
+
+    def test_cache_invalidation(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            groups_path = directory + "/groups.xml"
+            entities_path = directory + "/entities.xml"
+            with open(groups_path, "w") as groups_file:
+                groups_file.write(groups_configuration)
+            # end with
+            with open(entities_path, "w") as entities_file:
+                entities_file.write(entities_configuration)
+            # end with
+
+            rules_matcher = rules.get_rules_matcher(groups_path, entities_path)
+
+            # The configuration is not parsed again while the files do not change
+            assert rules.get_rules_matcher(groups_path, entities_path) is rules_matcher
+            assert rules.get_groups(groups_path) is rules.get_groups(groups_path)
+            assert rules.get_groups(groups_path)[1] == rules.Group("Home", (rules.Rule("ALQUILER", frozenset(["<0"])),
+                                                                           rules.Rule("COMUNIDAD", frozenset(["<0", ">0"]))))
+
+            # Modify the entities
+            with open(entities_path, "w") as entities_file:
+                entities_file.write("<entities><entity><name>Landlord</name><matching_strings><string>ALQUILER</string></matching_strings></entity></entities>")
+            # end with
+            status = os.stat(entities_path)
+            os.utime(entities_path, ns = (status.st_atime_ns, status.st_mtime_ns + 1000000000))
+
+            rules_matcher.match("RECIBO ALQUILER", -500.0)
+
+            assert rules.classification_cache.get_statistics()["size"] > 0
+
+            updated_rules_matcher = rules.get_rules_matcher(groups_path, entities_path)
+
+            # The classifications with the previous rules are removed
+            assert rules.classification_cache.get_statistics()["size"] == 0
+            assert updated_rules_matcher is not rules_matcher
+            assert updated_rules_matcher.entity_names == ["Landlord"]
+            assert updated_rules_matcher.match("RECIBO ALQUILER", -500.0) == (["Home", "Everything spent"], ["Landlord"])
+        # end with
@@ -28,6 +28,19 @@ def create_app():
     # Register the specific views
     app.register_blueprint(transactions_analysis.bp)
 
+    # Configure the cache of the data of the transactions analysis views
+    transactions_analysis.response_cache.configure(app.config.get("TRANSACTIONS_ANALYSIS_CACHE_MAX_ENTRIES", 128),
+                                                   app.config.get("TRANSACTIONS_ANALYSIS_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+                                                   app.config.get("TRANSACTIONS_ANALYSIS_CACHE_REVALIDATE_SECONDS", 30))
+
+    # Configure the pool of Query instances of the transactions analysis views
+    transactions_analysis.query_pool.configure(app.config.get("TRANSACTIONS_ANALYSIS_QUERY_POOL_SIZE", 10),
+                                               app.config.get("TRANSACTIONS_ANALYSIS_QUERY_POOL_TIMEOUT", 30))
+
+    # Configure the workers running the independent queries of the transactions analysis views
+    # (shared by the concurrent requests, each view submits up to 5 queries)
+    transactions_analysis.configure_query_executor(app.config.get("TRANSACTIONS_ANALYSIS_QUERY_EXECUTOR_WORKERS", transactions_analysis.QUERY_EXECUTOR_WORKERS))
+
     # Register the specific templates folder
     templates_folder = os.path.dirname(__file__) + "/templates"
     templates_loader = jinja2.ChoiceLoader([
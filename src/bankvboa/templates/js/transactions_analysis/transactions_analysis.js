@@ -0,0 +1,289 @@
+/* Display of the transactions analysis views from the columnar data returned by the data API */
+
+/* Function to escape the text inserted into the tables */
+function escape_html(text){
+
+    if (text === null || text === undefined){
+        return "";
+    }
+
+    return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;").replace(/'/g, "&#39;");
+};
+
+/* Function to obtain the text for the tooltip of the widgets of the movements */
+function get_tooltip(id, date, groups, amount, concept, balance){
+
+    var tooltip = "<table border='1'>" +
+        "<tr><td>ID</td><td><a href='/eboa_nav/query-event-links/" + id + "'>" + id + "</a></td></tr>" +
+        "<tr><td>Date</td><td>" + date + "</td></tr>" +
+        "<tr><td>Groups</td><td>" + escape_html(groups) + "</td></tr>" +
+        "<tr><td>Amount</td><td>" + amount + "</td></tr>" +
+        "<tr><td>Concept</td><td>" + escape_html(concept) + "</td></tr>" +
+        "<tr><td>Balance</td><td>" + balance + "</td></tr>" +
+        "</table>"
+
+    return tooltip
+};
+
+/* Function to obtain the text for the tooltip of the widgets of the aggregated movements */
+function get_aggregated_tooltip(id, date, label, name, amount){
+
+    var tooltip = "<table border='1'>" +
+        "<tr><td>ID</td><td><a href='/eboa_nav/query-event-links/" + id + "'>" + id + "</a></td></tr>" +
+        "<tr><td>Date</td><td>" + date + "</td></tr>" +
+        "<tr><td>" + label + "</td><td>" + escape_html(name) + "</td></tr>" +
+        "<tr><td>Amount</td><td>" + amount + "</td></tr>" +
+        "</table>"
+
+    return tooltip
+};
+
+/* Function to display a panel */
+function show_panel(id){
+
+    document.getElementById(id).style.display = "";
+};
+
+/* Function to display a series of points or hide its container if empty */
+function display_series(id, series, title){
+
+    var groups = [];
+    var items = [];
+    var options = vboa.prepare_events_data_for_xy(series, items, groups, title);
+    if (items.length > 0){
+        vboa.display_x_time(id, items, groups, options);
+    }
+    else{
+        var container = document.getElementById(id + "-container");
+        container.style.visibility = "hidden";
+    }
+};
+
+/* Function to fill the body of a table with rows of cells in HTML */
+function fill_table(id, rows){
+
+    var table = document.getElementById(id);
+    if (window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable(table)){
+        jQuery(table).DataTable().rows.add(rows).draw();
+    }
+    else{
+        var html = [];
+        for (var i = 0; i < rows.length; i++){
+            html.push("<tr><td>" + rows[i].join("</td><td>") + "</td></tr>");
+        }
+        table.tBodies[0].innerHTML = html.join("");
+    }
+};
+
+/* Function to display the inputs used to extract the data */
+function display_sources(sources){
+
+    var rows = [];
+    for (var i = 0; i < sources["id"].length; i++){
+        rows.push([escape_html(sources["name"][i]),
+                   escape_html(sources["validity_start"][i]),
+                   escape_html(sources["validity_stop"][i]),
+                   escape_html(sources["ingestion_time"][i])]);
+    }
+    fill_table("transactions-analysis-sources-table-content", rows);
+    show_panel("transactions-analysis-sources-panel");
+};
+
+/* Function to convert a series computed by the server into the points expected by vboa */
+function get_points(series, group, get_point_id, get_point_tooltip){
+
+    var points = [];
+    for (var i = 0; i < series["index"].length; i++){
+        points.push({
+            "id": get_point_id(series["index"][i]),
+            "group": group(series["index"][i]),
+            "x": series["x"][i],
+            "y": series["y"][i],
+            "tooltip": get_point_tooltip(series["index"][i], series["y"][i])
+        });
+    }
+
+    return points
+};
+
+/* Function to display a page of the movements obtained from the paginated API */
+function display_movements_page(table, page){
+
+    var movements = page["movements"];
+    var rows = [];
+    for (var i = 0; i < movements["id"].length; i++){
+        rows.push([escape_html(movements["groups"][i]),
+                   escape_html(movements["entities"][i]),
+                   movements["amount"][i],
+                   "<a href='" + table["urls"]["event_links"] + movements["id"][i] + "'>" + escape_html(movements["concept"][i]) + "</a>",
+                   movements["start"][i]]);
+    }
+    fill_table("transactions-table-content", rows);
+
+    // Keep the cursor of the next page
+    table["cursors"] = table["cursors"].slice(0, table["page"] + 1);
+    if (page["next_cursor"] !== null){
+        table["cursors"].push(page["next_cursor"]);
+    }
+    document.getElementById("transactions-table-page").innerHTML = "Page " + (table["page"] + 1);
+    document.getElementById("transactions-table-previous").disabled = (table["page"] == 0);
+    document.getElementById("transactions-table-next").disabled = (page["next_cursor"] === null);
+};
+
+/* Function to load the current page of the movements table */
+function load_movements_page(table){
+
+    var url = table["api_url"];
+    var api_parameters = new URL(table["api_url"], window.location.href).searchParams;
+    for (var name in table["filters"]){
+        // The group or entity of the view is already a parameter of the API URL
+        if (table["filters"][name] !== "" && !api_parameters.has(name)){
+            url += "&" + name + "=" + encodeURIComponent(table["filters"][name]);
+        }
+    }
+    if (table["cursors"][table["page"]] !== null){
+        url += "&cursor=" + encodeURIComponent(table["cursors"][table["page"]]);
+    }
+
+    fetch(url, {"credentials": "same-origin"}).then(function(response){
+        if (!response.ok){
+            throw new Error("The movements API returned the status " + response.status);
+        }
+        return response.json();
+    }).then(function(page){
+        display_movements_page(table, page);
+    }).catch(function(error){
+        fill_table("transactions-table-content", [["", "", "", "The movements could not be loaded: " + escape_html(error.message), ""]]);
+    });
+};
+
+/* Function to initialize the movements table paginated and filtered by the server */
+function initialize_movements_table(api_url, urls){
+
+    var table = {
+        "api_url": api_url,
+        "urls": urls,
+        "filters": {},
+        "cursors": [null],
+        "page": 0
+    };
+
+    var form = document.getElementById("transactions-table-filters");
+    form.addEventListener("submit", function(event){
+        event.preventDefault();
+        table["filters"] = {};
+        for (var i = 0; i < form.elements.length; i++){
+            if (form.elements[i].name){
+                table["filters"][form.elements[i].name] = form.elements[i].value;
+            }
+        }
+        table["cursors"] = [null];
+        table["page"] = 0;
+        load_movements_page(table);
+    });
+    document.getElementById("transactions-table-previous").addEventListener("click", function(){
+        table["page"] -= 1;
+        load_movements_page(table);
+    });
+    document.getElementById("transactions-table-next").addEventListener("click", function(){
+        table["page"] += 1;
+        load_movements_page(table);
+    });
+
+    load_movements_page(table);
+};
+
+/* Function to display the evolution graphs of the movements */
+function display_movements(movements, movements_series, urls){
+
+    show_panel("transactions-panel");
+
+    var get_id = function(index){ return movements["id"][index]; };
+    var get_account_id = function(index){ return "account-evolution-" + movements["id"][index]; };
+    var get_movement_tooltip = function(index, y){
+        return get_tooltip(movements["id"][index], movements["start"][index], movements["groups"][index], y, movements["concept"][index], movements["balance"][index]);
+    };
+    var constant = function(group){ return function(index){ return group; }; };
+
+    display_series("data-transactions-incoming", get_points(movements_series["transactions_incoming"], constant("Incoming transactions"), get_id, get_movement_tooltip), "Incoming transactions");
+    display_series("data-evolution-transactions-incoming", get_points(movements_series["incoming_evolution"], constant("Evolution of incoming"), get_id, get_movement_tooltip), "Evolution of the incoming transactions");
+    display_series("data-transactions-spending", get_points(movements_series["transactions_spending"], constant("Spending transactions"), get_id, get_movement_tooltip), "Evolution of the spending transactions");
+    display_series("data-evolution-transactions-spending", get_points(movements_series["spending_evolution"], constant("Evolution of spending"), get_id, get_movement_tooltip), "Evolution of the spending transactions");
+    display_series("data-account-evolution", get_points(movements_series["account_evolution"], constant("Account evolution"), get_account_id, get_movement_tooltip), "Evolution of the account");
+};
+
+/* Function to display the table and the graphs of the aggregated movements per group or entity */
+function display_aggregated_movements(aggregated_movements, aggregated_movements_series, value_name, period, urls, metadata){
+
+    var label = value_name.charAt(0).toUpperCase() + value_name.slice(1);
+    var rows = [];
+    for (var i = 0; i < aggregated_movements["id"].length; i++){
+        var id = aggregated_movements["id"][i];
+        var name = aggregated_movements["name"][i];
+        var analysis_url = urls[value_name + "_analysis"] +
+            "?reporting_start=" + encodeURIComponent(metadata["reporting_start"]) +
+            "&reporting_stop=" + encodeURIComponent(metadata["reporting_stop"]) +
+            "&" + value_name + "=" + encodeURIComponent(name);
+        rows.push(["<a href='" + escape_html(analysis_url) + "'>" + escape_html(name) + "</a>",
+                   aggregated_movements["amount"][i],
+                   aggregated_movements["start"][i],
+                   aggregated_movements["stop"][i],
+                   "<a href='" + urls["event_links"] + id + "'><i class='fa fa-link'></i></a>"]);
+    }
+
+    var panel = "transactions-analysis-aggregated-movements-" + value_name + "-" + period;
+    fill_table(panel + "-table-content", rows);
+    show_panel(panel + "-panel");
+
+    var get_name = function(index){ return aggregated_movements["name"][index]; };
+    var get_id = function(index){ return aggregated_movements["id"][index]; };
+    var get_accumulated_id = function(index){ return "accumulated-evolution-" + aggregated_movements["id"][index]; };
+    var get_aggregated_movement_tooltip = function(index, y){
+        return get_aggregated_tooltip(aggregated_movements["id"][index], aggregated_movements["start"][index], label, aggregated_movements["name"][index], y);
+    };
+
+    display_series("data-" + value_name + "-" + period, get_points(aggregated_movements_series["evolution"], get_name, get_id, get_aggregated_movement_tooltip), "Evolution of the balance by " + value_name + " and " + period);
+    display_series("data-accumulated-" + value_name + "-" + period, get_points(aggregated_movements_series["accumulated_evolution"], get_name, get_accumulated_id, get_aggregated_movement_tooltip), "Evolution of the accumulated balance by " + value_name + " and " + period);
+};
+
+/* Function to display the data of the view */
+function display_transactions_analysis(data, movements_api_url, urls){
+
+    document.getElementById("transactions-analysis-loading").style.display = "none";
+
+    if (data["movements"]["id"].length == 0){
+        show_panel("transactions-analysis-no-data-panel");
+        return;
+    }
+
+    display_sources(data["sources"]);
+    initialize_movements_table(movements_api_url, urls);
+    display_movements(data["movements"], data["series"]["movements"], urls);
+
+    var periods = ["month", "year"];
+    var value_names = ["group", "entity"];
+    for (var i = 0; i < periods.length; i++){
+        for (var j = 0; j < value_names.length; j++){
+            var name = "aggregated_movements_" + value_names[j] + "_" + periods[i];
+            if (data[name] !== undefined && data[name]["id"].length > 0){
+                display_aggregated_movements(data[name], data["series"][name], value_names[j], periods[i], urls, data["metadata"]);
+            }
+        }
+    }
+};
+
+/* Function to load the data of the view asynchronously from the data API */
+function load_transactions_analysis(api_url, movements_api_url, urls){
+
+    fetch(api_url, {"credentials": "same-origin"}).then(function(response){
+        if (!response.ok){
+            throw new Error("The data API returned the status " + response.status);
+        }
+        return response.json();
+    }).then(function(data){
+        display_transactions_analysis(data, movements_api_url, urls);
+    }).catch(function(error){
+        var loading = document.getElementById("transactions-analysis-loading");
+        loading.innerHTML = "<p style='text-indent: 1em'>The transactions of the reporting period could not be loaded: " + escape_html(error.message) + "</p>";
+    });
+};
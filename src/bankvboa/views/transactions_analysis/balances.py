@@ -0,0 +1,68 @@
+"""
+Window queries over the materialized daily balances of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import SQLAlchemy utilities
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+
+# Import datamodel
+from eboa.datamodel.events import Event, EventDouble
+from eboa.datamodel.gauges import Gauge
+
+def build_balance_window(rows, opening_balance):
+    """
+    Method to build the window of daily balances from the rows of its days
+
+    :param rows: tuples (day, balance, inflow, outflow) of the days inside the window sorted by day
+    :type rows: list of tuple
+    :param opening_balance: balance of the last day before the window (None if unknown)
+    :type opening_balance: float
+
+    :return: columns day, balance, inflow and outflow of the days inside the window, the balance before the window
+    and the total inflow and outflow inside the window
+    :rtype: dict
+    """
+    window = {
+        "day": [row[0] for row in rows],
+        "balance": [row[1] for row in rows],
+        "inflow": [row[2] if row[2] is not None else 0.0 for row in rows],
+        "outflow": [row[3] if row[3] is not None else 0.0 for row in rows]
+    }
+    window["opening_balance"] = opening_balance
+    window["inflow_total"] = sum(window["inflow"])
+    window["outflow_total"] = sum(window["outflow"])
+
+    return window
+
+def query_balance_window(session, start, stop):
+    """
+    Method to query the daily balances of the days inside a window and the balance of the last day before it.
+    Only the DAILY_BALANCE events of the window (and the previous one) are read, located by their start in the DDBB
+
+    :param session: session of the DDBB
+    :type session: Session
+    :param start: start of the window (included) in ISO format
+    :type start: str
+    :param stop: stop of the window (excluded) in ISO format
+    :type stop: str
+
+    :return: window as returned by build_balance_window
+    :rtype: dict
+    """
+    balance = aliased(EventDouble)
+    inflow = aliased(EventDouble)
+    outflow = aliased(EventDouble)
+    balances_query = session.query(Event.start, balance.value, inflow.value, outflow.value).join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid).join(
+        balance, and_(balance.event_uuid == Event.event_uuid, balance.name == "balance")).outerjoin(
+            inflow, and_(inflow.event_uuid == Event.event_uuid, inflow.name == "inflow")).outerjoin(
+                outflow, and_(outflow.event_uuid == Event.event_uuid, outflow.name == "outflow")).filter(Gauge.name == "DAILY_BALANCE")
+
+    rows = [(day.isoformat(), day_balance, day_inflow, day_outflow)
+            for day, day_balance, day_inflow, day_outflow in balances_query.filter(Event.start >= start, Event.start < stop).order_by(Event.start)]
+    opening_row = balances_query.filter(Event.start < start).order_by(Event.start.desc()).limit(1).first()
+
+    return build_balance_window(rows, opening_row[1] if opening_row is not None else None)
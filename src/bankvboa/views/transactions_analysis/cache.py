@@ -0,0 +1,245 @@
+"""
+Cache of the data of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import json
+import time
+import datetime
+import threading
+from collections import OrderedDict
+from dateutil import parser
+
+# DIM signatures of the sources whose ingestion changes the data of the views
+# (the reclassification of the movements rewrites them in place and only registers the months to aggregate)
+SOURCES_DIM_SIGNATURES = ["MOVEMENTS_SANTANDER", "AGGREGATED_MOVEMENTS_MONTH_SANTANDER", "AGGREGATED_MOVEMENTS_YEAR_SANTANDER", "UPDATE_MONTHS_SANTANDER"]
+
+# DIM signatures of the sources whose ingestion changes the daily balances
+DAILY_BALANCES_DIM_SIGNATURES = ["DAILY_BALANCES_SANTANDER"]
+
+def get_sources_signature(query, reporting_start, reporting_stop, dim_signatures = SOURCES_DIM_SIGNATURES):
+    """
+    Method to obtain the signature of the sources of movements and aggregated movements
+    overlapping the reporting period. Any ingestion or deletion of these sources changes the signature
+
+    :param query: Query instance
+    :type query: Query
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+    :param dim_signatures: DIM signatures of the sources
+    :type dim_signatures: list
+
+    :return: signature of the sources
+    :rtype: frozenset
+    """
+    sources = query.get_sources(dim_signatures = {"filter": dim_signatures, "op": "in"},
+                                validity_stop_filters = [{"date": reporting_start, "op": ">"}],
+                                validity_start_filters = [{"date": reporting_stop, "op": "<"}])
+
+    return frozenset(str(source.source_uuid) for source in sources)
+
+def get_whole_days_window(reporting_start, reporting_stop):
+    """
+    Method to extend a reporting period to whole days, so that the periods computed
+    from the current time (default windows) are the same during the day and share the entries of the cache
+
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+
+    :return: tuple with the start of the first day and the start of the day after the last one
+    :rtype: tuple
+    """
+    start = parser.parse(reporting_start)
+    stop = parser.parse(reporting_stop)
+    start_day = datetime.datetime.combine(start.date(), datetime.time())
+    stop_day = datetime.datetime.combine(stop.date(), datetime.time())
+    if stop_day < stop.replace(tzinfo = None):
+        stop_day += datetime.timedelta(days = 1)
+    # end if
+
+    return start_day.isoformat(), stop_day.isoformat()
+
+def estimate_size(data):
+    """
+    Method to estimate the memory used by the data of a view
+
+    :param data: data of the view (or its serialization)
+    :type data: dict or str
+
+    :return: size of the data serialized to JSON in bytes
+    :rtype: int
+    """
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    # end if
+
+    return len(json.dumps(data, default = str))
+
+class ResponseCache():
+    """
+    LRU cache of the data of the views bounded in number of entries and in memory.
+
+    The entries are validated against the signature of the sources
+    once the revalidation interval has elapsed since the last validation
+    """
+
+    def __init__(self, max_entries = 128, max_bytes = 64 * 1024 * 1024, revalidate_seconds = 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def configure(self, max_entries, max_bytes, revalidate_seconds):
+        """
+        Method to update the limits of the cache
+
+        :param max_entries: maximum number of entries
+        :type max_entries: int
+        :param max_bytes: maximum estimated size of all the entries
+        :type max_bytes: int
+        :param revalidate_seconds: seconds during which an entry is served without validating it
+        :type revalidate_seconds: float
+        """
+        with self.lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.revalidate_seconds = revalidate_seconds
+            self._evict()
+        # end with
+
+    def _evict(self):
+        """
+        Method to remove the least recently used entries until the limits are fulfilled
+        (the lock has to be acquired)
+        """
+        while len(self.entries) > 0 and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            key, entry = self.entries.popitem(last = False)
+            self.size -= entry["size"]
+        # end while
+
+    def _remove(self, key):
+        """
+        Method to remove an entry (the lock has to be acquired)
+
+        :param key: key of the entry
+        :type key: tuple
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry["size"]
+        # end if
+
+    def get(self, key, get_signature):
+        """
+        Method to obtain the data of an entry if it is still valid
+
+        :param key: key of the entry
+        :type key: tuple
+        :param get_signature: function returning the current signature of the sources of the entry
+        :type get_signature: function
+
+        :return: data of the entry or None if there is no valid entry
+        :rtype: dict
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            # end if
+            self.entries.move_to_end(key)
+            if time.monotonic() - entry["validated_at"] < self.revalidate_seconds:
+                self.hits += 1
+                return entry["data"]
+            # end if
+        # end with
+
+        # Validate the entry without holding the lock
+        signature = get_signature()
+
+        with self.lock:
+            if self.entries.get(key) is not entry:
+                self.misses += 1
+                return None
+            elif signature != entry["signature"]:
+                self._remove(key)
+                self.misses += 1
+                return None
+            # end if
+            entry["validated_at"] = time.monotonic()
+            self.hits += 1
+        # end with
+
+        return entry["data"]
+
+    def set(self, key, data, signature):
+        """
+        Method to insert or replace an entry
+
+        :param key: key of the entry
+        :type key: tuple
+        :param data: data of the view
+        :type data: dict
+        :param signature: signature of the sources obtained before building the data
+        :type signature: object
+        """
+        size = estimate_size(data)
+        with self.lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            # end if
+            self.entries[key] = {
+                "data": data,
+                "signature": signature,
+                "size": size,
+                "validated_at": time.monotonic()
+            }
+            self.size += size
+            self._evict()
+        # end with
+
+    def get_or_build(self, key, get_signature, build):
+        """
+        Method to obtain the data of an entry building it if there is no valid entry
+
+        :param key: key of the entry
+        :type key: tuple
+        :param get_signature: function returning the current signature of the sources of the entry
+        :type get_signature: function
+        :param build: function returning the data of the entry
+        :type build: function
+
+        :return: data of the entry
+        :rtype: dict
+        """
+        data = self.get(key, get_signature)
+        if data is None:
+            # The signature is obtained before building the data so that
+            # sources ingested meanwhile invalidate the entry
+            signature = get_signature()
+            data = build()
+            self.set(key, data, signature)
+        # end if
+
+        return data
+
+    def clear(self):
+        """
+        Method to remove all the entries
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        # end with
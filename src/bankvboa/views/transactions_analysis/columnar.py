@@ -0,0 +1,222 @@
+"""
+Conversion of the exported events of the transactions analysis views to columnar structures
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import evolution series
+from bankvboa.views.transactions_analysis import series
+
+# Import downsampling of the series
+from bankvboa.views.transactions_analysis import downsampling
+
+# Version of the structure returned by the data API
+API_VERSION = "1"
+
+def _get_event_values(event):
+    """
+    Method to index the values of an exported event by name
+
+    :param event: exported event
+    :type event: dict
+
+    :return: values (converted to float for the double ones) by name
+    :rtype: dict
+    """
+    values = {}
+    for value in event.get("values", []):
+        if "name" not in value or "value" not in value:
+            continue
+        # end if
+        if value.get("type") == "double":
+            values[value["name"]] = float(value["value"])
+        else:
+            values[value["name"]] = value["value"]
+        # end if
+    # end for
+
+    return values
+
+def _join_values_by_prefix(values, prefix):
+    """
+    Method to join the values whose names are the prefix followed by an index (group0, group1...)
+
+    :param values: values by name
+    :type values: dict
+    :param prefix: prefix of the names
+    :type prefix: str
+
+    :return: values joined by commas in index order
+    :rtype: str
+    """
+    indexed_values = []
+    for name, value in values.items():
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            indexed_values.append((int(name[len(prefix):]), value))
+        # end if
+    # end for
+
+    return ", ".join(value for index, value in sorted(indexed_values))
+
+def movements_to_columns(data, group):
+    """
+    Method to convert the exported MOVEMENT events of a group to columns
+
+    :param data: exported data of the view
+    :type data: dict
+    :param group: name of the group of the exported events
+    :type group: str
+
+    :return: columns id, start, amount, balance, concept, groups and entities
+    :rtype: dict
+    """
+    columns = {"id": [], "start": [], "amount": [], "balance": [], "concept": [], "groups": [], "entities": []}
+    for event_uuid in data.get("event_groups", {}).get(group, []):
+        event = data["events"][event_uuid]
+        values = _get_event_values(event)
+        columns["id"].append(event_uuid)
+        columns["start"].append(event["start"])
+        columns["amount"].append(values.get("amount"))
+        columns["balance"].append(values.get("balance"))
+        columns["concept"].append(values.get("concept"))
+        columns["groups"].append(_join_values_by_prefix(values, "group"))
+        columns["entities"].append(_join_values_by_prefix(values, "entity"))
+    # end for
+
+    return columns
+
+def aggregated_movements_to_columns(data, group, value_name):
+    """
+    Method to convert the exported AGGREGATED_MOVEMENTS_* events of a group to columns
+
+    :param data: exported data of the view
+    :type data: dict
+    :param group: name of the group of the exported events
+    :type group: str
+    :param value_name: name of the value holding the group or entity (group or entity)
+    :type value_name: str
+
+    :return: columns id, start, stop, name and amount
+    :rtype: dict
+    """
+    columns = {"id": [], "start": [], "stop": [], "name": [], "amount": []}
+    for event_uuid in data.get("event_groups", {}).get(group, []):
+        event = data["events"][event_uuid]
+        values = _get_event_values(event)
+        columns["id"].append(event_uuid)
+        columns["start"].append(event["start"])
+        columns["stop"].append(event["stop"])
+        columns["name"].append(values.get(value_name))
+        columns["amount"].append(values.get("amount"))
+    # end for
+
+    return columns
+
+def sources_to_columns(data):
+    """
+    Method to convert the exported sources to columns
+
+    :param data: exported data of the view
+    :type data: dict
+
+    :return: columns id, name, validity_start, validity_stop and ingestion_time
+    :rtype: dict
+    """
+    columns = {"id": [], "name": [], "validity_start": [], "validity_stop": [], "ingestion_time": []}
+    for source_uuid, source in data.get("sources", {}).items():
+        columns["id"].append(source_uuid)
+        for column in ["name", "validity_start", "validity_stop", "ingestion_time"]:
+            columns[column].append(source.get(column))
+        # end for
+    # end for
+
+    return columns
+
+def _keep_referenced_movements(api_data):
+    """
+    Method to keep only the movements referenced by the points of the series
+    (the table of movements is paginated separately)
+
+    :param api_data: structure returned by the data API
+    :type api_data: dict
+    """
+    movements_series = api_data["series"]["movements"]
+    indexes = sorted(set(index for points in movements_series.values() for index in points["index"]))
+    new_indexes = {index: new_index for new_index, index in enumerate(indexes)}
+
+    api_data["movements"] = {column: [values[index] for index in indexes] for column, values in api_data["movements"].items()}
+    for points in movements_series.values():
+        points["index"] = [new_indexes[index] for index in points["index"]]
+    # end for
+
+def _add_movement_values(movements, query_movement_values):
+    """
+    Method to add the columns concept, groups and entities to movements queried without their text values
+
+    :param movements: movements in columnar form (id, start, amount, balance)
+    :type movements: dict
+    :param query_movement_values: function returning the values by name of each movement by UUID
+    :type query_movement_values: function
+    """
+    values = query_movement_values(movements["id"]) if len(movements["id"]) > 0 else {}
+    movement_values = [values.get(event_uuid, {}) for event_uuid in movements["id"]]
+    movements["concept"] = [event_values.get("concept") for event_values in movement_values]
+    movements["groups"] = [_join_values_by_prefix(event_values, "group") for event_values in movement_values]
+    movements["entities"] = [_join_values_by_prefix(event_values, "entity") for event_values in movement_values]
+
+def build_api_data(data, max_points = None, downsampling_method = downsampling.MINMAX, movements = None, query_movement_values = None):
+    """
+    Method to build the structure returned by the data API from the exported data of a view
+
+    :param data: exported data of the view
+    :type data: dict
+    :param max_points: maximum number of points per series (no downsampling if None)
+    :type max_points: int
+    :param downsampling_method: method to reduce the series exceeding the maximum number of points (minmax or lttb)
+    :type downsampling_method: str
+    :param movements: columns id, start, amount and balance of the movements queried from the DDBB
+    (the exported MOVEMENT events of the data are used if None)
+    :type movements: dict
+    :param query_movement_values: function returning the text values of the movements by UUID,
+    only called for the movements referenced by the series (required with movements)
+    :type query_movement_values: function
+
+    :return: metadata, sources, movements and aggregated movements in columnar form and their evolution series
+    (the movements are limited to the ones referenced by the series)
+    :rtype: dict
+    """
+    if movements is None:
+        movements = movements_to_columns(data, "movement_events")
+    # end if
+    api_data = {
+        "version": API_VERSION,
+        "metadata": data["metadata"],
+        "sources": sources_to_columns(data),
+        "movements": movements,
+        "series": {}
+    }
+    api_data["series"]["movements"] = series.build_movements_series(api_data["movements"])
+    for period in ["month", "year"]:
+        for value_name in ["group", "entity"]:
+            group = f"aggregated_movements_{value_name}_{period}_events"
+            if group in data.get("event_groups", {}):
+                name = f"aggregated_movements_{value_name}_{period}"
+                api_data[name] = aggregated_movements_to_columns(data, group, value_name)
+                api_data["series"][name] = series.build_aggregated_movements_series(api_data[name])
+            # end if
+        # end for
+    # end for
+
+    for name in api_data["series"]:
+        for series_name, points in api_data["series"][name].items():
+            api_data["series"][name][series_name] = downsampling.downsample_series(points, max_points, downsampling_method)
+        # end for
+    # end for
+
+    _keep_referenced_movements(api_data)
+    if "concept" not in api_data["movements"]:
+        _add_movement_values(api_data["movements"], query_movement_values)
+    # end if
+
+    return api_data
@@ -0,0 +1,139 @@
+"""
+Downsampling of the evolution series of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import numpy as np
+
+# Available downsampling methods
+MINMAX = "minmax"
+LTTB = "lttb"
+
+def _get_times(x):
+    """
+    Method to convert the ISO format dates of a series to numbers
+
+    :param x: ISO format dates
+    :type x: list
+
+    :return: microseconds since the epoch
+    :rtype: numpy.ndarray
+    """
+    return np.array(x, dtype = "datetime64[us]").astype(np.int64).astype(float)
+
+def _bucket_limits(length, buckets):
+    """
+    Method to split the inner points of a series (all but the first and the last) in buckets of similar size
+
+    :param length: number of points of the series
+    :type length: int
+    :param buckets: number of buckets
+    :type buckets: int
+
+    :return: limits of the buckets (the bucket i covers the positions limits[i] to limits[i + 1] excluded)
+    :rtype: numpy.ndarray
+    """
+    return np.linspace(1, length - 1, buckets + 1).astype(int)
+
+def minmax_positions(y, max_points):
+    """
+    Method to select the positions of the points keeping the minimum and the maximum of each bucket
+    together with the first and the last points
+
+    :param y: values of the series
+    :type y: numpy.ndarray
+    :param max_points: maximum number of points to keep
+    :type max_points: int
+
+    :return: selected positions in order
+    :rtype: numpy.ndarray
+    """
+    limits = _bucket_limits(len(y), max(1, (max_points - 2) // 2))
+    positions = [0, len(y) - 1]
+    for start, stop in zip(limits[:-1], limits[1:]):
+        if stop > start:
+            positions.append(start + np.argmin(y[start:stop]))
+            positions.append(start + np.argmax(y[start:stop]))
+        # end if
+    # end for
+
+    return np.unique(positions)
+
+def lttb_positions(times, y, max_points):
+    """
+    Method to select the positions of the points with the largest triangle three buckets algorithm
+
+    :param times: numeric x values of the series
+    :type times: numpy.ndarray
+    :param y: values of the series
+    :type y: numpy.ndarray
+    :param max_points: maximum number of points to keep
+    :type max_points: int
+
+    :return: selected positions in order
+    :rtype: numpy.ndarray
+    """
+    limits = _bucket_limits(len(y), max(1, max_points - 2))
+    positions = [0]
+    previous = 0
+    for i in range(len(limits) - 1):
+        start, stop = limits[i], limits[i + 1]
+        if stop <= start:
+            continue
+        # end if
+
+        # Average of the next bucket (or the last point)
+        if i + 2 < len(limits) and limits[i + 2] > stop:
+            next_time = times[stop:limits[i + 2]].mean()
+            next_y = y[stop:limits[i + 2]].mean()
+        else:
+            next_time = times[-1]
+            next_y = y[-1]
+        # end if
+
+        areas = np.abs((times[previous] - next_time) * (y[start:stop] - y[previous]) -
+                       (times[previous] - times[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        positions.append(previous)
+    # end for
+    positions.append(len(y) - 1)
+
+    return np.unique(positions)
+
+def downsample_series(series, max_points, method = MINMAX):
+    """
+    Method to reduce the number of points of a series if it exceeds the budget.
+    The retained points keep their index to the events they come from
+
+    :param series: series with the columns index, x and y
+    :type series: dict
+    :param max_points: maximum number of points (no downsampling if None or 0)
+    :type max_points: int
+    :param method: downsampling method (minmax or lttb)
+    :type method: str
+
+    :return: series with the columns index, x and y and the number of points of the original series
+    :rtype: dict
+    """
+    length = len(series["y"])
+    if not max_points or length <= max(max_points, 3):
+        return series
+    # end if
+
+    y = np.array(series["y"], dtype = float)
+    if method == LTTB:
+        positions = lttb_positions(_get_times(series["x"]), y, max_points)
+    else:
+        positions = minmax_positions(y, max_points)
+    # end if
+
+    positions = positions.tolist()
+    return {
+        "index": [series["index"][position] for position in positions],
+        "x": [series["x"][position] for position in positions],
+        "y": [series["y"][position] for position in positions],
+        "original_length": length
+    }
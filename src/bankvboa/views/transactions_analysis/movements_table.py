@@ -0,0 +1,251 @@
+"""
+Keyset pagination of the movements of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import base64
+import json
+import datetime
+
+# Import SQLAlchemy utilities
+from sqlalchemy import and_, or_, exists
+from sqlalchemy.orm import aliased
+
+# Import datamodel
+from eboa.datamodel.events import Event, EventText, EventDouble
+from eboa.datamodel.gauges import Gauge
+
+# Columns available to sort the movements
+SORT_COLUMNS = ["start", "amount"]
+
+# Maximum number of movements per page
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort_value, event_uuid):
+    """
+    Method to encode the position after the last movement of a page
+
+    :param sort_value: value of the sort column of the last movement
+    :type sort_value: str or float
+    :param event_uuid: UUID of the last movement
+    :type event_uuid: str
+
+    :return: opaque cursor
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(json.dumps([sort_value, str(event_uuid)]).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Method to decode a cursor generated by encode_cursor
+
+    :param cursor: opaque cursor
+    :type cursor: str
+
+    :return: tuple with the value of the sort column and the UUID of the last movement
+    :rtype: tuple
+    """
+    try:
+        sort_value, event_uuid = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        raise ValueError(f"The cursor {cursor} is not valid")
+    # end try
+    if not isinstance(event_uuid, str):
+        raise ValueError(f"The cursor {cursor} is not valid")
+    # end if
+
+    return sort_value, event_uuid
+
+def _escape_like(text):
+    """
+    Method to escape the wildcards of a text used in a LIKE pattern
+
+    :param text: text
+    :type text: str
+
+    :return: escaped text
+    :rtype: str
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _filter_movements(movements_query, amount, reporting_start, reporting_stop, filters):
+    """
+    Method to restrict a query to the MOVEMENT events of the reporting period fulfilling the filters
+
+    :param movements_query: query over the events
+    :type movements_query: Query
+    :param amount: alias of EventDouble joined as the amount of the movements
+    :type amount: EventDouble
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+    :param filters: optional filters amount_min, amount_max, concept (substring, case insensitive), group and entity
+    :type filters: dict
+
+    :return: filtered query
+    :rtype: Query
+    """
+    movements_query = movements_query.join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid).join(
+        amount, and_(amount.event_uuid == Event.event_uuid, amount.name == "amount")).filter(
+            Gauge.name == "MOVEMENT",
+            Event.stop > reporting_start,
+            Event.start < reporting_stop)
+
+    if filters.get("amount_min") is not None:
+        movements_query = movements_query.filter(amount.value >= filters["amount_min"])
+    # end if
+    if filters.get("amount_max") is not None:
+        movements_query = movements_query.filter(amount.value <= filters["amount_max"])
+    # end if
+    if filters.get("concept"):
+        movements_query = movements_query.filter(exists().where(and_(EventText.event_uuid == Event.event_uuid,
+                                                                     EventText.name == "concept",
+                                                                     EventText.value.ilike("%" + _escape_like(filters["concept"]) + "%", escape = "\\"))))
+    # end if
+    for value_name in ["group", "entity"]:
+        if filters.get(value_name):
+            movements_query = movements_query.filter(exists().where(and_(EventText.event_uuid == Event.event_uuid,
+                                                                         EventText.name.like(value_name + "%"),
+                                                                         EventText.value == filters[value_name])))
+        # end if
+    # end for
+
+    return movements_query
+
+def query_movements_page(session, reporting_start, reporting_stop, filters = None, sort = "start", descending = False, limit = 50, cursor = None):
+    """
+    Method to query a page of MOVEMENT events ordered by the sort column and the event UUID
+
+    :param session: session of the DDBB
+    :type session: Session
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+    :param filters: optional filters amount_min, amount_max, concept (substring, case insensitive), group and entity
+    :type filters: dict
+    :param sort: column to sort by (start or amount)
+    :type sort: str
+    :param descending: flag to sort in descending order
+    :type descending: bool
+    :param limit: number of movements of the page
+    :type limit: int
+    :param cursor: cursor returned with the previous page (None for the first page)
+    :type cursor: str
+
+    :return: tuple with the events of the page and the cursor of the next page (None if there are no more)
+    :rtype: tuple
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"The movements can only be sorted by {SORT_COLUMNS}")
+    # end if
+    if filters is None:
+        filters = {}
+    # end if
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    amount = aliased(EventDouble)
+    movements_query = _filter_movements(session.query(Event, amount.value), amount, reporting_start, reporting_stop, filters)
+
+    sort_column = Event.start if sort == "start" else amount.value
+    if cursor is not None:
+        sort_value, event_uuid = decode_cursor(cursor)
+        if sort == "start" and isinstance(sort_value, str):
+            # Raises ValueError if the value is not a date
+            datetime.datetime.fromisoformat(sort_value)
+        elif sort == "start" or isinstance(sort_value, bool) or not isinstance(sort_value, (int, float)):
+            raise ValueError(f"The cursor {cursor} does not correspond to the sort by {sort}")
+        # end if
+        if descending:
+            movements_query = movements_query.filter(or_(sort_column < sort_value,
+                                                         and_(sort_column == sort_value, Event.event_uuid < event_uuid)))
+        else:
+            movements_query = movements_query.filter(or_(sort_column > sort_value,
+                                                         and_(sort_column == sort_value, Event.event_uuid > event_uuid)))
+        # end if
+    # end if
+
+    if descending:
+        movements_query = movements_query.order_by(sort_column.desc(), Event.event_uuid.desc())
+    else:
+        movements_query = movements_query.order_by(sort_column, Event.event_uuid)
+    # end if
+
+    # One more movement is requested to know if there is a next page
+    rows = movements_query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_event, last_amount = rows[-1]
+        next_cursor = encode_cursor(last_event.start.isoformat() if sort == "start" else last_amount, last_event.event_uuid)
+    # end if
+
+    return [event for event, event_amount in rows], next_cursor
+
+def query_movement_columns(session, reporting_start, reporting_stop, filters = None):
+    """
+    Method to query the columns needed by the evolution series of the MOVEMENT events
+    without loading the events and their values
+
+    :param session: session of the DDBB
+    :type session: Session
+    :param reporting_start: start of the reporting period
+    :type reporting_start: str
+    :param reporting_stop: stop of the reporting period
+    :type reporting_stop: str
+    :param filters: optional filters (as in query_movements_page)
+    :type filters: dict
+
+    :return: columns id, start, amount and balance ordered by start
+    :rtype: dict
+    """
+    if filters is None:
+        filters = {}
+    # end if
+
+    amount = aliased(EventDouble)
+    balance = aliased(EventDouble)
+    movements_query = _filter_movements(session.query(Event.event_uuid, Event.start, amount.value, balance.value), amount, reporting_start, reporting_stop, filters)
+    movements_query = movements_query.outerjoin(balance, and_(balance.event_uuid == Event.event_uuid, balance.name == "balance")).order_by(Event.start, Event.event_uuid)
+
+    columns = {"id": [], "start": [], "amount": [], "balance": []}
+    for event_uuid, start, event_amount, event_balance in movements_query:
+        columns["id"].append(str(event_uuid))
+        columns["start"].append(start.isoformat())
+        columns["amount"].append(event_amount)
+        columns["balance"].append(event_balance)
+    # end for
+
+    return columns
+
+# Maximum number of UUIDs per query of the values of the movements
+MAX_UUIDS_PER_QUERY = 500
+
+def query_movement_values(session, event_uuids):
+    """
+    Method to query the text values (concept, groups and entities) of some MOVEMENT events
+
+    :param session: session of the DDBB
+    :type session: Session
+    :param event_uuids: UUIDs of the events
+    :type event_uuids: list
+
+    :return: values by name of each event by UUID
+    :rtype: dict
+    """
+    values = {str(event_uuid): {} for event_uuid in event_uuids}
+    for i in range(0, len(event_uuids), MAX_UUIDS_PER_QUERY):
+        values_query = session.query(EventText.event_uuid, EventText.name, EventText.value).filter(
+            EventText.event_uuid.in_(event_uuids[i:i + MAX_UUIDS_PER_QUERY]),
+            or_(EventText.name == "concept", EventText.name.like("group%"), EventText.name.like("entity%")))
+        for event_uuid, name, value in values_query:
+            values[str(event_uuid)][name] = value
+        # end for
+    # end for
+
+    return values
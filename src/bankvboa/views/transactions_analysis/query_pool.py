@@ -0,0 +1,145 @@
+"""
+Pool of Query instances of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import threading
+from contextlib import contextmanager
+
+class QueryPool():
+    """
+    Bounded pool of Query instances (each one with its own session).
+
+    A Query is used by a single request or thread at a time and its session
+    is closed on release, so no state is shared between requests.
+    The sessions of eboa are scoped to the thread creating the Query, so an idle
+    Query is only handed again to the thread that created it (a Query created later
+    in that thread would share the session of one used by another thread).
+    The acquisition waits for a free Query once the pool size is reached
+    """
+
+    def __init__(self, factory, max_size = 10, timeout = 30):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        # Idle Query instances by identifier of the thread that created them
+        self.idle = {}
+        # Identifier of the thread that created each Query
+        self.owners = {}
+        self.in_use = 0
+        # Number of Query instances alive (idle or in use)
+        self.size = 0
+        self.created = 0
+        self.condition = threading.Condition()
+
+    def configure(self, max_size, timeout):
+        """
+        Method to set the size of the pool and the maximum time waiting for a free Query
+
+        :param max_size: maximum number of Query instances in use at the same time
+        :type max_size: int
+        :param timeout: maximum number of seconds waiting for a free Query
+        :type timeout: float
+        """
+        with self.condition:
+            self.max_size = max_size
+            self.timeout = timeout
+            self.condition.notify_all()
+        # end with
+
+    def _discard_idle_query(self):
+        """
+        Method to discard an idle Query (preferably one of a finished thread)
+        to keep the number of Query instances bounded.
+        It has to be called holding the condition
+        """
+        alive_threads = set(thread.ident for thread in threading.enumerate())
+        owner = next((thread_ident for thread_ident in self.idle if thread_ident not in alive_threads), next(iter(self.idle)))
+        query = self.idle[owner].pop()
+        if len(self.idle[owner]) == 0:
+            del self.idle[owner]
+        # end if
+        del self.owners[query]
+        self.size -= 1
+
+    def acquire(self):
+        """
+        Method to obtain a Query for exclusive use
+
+        :return: Query instance
+        :rtype: Query
+        """
+        thread_ident = threading.get_ident()
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_use < self.max_size, timeout = self.timeout):
+                raise TimeoutError(f"No free Query after waiting {self.timeout} seconds ({self.in_use} in use)")
+            # end if
+            self.in_use += 1
+            if thread_ident in self.idle:
+                query = self.idle[thread_ident].pop()
+                if len(self.idle[thread_ident]) == 0:
+                    del self.idle[thread_ident]
+                # end if
+                return query
+            # end if
+            while self.size >= self.max_size and len(self.idle) > 0:
+                self._discard_idle_query()
+            # end while
+            self.size += 1
+        # end with
+
+        # The Query is created outside the lock as it connects to the DDBB
+        try:
+            query = self.factory()
+        except Exception:
+            with self.condition:
+                self.in_use -= 1
+                self.size -= 1
+                self.condition.notify()
+            # end with
+            raise
+        # end try
+        with self.condition:
+            self.created += 1
+            self.owners[query] = thread_ident
+        # end with
+
+        return query
+
+    def release(self, query):
+        """
+        Method to return a Query to the pool closing its session.
+        The Query is kept idle for the thread that created it
+
+        :param query: Query instance obtained with acquire
+        :type query: Query
+        """
+        try:
+            query.close_session()
+        finally:
+            with self.condition:
+                self.in_use -= 1
+                if self.size <= self.max_size:
+                    self.idle.setdefault(self.owners[query], []).append(query)
+                else:
+                    del self.owners[query]
+                    self.size -= 1
+                # end if
+                self.condition.notify()
+            # end with
+        # end try
+
+    @contextmanager
+    def query(self):
+        """
+        Method to use a Query of the pool inside a with statement
+        """
+        query = self.acquire()
+        try:
+            yield query
+        finally:
+            self.release(query)
+        # end try
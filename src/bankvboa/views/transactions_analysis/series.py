@@ -0,0 +1,100 @@
+"""
+Evolution series of the transactions analysis views computed with vectorized cumulative sums
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import numpy as np
+
+def _build_series(indexes, x, y):
+    """
+    Method to build a series ready to be plotted
+
+    :param indexes: indexes of the points in the columns they come from
+    :type indexes: numpy.ndarray
+    :param x: column with the x values
+    :type x: list
+    :param y: y values of the points
+    :type y: numpy.ndarray
+
+    :return: columns index, x and y of the series
+    :rtype: dict
+    """
+    return {
+        "index": indexes.tolist(),
+        "x": [x[index] for index in indexes.tolist()],
+        "y": y.tolist()
+    }
+
+def _running_total(initial, amounts):
+    """
+    Method to accumulate amounts over an initial value
+    (adding them one by one in order as the previous computation in the browser)
+
+    :param initial: initial value
+    :type initial: float
+    :param amounts: amounts to accumulate
+    :type amounts: numpy.ndarray
+
+    :return: running totals after each amount
+    :rtype: numpy.ndarray
+    """
+    return np.cumsum(np.concatenate(([initial], amounts)))[1:]
+
+def build_movements_series(movements):
+    """
+    Method to compute the evolution series of the movements
+
+    :param movements: movements in columnar form (id, start, amount, balance...) ordered by start
+    :type movements: dict
+
+    :return: series transactions_incoming, incoming_evolution, transactions_spending, spending_evolution and account_evolution
+    :rtype: dict
+    """
+    amounts = np.array(movements["amount"], dtype = float)
+    indexes = np.arange(len(amounts))
+    incoming = amounts > 0
+
+    initial = 0.0
+    if len(amounts) > 0:
+        # The evolutions start from the balance previous to the first movement
+        initial = float(movements["balance"][0]) - amounts[0]
+    # end if
+
+    return {
+        "transactions_incoming": _build_series(indexes[incoming], movements["start"], amounts[incoming]),
+        "incoming_evolution": _build_series(indexes[incoming], movements["start"], _running_total(initial, amounts[incoming])),
+        "transactions_spending": _build_series(indexes[~incoming], movements["start"], amounts[~incoming]),
+        "spending_evolution": _build_series(indexes[~incoming], movements["start"], _running_total(initial, amounts[~incoming])),
+        "account_evolution": _build_series(indexes, movements["start"], _running_total(initial, amounts))
+    }
+
+def build_aggregated_movements_series(aggregated_movements):
+    """
+    Method to compute the evolution series of the aggregated movements per group or entity
+
+    :param aggregated_movements: aggregated movements in columnar form (id, start, stop, name, amount) ordered by start
+    :type aggregated_movements: dict
+
+    :return: series evolution and accumulated_evolution (accumulated per group or entity)
+    :rtype: dict
+    """
+    amounts = np.abs(np.array(aggregated_movements["amount"], dtype = float))
+    indexes = np.arange(len(amounts))
+    names = np.array(aggregated_movements["name"], dtype = object)
+
+    accumulated = np.zeros(len(amounts))
+    if len(amounts) > 0:
+        unique_names, codes = np.unique(names.astype(str), return_inverse = True)
+        for code in range(len(unique_names)):
+            positions = np.flatnonzero(codes == code)
+            accumulated[positions] = np.cumsum(amounts[positions])
+        # end for
+    # end if
+
+    return {
+        "evolution": _build_series(indexes, aggregated_movements["start"], amounts),
+        "accumulated_evolution": _build_series(indexes, aggregated_movements["start"], accumulated)
+    }
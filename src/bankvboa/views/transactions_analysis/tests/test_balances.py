@@ -0,0 +1,37 @@
+"""
+Automated tests for the window queries over the daily balances
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+
+# Import window queries over the daily balances
+from bankvboa.views.transactions_analysis import balances
+
+class TestBalances(unittest.TestCase):
+
+    def test_build_balance_window(self):
+
+        rows = [("2025-07-03T00:00:00", 1003.0, 3.0, -6.0), ("2025-07-05T00:00:00", 1005.0, None, -10.0)]
+
+        window = balances.build_balance_window(rows, 1002.0)
+
+        assert window["day"] == ["2025-07-03T00:00:00", "2025-07-05T00:00:00"]
+        assert window["balance"] == [1003.0, 1005.0]
+        # The days without inflow count as zero
+        assert window["inflow"] == [3.0, 0.0]
+        assert window["opening_balance"] == 1002.0
+        assert window["inflow_total"] == 3.0
+        assert window["outflow_total"] == -16.0
+
+    def test_empty_balance_window(self):
+
+        window = balances.build_balance_window([], None)
+
+        assert window["day"] == []
+        assert window["opening_balance"] is None
+        assert window["inflow_total"] == 0
+        assert window["outflow_total"] == 0
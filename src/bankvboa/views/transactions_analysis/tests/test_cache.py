@@ -0,0 +1,96 @@
+"""
+Automated tests for the cache of the data of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+
+# Import cache of the data of the views
+from bankvboa.views.transactions_analysis.cache import ResponseCache, estimate_size, get_whole_days_window
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.signature = frozenset(["source_1"])
+        self.builds = 0
+        self.validations = 0
+
+    def get_signature(self):
+        self.validations += 1
+        return self.signature
+
+    def build(self, value):
+        self.builds += 1
+        return {"metadata": {"value": value}}
+
+    def test_hit_without_validation(self):
+
+        response_cache = ResponseCache(revalidate_seconds = 60)
+
+        data = response_cache.get_or_build(("view", "start", "stop"), self.get_signature, lambda: self.build(1))
+        cached_data = response_cache.get_or_build(("view", "start", "stop"), self.get_signature, lambda: self.build(2))
+
+        assert cached_data is data
+        assert self.builds == 1
+        # The signature is only obtained when building the entry
+        assert self.validations == 1
+        assert response_cache.hits == 1
+
+    def test_invalidation_by_sources(self):
+
+        response_cache = ResponseCache(revalidate_seconds = 0)
+
+        response_cache.get_or_build(("view", "start", "stop"), self.get_signature, lambda: self.build(1))
+        data = response_cache.get_or_build(("view", "start", "stop"), self.get_signature, lambda: self.build(2))
+
+        assert data["metadata"]["value"] == 1
+
+        # New sources overlapping the reporting period
+        self.signature = frozenset(["source_1", "source_2"])
+        data = response_cache.get_or_build(("view", "start", "stop"), self.get_signature, lambda: self.build(3))
+
+        assert data["metadata"]["value"] == 3
+        assert self.builds == 2
+
+    def test_lru_eviction(self):
+
+        response_cache = ResponseCache(max_entries = 2, revalidate_seconds = 60)
+
+        for key in ["a", "b"]:
+            response_cache.get_or_build((key,), self.get_signature, lambda: self.build(key))
+        # end for
+
+        # Use a so that b is the least recently used
+        response_cache.get_or_build(("a",), self.get_signature, lambda: self.build("a"))
+        response_cache.get_or_build(("c",), self.get_signature, lambda: self.build("c"))
+
+        assert list(response_cache.entries) == [("a",), ("c",)]
+
+    def test_memory_cap(self):
+
+        entry_size = estimate_size(self.build("a"))
+        response_cache = ResponseCache(max_bytes = 2 * entry_size, revalidate_seconds = 60)
+
+        for key in ["a", "b", "c"]:
+            response_cache.get_or_build((key,), self.get_signature, lambda: self.build(key))
+        # end for
+
+        assert list(response_cache.entries) == [("b",), ("c",)]
+        assert response_cache.size == 2 * entry_size
+
+        # Entries bigger than the cap are not stored
+        response_cache.get_or_build(("big",), self.get_signature, lambda: {"metadata": {"value": "x" * 3 * entry_size}})
+
+        assert ("big",) not in response_cache.entries
+        assert response_cache.size == 2 * entry_size
+
+    def test_whole_days_window(self):
+
+        # Default windows computed at different times of the same day share the period
+        assert get_whole_days_window("2025-06-08T10:15:20.123456", "2025-07-08T10:15:20.123456") == ("2025-06-08T00:00:00", "2025-07-09T00:00:00")
+        assert get_whole_days_window("2025-06-08T18:40:00", "2025-07-08T18:40:00") == ("2025-06-08T00:00:00", "2025-07-09T00:00:00")
+
+        # Periods of whole days are kept
+        assert get_whole_days_window("2025-06-08T00:00:00", "2025-07-09T00:00:00") == ("2025-06-08T00:00:00", "2025-07-09T00:00:00")
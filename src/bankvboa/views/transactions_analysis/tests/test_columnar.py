@@ -0,0 +1,102 @@
+"""
+Automated tests for the conversion of the exported events to columnar structures
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+
+# Import conversion to columnar structures
+from bankvboa.views.transactions_analysis import columnar
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            "metadata": {"reporting_start": "2025-07-01T00:00:00", "reporting_stop": "2025-08-01T00:00:00"},
+            "event_groups": {
+                "movement_events": ["uuid-1", "uuid-2"],
+                "aggregated_movements_group_month_events": ["uuid-3"]
+            },
+            "events": {
+                "uuid-1": {"start": "2025-07-01T00:00:00", "stop": "2025-07-02T00:00:00",
+                           "values": [{"name": "amount", "type": "double", "value": "-20.5"},
+                                      {"name": "balance", "type": "double", "value": "100.0"},
+                                      {"name": "concept", "type": "text", "value": "RECIBO LUZ"},
+                                      {"name": "group1", "type": "text", "value": "Bills"},
+                                      {"name": "group0", "type": "text", "value": "Home"},
+                                      {"name": "number_of_groups", "type": "double", "value": "2"},
+                                      {"name": "entity0", "type": "text", "value": "No entity"}]},
+                "uuid-2": {"start": "2025-07-02T00:00:00", "stop": "2025-07-03T00:00:00",
+                           "values": [{"name": "amount", "type": "double", "value": "2500"},
+                                      {"name": "balance", "type": "double", "value": "2600.0"},
+                                      {"name": "concept", "type": "text", "value": "NOMINA"},
+                                      {"name": "group0", "type": "text", "value": "Payroll"},
+                                      {"name": "entity0", "type": "text", "value": "Company"}]},
+                "uuid-3": {"start": "2025-07-01T00:00:00", "stop": "2025-08-01T00:00:00",
+                           "values": [{"name": "group", "type": "text", "value": "Home"},
+                                      {"name": "amount", "type": "double", "value": "-20.5"}]}
+            },
+            "sources": {
+                "source-1": {"name": "BANKSAN_MOVEMENTS.xls", "validity_start": "2025-07-01T00:00:00", "validity_stop": "2025-07-03T00:00:00"}
+            }
+        }
+
+    def test_build_api_data(self):
+
+        api_data = columnar.build_api_data(self.data)
+
+        assert api_data["version"] == columnar.API_VERSION
+        assert api_data["movements"] == {
+            "id": ["uuid-1", "uuid-2"],
+            "start": ["2025-07-01T00:00:00", "2025-07-02T00:00:00"],
+            "amount": [-20.5, 2500.0],
+            "balance": [100.0, 2600.0],
+            "concept": ["RECIBO LUZ", "NOMINA"],
+            "groups": ["Home, Bills", "Payroll"],
+            "entities": ["No entity", "Company"]
+        }
+        assert api_data["aggregated_movements_group_month"] == {
+            "id": ["uuid-3"],
+            "start": ["2025-07-01T00:00:00"],
+            "stop": ["2025-08-01T00:00:00"],
+            "name": ["Home"],
+            "amount": [-20.5]
+        }
+        # Only the exported groups of events are returned
+        assert "aggregated_movements_entity_month" not in api_data
+        assert api_data["sources"]["name"] == ["BANKSAN_MOVEMENTS.xls"]
+        assert api_data["sources"]["ingestion_time"] == [None]
+
+    def test_build_api_data_from_movement_columns(self):
+
+        # Movements queried without their text values
+        movements = {"id": [], "start": [], "amount": [], "balance": []}
+        balance = 1000.0
+        for i in range(20):
+            amount = 100.0 if i % 4 == 0 else -20.0
+            balance += amount
+            movements["id"].append(f"uuid-{i}")
+            movements["start"].append(f"2025-07-{i + 1:02d}T00:00:00")
+            movements["amount"].append(amount)
+            movements["balance"].append(balance)
+        # end for
+
+        requested_uuids = []
+        def query_movement_values(event_uuids):
+            requested_uuids.extend(event_uuids)
+            return {event_uuid: {"concept": f"CONCEPT {event_uuid}", "group1": "Bills", "group0": "Home", "entity0": "No entity"} for event_uuid in event_uuids}
+        # end def
+
+        api_data = columnar.build_api_data(self.data, max_points = 4, movements = movements, query_movement_values = query_movement_values)
+
+        # The text values are only queried for the movements referenced by the downsampled series
+        assert requested_uuids == api_data["movements"]["id"]
+        assert 0 < len(requested_uuids) < 20
+        assert api_data["movements"]["concept"] == [f"CONCEPT {event_uuid}" for event_uuid in requested_uuids]
+        assert set(api_data["movements"]["groups"]) == {"Home, Bills"}
+        assert set(api_data["movements"]["entities"]) == {"No entity"}
+        for points in api_data["series"]["movements"].values():
+            assert [api_data["movements"]["start"][index] for index in points["index"]] == points["x"]
+        # end for
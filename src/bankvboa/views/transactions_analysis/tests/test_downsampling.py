@@ -0,0 +1,67 @@
+"""
+Automated tests for the downsampling of the evolution series
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+import datetime
+import math
+
+# Import downsampling of the series
+from bankvboa.views.transactions_analysis import downsampling
+
+class TestDownsampling(unittest.TestCase):
+    def setUp(self):
+        start = datetime.datetime(2020, 1, 1)
+        length = 10000
+        self.series = {
+            "index": list(range(length)),
+            "x": [(start + datetime.timedelta(hours = i)).isoformat() for i in range(length)],
+            "y": [1000 * math.sin(i / 300) + (5000 if i == 4321 else 0) - (7000 if i == 8765 else 0) for i in range(length)]
+        }
+
+    def check_downsampled_series(self, downsampled_series, max_points):
+
+        assert len(downsampled_series["y"]) <= max_points
+        assert downsampled_series["original_length"] == len(self.series["y"])
+
+        # The retained points keep their index to the events
+        for index, x, y in zip(downsampled_series["index"], downsampled_series["x"], downsampled_series["y"]):
+            assert self.series["x"][index] == x
+            assert self.series["y"][index] == y
+        # end for
+        assert downsampled_series["index"] == sorted(downsampled_series["index"])
+
+        # The first and the last points are kept
+        assert downsampled_series["index"][0] == 0
+        assert downsampled_series["index"][-1] == len(self.series["y"]) - 1
+
+    def test_minmax(self):
+
+        downsampled_series = downsampling.downsample_series(self.series, 500, downsampling.MINMAX)
+
+        self.check_downsampled_series(downsampled_series, 500)
+
+        # Peaks and troughs are kept
+        assert 4321 in downsampled_series["index"]
+        assert 8765 in downsampled_series["index"]
+        assert max(downsampled_series["y"]) == max(self.series["y"])
+        assert min(downsampled_series["y"]) == min(self.series["y"])
+
+    def test_lttb(self):
+
+        downsampled_series = downsampling.downsample_series(self.series, 500, downsampling.LTTB)
+
+        self.check_downsampled_series(downsampled_series, 500)
+
+        # Isolated peaks and troughs are kept
+        assert 4321 in downsampled_series["index"]
+        assert 8765 in downsampled_series["index"]
+
+    def test_within_budget(self):
+
+        assert downsampling.downsample_series(self.series, 20000) is self.series
+        assert downsampling.downsample_series(self.series, None) is self.series
@@ -0,0 +1,184 @@
+"""
+Automated tests for the keyset pagination of the movements of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+import datetime
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import application
+from bankvboa import create_app
+from bankvboa.views.transactions_analysis import transactions_analysis
+
+# Import pagination of the movements
+from bankvboa.views.transactions_analysis import movements_table
+
+class TestMovementsTable(unittest.TestCase):
+    def setUp(self):
+        # Create the engine to manage the data
+        self.engine_eboa = Engine()
+        self.query_eboa = Query()
+
+        # Clear all tables before executing the test
+        self.query_eboa.clear_db()
+
+        # 30 movements with 3 movements per start and 3 different amounts, so that the pages cut ties on both columns
+        movements_events = []
+        start = datetime.datetime(2025, 7, 1)
+        balance = 1000.0
+        for i in range(30):
+            amount = [100.0, -20.0, -35.5][i % 3]
+            balance += amount
+            movements_events.append({
+                "gauge": {"insertion_type": "INSERT_and_ERASE", "name": "MOVEMENT", "system": "BANCO SANTANDER"},
+                "start": (start + datetime.timedelta(days = i // 3)).isoformat(),
+                "stop": (start + datetime.timedelta(days = i // 3 + 1)).isoformat(),
+                "values": [{"name": "concept", "type": "text", "value": "NOMINA EMPRESA" if amount > 0 else f"RECIBO 100% LUZ {i}"},
+                           {"name": "amount", "type": "double", "value": str(amount)},
+                           {"name": "balance", "type": "double", "value": str(balance)},
+                           {"name": "group0", "type": "text", "value": "Payroll" if amount > 0 else "Home"},
+                           {"name": "group1", "type": "text", "value": "Bills" if amount == -35.5 else "Others"},
+                           {"name": "entity0", "type": "text", "value": "Company" if amount > 0 else "No entity"}]
+            })
+        # end for
+
+        exit_status = self.engine_eboa.treat_data({"operations": [{
+            "mode": "insert",
+            "dim_signature": {"name": "MOVEMENTS_SANTANDER", "exec": "test", "version": "1.0"},
+            "source": {"name": "source.xls",
+                       "reception_time": "2025-07-20T00:00:00",
+                       "generation_time": "2025-07-20T00:00:00",
+                       "validity_start": movements_events[0]["start"],
+                       "validity_stop": movements_events[-1]["stop"]},
+            "events": movements_events
+        }]})
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        self.reporting_start = "2025-07-01T00:00:00"
+        self.reporting_stop = "2025-08-01T00:00:00"
+
+        self.movements = {}
+        for event in self.query_eboa.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="}):
+            values = {value.name: value.value for value in event.eventTexts + event.eventDoubles}
+            self.movements[str(event.event_uuid)] = {"start": event.start, "amount": values["amount"], "values": values}
+        # end for
+
+    def tearDown(self):
+        # Close connections to the DDBB
+        self.engine_eboa.close_session()
+        self.query_eboa.close_session()
+
+    def get_all_pages(self, limit, **kwargs):
+        """
+        Method to follow the cursors through every page
+        """
+        event_uuids = []
+        cursor = None
+        while True:
+            events, cursor = movements_table.query_movements_page(self.query_eboa.session, self.reporting_start, self.reporting_stop,
+                                                                  limit = limit, cursor = cursor, **kwargs)
+            assert len(events) <= limit
+            event_uuids += [str(event.event_uuid) for event in events]
+            if cursor is None:
+                break
+            # end if
+            assert len(events) == limit
+        # end while
+
+        return event_uuids
+
+    def get_expected_uuids(self, sort, descending = False, condition = lambda movement: True):
+        """
+        Method to sort the movements fulfilling a condition by the sort column and the UUID
+        """
+        event_uuids = [event_uuid for event_uuid, movement in self.movements.items() if condition(movement)]
+
+        return sorted(event_uuids, key = lambda event_uuid: (self.movements[event_uuid][sort], event_uuid), reverse = descending)
+
+    def test_pages_by_start(self):
+
+        # Pages of 4 movements cut the groups of 3 movements with the same start
+        assert self.get_all_pages(4, sort = "start") == self.get_expected_uuids("start")
+        assert self.get_all_pages(4, sort = "start", descending = True) == self.get_expected_uuids("start", descending = True)
+
+    def test_pages_by_amount(self):
+
+        # 10 movements share each amount
+        assert self.get_all_pages(4, sort = "amount") == self.get_expected_uuids("amount")
+        assert self.get_all_pages(4, sort = "amount", descending = True) == self.get_expected_uuids("amount", descending = True)
+
+    def test_single_page(self):
+
+        events, cursor = movements_table.query_movements_page(self.query_eboa.session, self.reporting_start, self.reporting_stop, limit = 30)
+
+        assert len(events) == 30
+        assert cursor is None
+
+    def test_reporting_period(self):
+
+        self.reporting_start = "2025-07-03T00:00:00"
+        self.reporting_stop = "2025-07-05T00:00:00"
+
+        assert self.get_all_pages(4) == self.get_expected_uuids("start", condition = lambda movement: datetime.datetime(2025, 7, 3) <= movement["start"] < datetime.datetime(2025, 7, 5))
+
+    def test_filters(self):
+
+        assert self.get_all_pages(4, filters = {"amount_min": -20.0}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] >= -20.0)
+        assert self.get_all_pages(4, filters = {"amount_max": -20.0}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] <= -20.0)
+        assert self.get_all_pages(4, filters = {"amount_min": -30.0, "amount_max": 0.0}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] == -20.0)
+
+        # The concept is a case insensitive substring and its wildcards are literal
+        assert self.get_all_pages(4, filters = {"concept": "nomina"}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] > 0)
+        assert self.get_all_pages(4, filters = {"concept": "100% luz"}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] < 0)
+        assert self.get_all_pages(4, filters = {"concept": "0_"}) == []
+
+        # Any group or entity of the movement is matched
+        assert self.get_all_pages(4, filters = {"group": "Bills"}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] == -35.5)
+        assert self.get_all_pages(4, filters = {"group": "Home"}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] < 0)
+        assert self.get_all_pages(4, filters = {"entity": "Company"}) == self.get_expected_uuids("start", condition = lambda movement: movement["amount"] > 0)
+
+        # The filters are combined
+        assert self.get_all_pages(4, sort = "amount", descending = True, filters = {"group": "Home", "concept": "recibo", "amount_min": -25.0}) == self.get_expected_uuids("amount", descending = True, condition = lambda movement: movement["amount"] == -20.0)
+
+    def test_invalid_cursor(self):
+
+        events, cursor = movements_table.query_movements_page(self.query_eboa.session, self.reporting_start, self.reporting_stop, limit = 4)
+
+        for invalid_cursor in ["not a cursor", movements_table.encode_cursor("not a date", "uuid")]:
+            with self.assertRaises(ValueError):
+                movements_table.query_movements_page(self.query_eboa.session, self.reporting_start, self.reporting_stop, cursor = invalid_cursor)
+            # end with
+        # end for
+
+        # The cursor of the sort by start cannot be used to sort by amount
+        with self.assertRaises(ValueError):
+            movements_table.query_movements_page(self.query_eboa.session, self.reporting_start, self.reporting_stop, sort = "amount", cursor = cursor)
+        # end with
+
+        app = create_app()
+        app.config["TESTING"] = True
+        app.config["LOGIN_DISABLED"] = True
+        transactions_analysis.response_cache.clear()
+
+        period = f"reporting_start={self.reporting_start}&reporting_stop={self.reporting_stop}"
+        with app.test_client() as client:
+            response = client.get(f"/views/api/v1/movements?{period}&cursor=not-a-cursor")
+            assert response.status_code == 400
+            assert "error" in response.get_json()
+
+            response = client.get(f"/views/api/v1/movements?{period}&sort=concept")
+            assert response.status_code == 400
+
+            response = client.get(f"/views/api/v1/movements?{period}&limit=4&cursor={cursor}")
+            assert response.status_code == 200
+            assert response.get_json()["movements"]["id"] == self.get_expected_uuids("start")[4:8]
+        # end with
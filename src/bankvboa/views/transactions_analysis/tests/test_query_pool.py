@@ -0,0 +1,165 @@
+"""
+Automated tests for the pool of Query instances of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import pool of Query instances
+from bankvboa.views.transactions_analysis.query_pool import QueryPool
+
+class SessionRecorder():
+    """
+    Object recording the closings of its session in place of a Query
+    """
+    def __init__(self):
+        self.closed = 0
+
+    def close_session(self):
+        self.closed += 1
+
+class ScopedSession():
+    """
+    Session recording the threads using it at the same time
+    """
+    def __init__(self, violations):
+        self.violations = violations
+        self.user = None
+        self.lock = threading.Lock()
+
+    def use(self):
+        with self.lock:
+            if self.user is not None:
+                self.violations.append((self.user, threading.get_ident()))
+            # end if
+            self.user = threading.get_ident()
+        # end with
+        time.sleep(0.001)
+        with self.lock:
+            self.user = None
+        # end with
+
+class ScopedQuery():
+    """
+    Query taking its session from a thread scoped registry as the Query of eboa
+    """
+    sessions = {}
+    violations = []
+
+    def __init__(self):
+        self.session = ScopedQuery.sessions.setdefault(threading.get_ident(), ScopedSession(ScopedQuery.violations))
+
+    def close_session(self):
+        pass
+
+class TestQueryPool(unittest.TestCase):
+
+    def test_reuse_released_query(self):
+
+        pool = QueryPool(SessionRecorder, max_size = 2)
+
+        with pool.query() as query:
+            pass
+        # end with
+
+        with pool.query() as other_query:
+            assert other_query is query
+        # end with
+
+        assert query.closed == 2
+        assert pool.created == 1
+        assert pool.in_use == 0
+
+    def test_bounded_concurrent_use(self):
+
+        pool = QueryPool(SessionRecorder, max_size = 3)
+        lock = threading.Lock()
+        users = {"current": 0, "max": 0}
+
+        def use_query(i):
+            with pool.query() as query:
+                with lock:
+                    users["current"] += 1
+                    users["max"] = max(users["max"], users["current"])
+                # end with
+                time.sleep(0.01)
+                with lock:
+                    users["current"] -= 1
+                # end with
+            # end with
+        # end def
+
+        with ThreadPoolExecutor(max_workers = 10) as executor:
+            list(executor.map(use_query, range(50)))
+        # end with
+
+        assert users["max"] <= 3
+        # The Query instances alive are bounded although each thread creates its own ones
+        assert pool.size <= 3
+        assert pool.in_use == 0
+
+    def test_timeout(self):
+
+        pool = QueryPool(SessionRecorder, max_size = 1, timeout = 0.05)
+
+        query = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        # end with
+        pool.release(query)
+
+        assert pool.in_use == 0
+
+    def test_query_of_another_thread(self):
+
+        pool = QueryPool(SessionRecorder, max_size = 2)
+
+        with pool.query() as query:
+            pass
+        # end with
+
+        def use_query():
+            with pool.query() as other_query:
+                return other_query
+            # end with
+        # end def
+
+        # The idle Query is not handed to other threads
+        with ThreadPoolExecutor(max_workers = 1) as executor:
+            other_query = executor.submit(use_query).result()
+        # end with
+
+        assert other_query is not query
+        assert pool.created == 2
+        assert pool.size == 2
+
+        # The Query is handed again to the thread that created it
+        with pool.query() as same_query:
+            assert same_query is query
+        # end with
+
+    def test_no_session_shared_between_threads(self):
+
+        ScopedQuery.sessions.clear()
+        del ScopedQuery.violations[:]
+        pool = QueryPool(ScopedQuery, max_size = 4)
+
+        def use_query(i):
+            with pool.query() as query:
+                query.session.use()
+            # end with
+        # end def
+
+        with ThreadPoolExecutor(max_workers = 8) as executor:
+            list(executor.map(use_query, range(400)))
+        # end with
+
+        assert ScopedQuery.violations == []
+        assert pool.size <= 4
+        assert pool.in_use == 0
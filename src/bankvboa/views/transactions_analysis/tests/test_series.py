@@ -0,0 +1,79 @@
+"""
+Automated tests for the evolution series of the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+import random
+
+# Import evolution series
+from bankvboa.views.transactions_analysis import series
+
+class TestSeries(unittest.TestCase):
+    def setUp(self):
+        generator = random.Random(0)
+        self.movements = {"id": [], "start": [], "amount": [], "balance": []}
+        balance = 1000.0
+        for i in range(200):
+            amount = round(generator.uniform(-300, 200), 2)
+            balance += amount
+            self.movements["id"].append(f"uuid-{i}")
+            self.movements["start"].append(f"2025-07-{1 + i // 10:02d}T00:00:{i % 10:02d}")
+            self.movements["amount"].append(amount)
+            self.movements["balance"].append(balance)
+        # end for
+
+    def test_movements_series(self):
+
+        movements_series = series.build_movements_series(self.movements)
+
+        # Compare with the running totals computed one movement at a time
+        account_evolution = self.movements["balance"][0] - self.movements["amount"][0]
+        incoming_evolution = account_evolution
+        spending_evolution = account_evolution
+        expected_series = {name: {"index": [], "x": [], "y": []} for name in movements_series}
+        for i, amount in enumerate(self.movements["amount"]):
+            if amount > 0:
+                incoming_evolution += amount
+                points = [("transactions_incoming", amount), ("incoming_evolution", incoming_evolution)]
+            else:
+                spending_evolution += amount
+                points = [("transactions_spending", amount), ("spending_evolution", spending_evolution)]
+            # end if
+            account_evolution += amount
+            for name, y in points + [("account_evolution", account_evolution)]:
+                expected_series[name]["index"].append(i)
+                expected_series[name]["x"].append(self.movements["start"][i])
+                expected_series[name]["y"].append(y)
+            # end for
+        # end for
+
+        assert movements_series == expected_series
+
+    def test_aggregated_movements_series(self):
+
+        aggregated_movements = {
+            "id": ["uuid-1", "uuid-2", "uuid-3", "uuid-4"],
+            "start": ["2025-01-01T00:00:00", "2025-01-01T00:00:00", "2025-02-01T00:00:00", "2025-02-01T00:00:00"],
+            "name": ["Home", "Payroll", "Home", "Payroll"],
+            "amount": [-800.5, 2500.0, -750.25, 2500.0]
+        }
+
+        aggregated_movements_series = series.build_aggregated_movements_series(aggregated_movements)
+
+        assert aggregated_movements_series["evolution"]["y"] == [800.5, 2500.0, 750.25, 2500.0]
+        assert aggregated_movements_series["accumulated_evolution"] == {
+            "index": [0, 1, 2, 3],
+            "x": aggregated_movements["start"],
+            "y": [800.5, 2500.0, 1550.75, 5000.0]
+        }
+
+    def test_empty_series(self):
+
+        movements_series = series.build_movements_series({"id": [], "start": [], "amount": [], "balance": []})
+
+        assert movements_series["account_evolution"] == {"index": [], "x": [], "y": []}
+        assert series.build_aggregated_movements_series({"id": [], "start": [], "name": [], "amount": []})["accumulated_evolution"]["y"] == []
@@ -0,0 +1,172 @@
+"""
+Automated tests for the concurrent requests to the transactions analysis views
+
+Written by Daniel Brosnan Blázquez
+
+module bankvboa
+"""
+# Import python utilities
+import unittest
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import application
+from bankvboa import create_app
+from bankvboa.views.transactions_analysis import transactions_analysis
+
+class TestTransactionsAnalysisConcurrency(unittest.TestCase):
+    def setUp(self):
+        # Create the engine to manage the data
+        self.engine_eboa = Engine()
+        self.query_eboa = Query()
+
+        # Clear all tables before executing the test
+        self.query_eboa.clear_db()
+
+        movements_events = []
+        start = datetime.datetime(2025, 7, 1)
+        balance = 1000.0
+        for i in range(100):
+            amount = 100.0 if i % 4 == 0 else -20.0
+            balance += amount
+            movements_events.append({
+                "gauge": {"insertion_type": "INSERT_and_ERASE", "name": "MOVEMENT", "system": "BANCO SANTANDER"},
+                "start": (start + datetime.timedelta(hours = i)).isoformat(),
+                "stop": (start + datetime.timedelta(hours = i, days = 1)).isoformat(),
+                "values": [{"name": "concept", "type": "text", "value": f"CONCEPT {i}"},
+                           {"name": "amount", "type": "double", "value": str(amount)},
+                           {"name": "balance", "type": "double", "value": str(balance)},
+                           {"name": "group0", "type": "text", "value": "Payroll" if amount > 0 else "Home"},
+                           {"name": "entity0", "type": "text", "value": "Company" if amount > 0 else "No entity"}]
+            })
+        # end for
+
+        exit_status = self.engine_eboa.treat_data({"operations": [{
+            "mode": "insert_and_erase",
+            "dim_signature": {"name": "MOVEMENTS_SANTANDER", "exec": "test", "version": "1.0"},
+            "source": {"name": "source.xls",
+                       "reception_time": "2025-07-10T00:00:00",
+                       "generation_time": "2025-07-10T00:00:00",
+                       "validity_start": movements_events[0]["start"],
+                       "validity_stop": movements_events[-1]["stop"]},
+            "events": movements_events
+        }]})
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        self.app = create_app()
+        self.app.config["TESTING"] = True
+        self.app.config["LOGIN_DISABLED"] = True
+        transactions_analysis.response_cache.clear()
+
+    def tearDown(self):
+        # Close connections to the DDBB
+        self.engine_eboa.close_session()
+        self.query_eboa.close_session()
+
+    def test_concurrent_requests(self):
+
+        period = "reporting_start=2025-07-01T00:00:00&reporting_stop=2025-08-01T00:00:00"
+        urls = [
+            f"/views/api/v1/transactions-analysis?{period}",
+            f"/views/api/v1/group-analysis?{period}&group=Payroll",
+            f"/views/api/v1/entity-analysis?{period}&entity=Company",
+            f"/views/api/v1/movements?{period}&limit=10",
+            f"/views/transactions-analysis?{period}",
+            f"/views/group-analysis?{period}&group=Home",
+            f"/views/entity-analysis?{period}&entity=No%20entity"
+        ]
+
+        def get(url):
+            # One client per request as in independent browsers
+            with self.app.test_client() as client:
+                response = client.get(url)
+                return url, response.status_code, response.get_data()
+            # end with
+        # end def
+
+        with ThreadPoolExecutor(max_workers = 16) as executor:
+            responses = list(executor.map(get, urls * 30))
+        # end with
+
+        assert len([response for response in responses if response[1] != 200]) == 0
+
+        # The concurrent responses of the data APIs are the same for the same request
+        for url in urls[0:4]:
+            assert len(set(body for response_url, status, body in responses if response_url == url)) == 1
+        # end for
+
+        # Every Query has been released
+        assert transactions_analysis.query_pool.in_use == 0
+        assert transactions_analysis.executor_query_pool.in_use == 0
+        assert transactions_analysis.query_pool.size <= transactions_analysis.query_pool.max_size
+
+    def test_configured_query_executor(self):
+
+        transactions_analysis.configure_query_executor(2 * transactions_analysis.QUERY_EXECUTOR_WORKERS)
+        try:
+            # The Query instances of the executor follow its number of workers
+            assert transactions_analysis.executor_query_pool.max_size == 2 * transactions_analysis.QUERY_EXECUTOR_WORKERS
+
+            period = "reporting_start=2025-07-01T00:00:00&reporting_stop=2025-08-01T00:00:00"
+            with self.app.test_client() as client:
+                response = client.get(f"/views/api/v1/transactions-analysis?{period}")
+                assert response.status_code == 200
+            # end with
+
+            assert transactions_analysis.executor_query_pool.in_use == 0
+            assert transactions_analysis.executor_query_pool.size <= 2 * transactions_analysis.QUERY_EXECUTOR_WORKERS
+        finally:
+            transactions_analysis.configure_query_executor(transactions_analysis.QUERY_EXECUTOR_WORKERS)
+        # end try
+
+    def test_balance_evolution(self):
+
+        daily_balance_events = []
+        for day in [2, 3, 5, 8]:
+            daily_balance_events.append({
+                "gauge": {"insertion_type": "INSERT_and_ERASE", "name": "DAILY_BALANCE", "system": "BANCO SANTANDER"},
+                "start": f"2025-07-{day:02d}T00:00:00",
+                "stop": f"2025-07-{day + 1:02d}T00:00:00",
+                "values": [{"name": "balance", "type": "double", "value": str(1000.0 + day)},
+                           {"name": "inflow", "type": "double", "value": str(float(day))},
+                           {"name": "outflow", "type": "double", "value": str(-2.0 * day)}]
+            })
+        # end for
+
+        exit_status = self.engine_eboa.treat_data({"operations": [{
+            "mode": "insert_and_erase",
+            "dim_signature": {"name": "DAILY_BALANCES_SANTANDER", "exec": "test", "version": "1.0"},
+            "source": {"name": "daily_balances.xls",
+                       "reception_time": "2025-07-10T00:00:00",
+                       "generation_time": "2025-07-10T00:00:00",
+                       "validity_start": "2025-07-02T00:00:00",
+                       "validity_stop": "2025-07-09T00:00:00"},
+            "events": daily_balance_events
+        }]})
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        with self.app.test_client() as client:
+            window = client.get("/views/api/v1/balance-evolution?start=2025-07-03T00:00:00&stop=2025-07-08T00:00:00").get_json()
+            assert window["day"] == ["2025-07-03T00:00:00", "2025-07-05T00:00:00"]
+            assert window["balance"] == [1003.0, 1005.0]
+            assert window["opening_balance"] == 1002.0
+            assert window["inflow_total"] == 8.0
+            assert window["outflow_total"] == -16.0
+
+            # Window before every daily balance
+            window = client.get("/views/api/v1/balance-evolution?start=2025-06-01T00:00:00&stop=2025-07-02T00:00:00").get_json()
+            assert window["day"] == []
+            assert window["opening_balance"] is None
+
+            # Window after every daily balance
+            window = client.get("/views/api/v1/balance-evolution?start=2025-07-20T00:00:00&stop=2025-07-30T00:00:00").get_json()
+            assert window["day"] == []
+            assert window["opening_balance"] == 1008.0
+        # end with
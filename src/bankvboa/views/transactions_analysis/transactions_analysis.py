@@ -6,6 +6,9 @@ Written by Daniel Brosnan Blázquez
 module bankvboa
 """
 # Import python utilities
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Import flask utilities
 from flask import Blueprint, flash, g, current_app, redirect, render_template, request, url_for
@@ -22,11 +25,224 @@ from vboa import functions as vboa_functions
 from eboa.engine.query import Query
 from eboa.engine import export as eboa_export
 
+# Import cache of the data of the views
+from bankvboa.views.transactions_analysis.cache import ResponseCache, get_sources_signature, get_whole_days_window, DAILY_BALANCES_DIM_SIGNATURES
+
+# Import conversion to columnar structures
+from bankvboa.views.transactions_analysis import columnar
+
+# Import pool of Query instances
+from bankvboa.views.transactions_analysis.query_pool import QueryPool
+
+# Import pagination of the movements
+from bankvboa.views.transactions_analysis import movements_table
+
+# Import window queries over the daily balances
+from bankvboa.views.transactions_analysis import balances
+
 bp = Blueprint("transactions_analysis", __name__, url_prefix="/views")
-query = Query()
+
+# Pool of Query instances used by the requests (configured on the creation of the application)
+query_pool = QueryPool(Query)
+
+# Cache of the data of the views (configured on the creation of the application)
+response_cache = ResponseCache()
+
+# Executor of the independent queries of the views (configured on the creation of the application)
+QUERY_EXECUTOR_WORKERS = 5
+query_executor = ThreadPoolExecutor(max_workers = QUERY_EXECUTOR_WORKERS, thread_name_prefix = "transactions_analysis_query")
+
+# Pool of Query instances used by the executor (separated from the pool of the requests
+# so that a request holding a Query never waits for the ones of its own queries)
+executor_query_pool = QueryPool(Query, max_size = QUERY_EXECUTOR_WORKERS)
+
+def configure_query_executor(workers):
+    """
+    Method to set the number of workers running the independent queries of the views
+    (shared by all the requests of the process) and the size of the pool of their Query instances
+
+    :param workers: number of workers
+    :type workers: int
+    """
+    global query_executor
+
+    previous_query_executor = query_executor
+    query_executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "transactions_analysis_query")
+    executor_query_pool.configure(workers, executor_query_pool.timeout)
+    # The queries already submitted finish in the previous executor
+    previous_query_executor.shutdown(wait = False)
 
 version = "1.0"
 
+def get_query():
+    """
+    Method to obtain the Query of the current request.
+    The Query is taken from the pool on first use and released at the end of the request
+
+    :return: Query instance
+    :rtype: Query
+    """
+    if "transactions_analysis_query" not in g:
+        g.transactions_analysis_query = query_pool.acquire()
+    # end if
+
+    return g.transactions_analysis_query
+
+@bp.teardown_request
+def release_query(exception):
+    """
+    Method to return the Query of the request (if any) to the pool
+
+    :param exception: exception raised by the request (if any)
+    :type exception: Exception
+    """
+    request_query = g.pop("transactions_analysis_query", None)
+    if request_query is not None:
+        query_pool.release(request_query)
+    # end if
+
+# Period covering every daily balance
+DAILY_BALANCES_START = "1900-01-01T00:00:00"
+DAILY_BALANCES_STOP = "9999-12-31T00:00:00"
+
+def _query_and_export_events(group, filters):
+    """
+    Method to query events with a Query of the executor pool and export them
+
+    :param group: name of the group of the exported events
+    :type group: str
+    :param filters: parameters for get_events
+    :type filters: dict
+
+    :return: tuple with the exported data and the elapsed time in seconds
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    data = {}
+    # The events are exported before releasing the Query as their values are lazily loaded
+    with executor_query_pool.query() as query_events:
+        events = query_events.get_events(**filters)
+        eboa_export.export_events(data, events, group = group, include_ers = False, include_annotations = False, include_alerts = True)
+    # end with
+
+    return data, time.perf_counter() - start
+
+def _merge_data(data, partial_data):
+    """
+    Method to merge the data exported by an independent query
+
+    :param data: data of the view
+    :type data: dict
+    :param partial_data: data exported by the query
+    :type partial_data: dict
+    """
+    for key, value in partial_data.items():
+        if key in data and isinstance(data[key], dict) and isinstance(value, dict):
+            _merge_data(data[key], value)
+        elif key in data and isinstance(data[key], list) and isinstance(value, list):
+            data[key] += value
+        else:
+            data[key] = value
+        # end if
+    # end for
+
+def _query_events_concurrently(data, queries):
+    """
+    Method to run independent event queries concurrently and merge their exported data
+
+    :param data: data of the view
+    :type data: dict
+    :param queries: list of tuples (group, filters for get_events)
+    :type queries: list
+    """
+    start = time.perf_counter()
+    futures = [(group, query_executor.submit(_query_and_export_events, group, filters)) for group, filters in queries]
+
+    # Merge in the order of the queries to keep the output deterministic
+    for group, future in futures:
+        partial_data, elapsed = future.result()
+        _merge_data(data, partial_data)
+        current_app.logger.info(f"Query of {group} took {elapsed:.3f} s")
+    # end for
+
+    current_app.logger.info(f"Queries of the view took {time.perf_counter() - start:.3f} s")
+
+def _query_movement_columns(metadata, filters):
+    """
+    Method to query the columns of the movements needed by the evolution series with a Query of the executor pool
+
+    :param metadata: metadata of the view with the reporting period
+    :type metadata: dict
+    :param filters: filters of the movements (group or entity)
+    :type filters: dict
+
+    :return: tuple with the columns id, start, amount and balance and the elapsed time in seconds
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    with executor_query_pool.query() as query_movements:
+        movements = movements_table.query_movement_columns(query_movements.session, metadata["reporting_start"], metadata["reporting_stop"], filters = filters)
+    # end with
+
+    return movements, time.perf_counter() - start
+
+def _query_movement_values(event_uuids):
+    """
+    Method to query the text values of the movements referenced by the series
+
+    :param event_uuids: UUIDs of the movements
+    :type event_uuids: list
+
+    :return: values by name of each movement by UUID
+    :rtype: dict
+    """
+    return movements_table.query_movement_values(get_query().session, event_uuids)
+
+def _query_view_data(metadata, queries, movement_filters):
+    """
+    Method to query the columns of the movements and the events of a view concurrently
+
+    :param metadata: metadata of the view with the reporting period
+    :type metadata: dict
+    :param queries: list of tuples (group, filters for get_events)
+    :type queries: list
+    :param movement_filters: filters of the movements (group or entity)
+    :type movement_filters: dict
+
+    :return: tuple with the data of the view and the columns of the movements
+    :rtype: tuple
+    """
+    data = {}
+    data["metadata"] = metadata
+
+    # Only the columns of the movements are queried as the events are only needed for the points of the series
+    movements_future = query_executor.submit(_query_movement_columns, metadata, movement_filters)
+    _query_events_concurrently(data, queries)
+    movements, elapsed = movements_future.result()
+    current_app.logger.info(f"Query of the columns of {len(movements['id'])} movements took {elapsed:.3f} s")
+
+    return data, movements
+
+def _serialize_api_data(data, movements):
+    """
+    Method to serialize the exported data of a view in the columnar form of the data API
+
+    :param data: exported data of the view
+    :type data: dict
+    :param movements: columns id, start, amount and balance of the movements
+    :type movements: dict
+
+    :return: compact JSON document
+    :rtype: str
+    """
+    api_data = columnar.build_api_data(data,
+                                       max_points = current_app.config.get("TRANSACTIONS_ANALYSIS_SERIES_MAX_POINTS", 2000),
+                                       downsampling_method = current_app.config.get("TRANSACTIONS_ANALYSIS_SERIES_DOWNSAMPLING", "minmax"),
+                                       movements = movements,
+                                       query_movement_values = _query_movement_values)
+
+    return json.dumps(api_data, separators = (",", ":"))
+
 @bp.route("/transactions-analysis", methods=["GET", "POST"])
 @auth_required()
 @roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
@@ -47,59 +263,86 @@ def show_transactions_analysis():
 
     start_filter, stop_filter = vboa_functions.get_start_stop_filters(filters, window_size, window_delay)
 
-    # Build data dictionary
+    # The data is loaded asynchronously by the page from the data API
     data = {}
-    
     data["metadata"] = {}
     metadata = data["metadata"]
     metadata["version"] = version
     metadata["reporting_start"] = stop_filter["date"]
     metadata["reporting_stop"] = start_filter["date"]
-    
+    if request.method != "POST":
+        # The default window depends on the current time, so it is extended to whole days
+        # to obtain the same URLs (and entries of the cache) during the day
+        metadata["reporting_start"], metadata["reporting_stop"] = get_whole_days_window(metadata["reporting_start"], metadata["reporting_stop"])
+    # end if
+    metadata["api_url"] = url_for("transactions_analysis.get_transactions_analysis_data",
+                                  reporting_start = metadata["reporting_start"],
+                                  reporting_stop = metadata["reporting_stop"])
+    metadata["movements_api_url"] = url_for("transactions_analysis.get_movements_page",
+                                            reporting_start = metadata["reporting_start"],
+                                            reporting_stop = metadata["reporting_stop"])
+
+    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+
+@bp.route("/api/v1/transactions-analysis")
+@auth_required()
+@roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
+def get_transactions_analysis_data():
+    """
+    Data of the transactions analysis view in columnar form.
+    """
+    current_app.logger.debug("Transactions analysis data")
+
+    metadata = {}
+    metadata["version"] = version
+    metadata["reporting_start"] = request.args.get("reporting_start")
+    metadata["reporting_stop"] = request.args.get("reporting_stop")
+
+    api_data = response_cache.get_or_build(("transactions_analysis", metadata["reporting_start"], metadata["reporting_stop"]),
+                                           lambda: get_sources_signature(get_query(), metadata["reporting_start"], metadata["reporting_stop"]),
+                                           lambda: _serialize_api_data(*_query_transactions_analysis_data(metadata)))
+
+    return current_app.response_class(api_data, mimetype = "application/json")
+
+def _query_transactions_analysis_data(metadata):
+    """
+    Method to query the data of the transactions analysis view
+
+    :param metadata: metadata of the view with the reporting period
+    :type metadata: dict
+
+    :return: tuple with the data of the view and the columns of the movements
+    :rtype: tuple
+    """
     #####
     # Query events
     #####
-    # Movement events
-    movement_events = query.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                                                                     stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                     start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                     order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, movement_events, group = "movement_events", include_ers = False, include_annotations = False, include_alerts = True)
-
+    queries = []
     # Aggregated movements per group and per month events
-    aggregated_movements_group_month_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
-                                                                     stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                     start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                     order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_group_month_events, group = "aggregated_movements_group_month_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_group_month_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
+                                                                    stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                    start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                    order_by = {"field": "start", "descending": False})))
 
     # Aggregated movements per entity and per month events
-    aggregated_movements_entity_month_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_MONTH", "op": "=="},
+    queries.append(("aggregated_movements_entity_month_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_MONTH", "op": "=="},
                                                                      stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
                                                                      start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                     order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_entity_month_events, group = "aggregated_movements_entity_month_events", include_ers = False, include_annotations = False, include_alerts = True)
+                                                                     order_by = {"field": "start", "descending": False})))
 
     # Aggregated movements per year events
-    aggregated_movements_group_year_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_YEAR", "op": "=="},
-                                                                     stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                     start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                     order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_group_year_events, group = "aggregated_movements_group_year_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_group_year_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_YEAR", "op": "=="},
+                                                                   stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                   start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                   order_by = {"field": "start", "descending": False})))
 
     # Aggregated movements per entity and per year events
-    aggregated_movements_entity_year_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_YEAR", "op": "=="},
-                                                                     stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                     start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                     order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_entity_year_events, group = "aggregated_movements_entity_year_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_entity_year_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_YEAR", "op": "=="},
+                                                                    stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                    start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                    order_by = {"field": "start", "descending": False})))
 
-    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+    return _query_view_data(metadata, queries, {})
 
 @bp.route("/group-analysis")
 @auth_required()
@@ -110,47 +353,75 @@ def show_group_analysis():
     """
     current_app.logger.debug("Group analysis view")
 
-    # Build data dictionary
+    # The data is loaded asynchronously by the page from the data API
     data = {}
-    
     data["metadata"] = {}
     metadata = data["metadata"]
     metadata["version"] = version
     metadata["reporting_start"] = request.args.get("reporting_start")
     metadata["reporting_stop"] = request.args.get("reporting_stop")
     metadata["group"] = request.args.get("group")
-    
+    metadata["api_url"] = url_for("transactions_analysis.get_group_analysis_data",
+                                  reporting_start = metadata["reporting_start"],
+                                  reporting_stop = metadata["reporting_stop"],
+                                  group = metadata["group"])
+    metadata["movements_api_url"] = url_for("transactions_analysis.get_movements_page",
+                                            reporting_start = metadata["reporting_start"],
+                                            reporting_stop = metadata["reporting_stop"],
+                                            group = metadata["group"])
+
+    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+
+@bp.route("/api/v1/group-analysis")
+@auth_required()
+@roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
+def get_group_analysis_data():
+    """
+    Data of the group analysis view in columnar form.
+    """
+    current_app.logger.debug("Group analysis data")
+
+    metadata = {}
+    metadata["version"] = version
+    metadata["reporting_start"] = request.args.get("reporting_start")
+    metadata["reporting_stop"] = request.args.get("reporting_stop")
+    metadata["group"] = request.args.get("group")
+
+    api_data = response_cache.get_or_build(("group_analysis", metadata["reporting_start"], metadata["reporting_stop"], metadata["group"]),
+                                           lambda: get_sources_signature(get_query(), metadata["reporting_start"], metadata["reporting_stop"]),
+                                           lambda: _serialize_api_data(*_query_group_analysis_data(metadata)))
+
+    return current_app.response_class(api_data, mimetype = "application/json")
+
+def _query_group_analysis_data(metadata):
+    """
+    Method to query the data of the group analysis view
+
+    :param metadata: metadata of the view with the reporting period and the group
+    :type metadata: dict
+
+    :return: tuple with the data of the view and the columns of the movements
+    :rtype: tuple
+    """
     #####
     # Query events
     #####
-    # Movement events
-    movement_events = query.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                                       stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                       start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                       value_filters = [{"name": {"filter": "group%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": metadata["group"]}}],
-                                       order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, movement_events, group = "movement_events", include_ers = False, include_annotations = False, include_alerts = True)
-
+    queries = []
     # Aggregated movements per group and per month events
-    aggregated_movements_group_month_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
-                                                                stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                value_filters = [{"name": {"filter": "group", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["group"]}}],
-                                                                order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_group_month_events, group = "aggregated_movements_group_month_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_group_month_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_MONTH", "op": "=="},
+                                                                    stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                    start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                    value_filters = [{"name": {"filter": "group", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["group"]}}],
+                                                                    order_by = {"field": "start", "descending": False})))
 
     # Aggregated movements per year events
-    aggregated_movements_group_year_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_YEAR", "op": "=="},
-                                                               stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                               start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                               value_filters = [{"name": {"filter": "group", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["group"]}}],
-                                                               order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_group_year_events, group = "aggregated_movements_group_year_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_group_year_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_GROUP_YEAR", "op": "=="},
+                                                                   stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                   start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                   value_filters = [{"name": {"filter": "group", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["group"]}}],
+                                                                   order_by = {"field": "start", "descending": False})))
 
-    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+    return _query_view_data(metadata, queries, {"group": metadata["group"]})
 
 
 @bp.route("/entity-analysis")
@@ -162,45 +433,141 @@ def show_entity_analysis():
     """
     current_app.logger.debug("Entity analysis view")
 
-    # Build data dictionary
+    # The data is loaded asynchronously by the page from the data API
     data = {}
-    
     data["metadata"] = {}
     metadata = data["metadata"]
     metadata["version"] = version
     metadata["reporting_start"] = request.args.get("reporting_start")
     metadata["reporting_stop"] = request.args.get("reporting_stop")
     metadata["entity"] = request.args.get("entity")
-    
+    metadata["api_url"] = url_for("transactions_analysis.get_entity_analysis_data",
+                                  reporting_start = metadata["reporting_start"],
+                                  reporting_stop = metadata["reporting_stop"],
+                                  entity = metadata["entity"])
+    metadata["movements_api_url"] = url_for("transactions_analysis.get_movements_page",
+                                            reporting_start = metadata["reporting_start"],
+                                            reporting_stop = metadata["reporting_stop"],
+                                            entity = metadata["entity"])
+
+    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+
+@bp.route("/api/v1/entity-analysis")
+@auth_required()
+@roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
+def get_entity_analysis_data():
+    """
+    Data of the entity analysis view in columnar form.
+    """
+    current_app.logger.debug("Entity analysis data")
+
+    metadata = {}
+    metadata["version"] = version
+    metadata["reporting_start"] = request.args.get("reporting_start")
+    metadata["reporting_stop"] = request.args.get("reporting_stop")
+    metadata["entity"] = request.args.get("entity")
+
+    api_data = response_cache.get_or_build(("entity_analysis", metadata["reporting_start"], metadata["reporting_stop"], metadata["entity"]),
+                                           lambda: get_sources_signature(get_query(), metadata["reporting_start"], metadata["reporting_stop"]),
+                                           lambda: _serialize_api_data(*_query_entity_analysis_data(metadata)))
+
+    return current_app.response_class(api_data, mimetype = "application/json")
+
+def _query_entity_analysis_data(metadata):
+    """
+    Method to query the data of the entity analysis view
+
+    :param metadata: metadata of the view with the reporting period and the entity
+    :type metadata: dict
+
+    :return: tuple with the data of the view and the columns of the movements
+    :rtype: tuple
+    """
     #####
     # Query events
     #####
-    # Movement events
-    movement_events = query.get_events(gauge_names = {"filter": "MOVEMENT", "op": "=="},
-                                       stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                       start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                       value_filters = [{"name": {"filter": "entity%", "op": "like"}, "type": "text", "value": {"op": "==", "filter": metadata["entity"]}}],
-                                       order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, movement_events, group = "movement_events", include_ers = False, include_annotations = False, include_alerts = True)
-
+    queries = []
     # Aggregated movements per entity and per month events
-    aggregated_movements_entity_month_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_MONTH", "op": "=="},
-                                                                stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                                start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                                value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["entity"]}}],
-                                                                order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_entity_month_events, group = "aggregated_movements_entity_month_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_entity_month_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_MONTH", "op": "=="},
+                                                                     stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                     start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                     value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["entity"]}}],
+                                                                     order_by = {"field": "start", "descending": False})))
 
     # Aggregated movements per year events
-    aggregated_movements_entity_year_events = query.get_events(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_YEAR", "op": "=="},
-                                                               stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
-                                                               start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
-                                                               value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["entity"]}}],
-                                                               order_by = {"field": "start", "descending": False})
-    
-    eboa_export.export_events(data, aggregated_movements_entity_year_events, group = "aggregated_movements_entity_year_events", include_ers = False, include_annotations = False, include_alerts = True)
+    queries.append(("aggregated_movements_entity_year_events", dict(gauge_names = {"filter": "AGGREGATED_MOVEMENTS_ENTITY_YEAR", "op": "=="},
+                                                                    stop_filters = [{"date": metadata["reporting_start"], "op": ">"}],
+                                                                    start_filters = [{"date": metadata["reporting_stop"], "op": "<"}],
+                                                                    value_filters = [{"name": {"filter": "entity", "op": "=="}, "type": "text", "value": {"op": "==", "filter": metadata["entity"]}}],
+                                                                    order_by = {"field": "start", "descending": False})))
 
-    return render_template("views/transactions_analysis/transactions_analysis.html", data=data)
+    return _query_view_data(metadata, queries, {"entity": metadata["entity"]})
+
+
+@bp.route("/api/v1/movements")
+@auth_required()
+@roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
+def get_movements_page():
+    """
+    Page of the movements of the reporting period in columnar form.
+    The movements are sorted and filtered in the DDBB and only the page is exported.
+    """
+    current_app.logger.debug("Movements page")
+
+    reporting_start = request.args.get("reporting_start")
+    reporting_stop = request.args.get("reporting_stop")
+    filters = {
+        "amount_min": request.args.get("amount_min", type = float),
+        "amount_max": request.args.get("amount_max", type = float),
+        "concept": request.args.get("concept"),
+        "group": request.args.get("group"),
+        "entity": request.args.get("entity")
+    }
+
+    try:
+        events, next_cursor = movements_table.query_movements_page(get_query().session, reporting_start, reporting_stop,
+                                                                   filters = filters,
+                                                                   sort = request.args.get("sort", "start"),
+                                                                   descending = request.args.get("order", "asc") == "desc",
+                                                                   limit = request.args.get("limit", 50, type = int),
+                                                                   cursor = request.args.get("cursor"))
+
+        # Only the movements of the page are exported
+        page_data = {}
+        eboa_export.export_events(page_data, events, group = "movement_events", include_ers = False, include_annotations = False, include_alerts = False)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    # end try
+
+    return jsonify({
+        "version": columnar.API_VERSION,
+        "movements": columnar.movements_to_columns(page_data, "movement_events"),
+        "next_cursor": next_cursor
+    })
+
+@bp.route("/api/v1/balance-evolution")
+@auth_required()
+@roles_accepted("administrator", "service_administrator", "operator", "analyst", "operator_observer", "observer")
+def get_balance_evolution():
+    """
+    Balance at the end of each day with movements between start and stop together with the
+    balance before start and the total inflow and outflow, obtained from the materialized daily balances.
+    Only the daily balances of the window (and the last one before it) are queried from the DDBB.
+    """
+    current_app.logger.debug("Balance evolution")
+
+    start = request.args.get("start", DAILY_BALANCES_START)
+    stop = request.args.get("stop", DAILY_BALANCES_STOP)
+
+    # The balance before the window may come from any previous day
+    window = response_cache.get_or_build(("balance_evolution", start, stop),
+                                         lambda: get_sources_signature(get_query(), DAILY_BALANCES_START, stop, dim_signatures = DAILY_BALANCES_DIM_SIGNATURES),
+                                         lambda: balances.query_balance_window(get_query().session, start, stop))
+
+    # The cached window is not modified
+    window = dict(window)
+    window["version"] = columnar.API_VERSION
+    window["start"] = start
+    window["stop"] = stop
 
+    return jsonify(window)
@@ -20,6 +20,7 @@ setup(name="bankvboa",
           "vboa",
           "massedit",
           "xlrd",
+          "openpyxl",
           "pandas"
       ],
       extras_require={
@@ -30,7 +31,11 @@ setup(name="bankvboa",
               "termcolor",
               "pytest-cov",
               "Sphinx",
-              "selenium==3.14"
+              "selenium==3.14",
+              "xlwt"
+          ],
+          "benchmarks" :[
+              "xlwt"
           ]
       },
       test_suite='nose.collector')